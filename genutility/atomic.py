@@ -1,4 +1,10 @@
+import logging
+import os
 import os.path
+import socket
+import threading
+import time
+import uuid
 from os import PathLike, fspath, remove, replace
 from tempfile import mkstemp
 from types import TracebackType
@@ -8,6 +14,8 @@ from .file import copen
 
 PathType = Union[str, PathLike]
 
+logger = logging.getLogger(__name__)
+
 
 # http://stupidpythonideas.blogspot.tw/2014/07/getting-atomic-writes-right.html
 class TransactionalCreateFile:
@@ -20,6 +28,8 @@ class TransactionalCreateFile:
         newline: Optional[str] = None,
         prefix: str = "tmp",
         handle_archives: bool = True,
+        compresslevel: int = 9,
+        threads: int = 0,
     ) -> None:
         self.path = fspath(path)
         suffix = os.path.splitext(self.path)[1].lower()
@@ -27,16 +37,30 @@ class TransactionalCreateFile:
         fd, self.tmppath = mkstemp(
             suffix, prefix, curdir, text=False
         )  # files are usually always opened with O_BINARY in cpython
+        # compressed file objects don't close the underlying file, so it's kept to close it explicitly
+        self.raw = os.fdopen(fd, "wb")
         self.fp = copen(
-            fd, mode, encoding=encoding, errors=errors, newline=newline, ext=suffix, handle_archives=handle_archives
+            self.raw,
+            mode,
+            encoding=encoding,
+            errors=errors,
+            newline=newline,
+            ext=suffix,
+            handle_archives=handle_archives,
+            compresslevel=compresslevel,
+            threads=threads,
         )
 
-    def commit(self) -> None:
+    def _close(self) -> None:
         self.fp.close()
+        self.raw.close()
+
+    def commit(self) -> None:
+        self._close()
         replace(self.tmppath, self.path)  # should be atomic
 
     def rollback(self) -> None:
-        self.fp.close()
+        self._close()
         remove(self.tmppath)
 
     def __enter__(self) -> IO:
@@ -55,6 +79,154 @@ class TransactionalCreateFile:
             self.commit()
 
 
+class FileLockTimeout(TimeoutError):
+    pass
+
+
+class FileLock:
+    """Inter-process lock based on the exclusive creation of a lock file.
+    The lock file contains a unique token of the owner, followed by its host name and process id for debugging.
+    Lock files are only removed by `release()` if they still contain the token of the owner.
+
+    `path`: Path of the lock file.
+    `timeout`: Raise `FileLockTimeout` if the lock couldn't be acquired within `timeout` seconds.
+            Wait indefinitely if None.
+    `stale`: Lock files which were not modified for `stale` seconds are considered abandoned
+            (for example by a crashed process) and are removed. Never remove foreign lock files if None.
+            While the lock is held, a background thread touches the lock file every `stale / 4` seconds,
+            so long running owners don't lose their lock. Only use it if the owners cannot be blocked
+            for `stale` seconds, since the removal of live locks can break the mutual exclusion.
+    `poll_interval`: Seconds to wait between attempts to acquire the lock.
+    """
+
+    def __init__(
+        self,
+        path: PathType,
+        timeout: Optional[float] = None,
+        stale: Optional[float] = None,
+        poll_interval: float = 0.1,
+    ) -> None:
+        self.path = fspath(path)
+        self.timeout = timeout
+        self.stale = stale
+        self.poll_interval = poll_interval
+        self.locked = False
+        self.token = f"{uuid.uuid4().hex} {socket.gethostname()} {os.getpid()}"
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _try_create(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+
+        try:
+            os.write(fd, self.token.encode("utf-8"))
+        finally:
+            os.close(fd)
+        return True
+
+    @staticmethod
+    def _read_token(path: str) -> Optional[str]:
+        try:
+            with open(path, "rb") as fr:
+                return fr.read().decode("utf-8", "replace")
+        except FileNotFoundError:
+            return None
+
+    def _is_stale(self, path: str) -> bool:
+        assert self.stale is not None
+        return time.time() - os.stat(path).st_mtime > self.stale
+
+    def _remove_stale(self) -> None:
+        """Checking the age and removing the file is not atomic, so the file is renamed first.
+        The renamed file is only removed if it still contains the token of the file which was found to be stale.
+        Otherwise a live lock file was renamed, because the stale file was replaced in the meantime.
+        It's restored, unless another waiter created a new lock file while it was renamed. In that case
+        the new file is kept and the previous owner loses the lock, which is logged by its `release()`.
+        """
+
+        try:
+            if not self._is_stale(self.path):
+                return
+        except FileNotFoundError:
+            return
+        token = self._read_token(self.path)
+
+        tmppath = f"{self.path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(self.path, tmppath)
+        except FileNotFoundError:
+            return
+
+        try:
+            if self._read_token(tmppath) != token:
+                try:
+                    os.link(tmppath, self.path)  # doesn't overwrite existing files
+                except FileExistsError:
+                    logger.warning("Lock <%s> was acquired while a live lock file was renamed", self.path)
+        finally:
+            remove(tmppath)
+
+    def _touch(self) -> None:
+        assert self.stale is not None
+        while not self._stopped.wait(self.stale / 4):
+            if self._read_token(self.path) != self.token:
+                logger.warning("Lock <%s> was removed as stale while it was held", self.path)
+                break
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                pass
+
+    def acquire(self) -> None:
+        if self.locked:
+            raise RuntimeError("Lock is already acquired")
+
+        start = time.monotonic()
+        while not self._try_create():
+            if self.stale is not None:
+                self._remove_stale()
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                raise FileLockTimeout(f"Could not acquire lock <{self.path}>")
+            time.sleep(self.poll_interval)
+
+        self.locked = True
+        if self.stale is not None:
+            self._stopped.clear()
+            self._heartbeat = threading.Thread(target=self._touch, daemon=True)
+            self._heartbeat.start()
+
+    def release(self) -> None:
+        if not self.locked:
+            raise RuntimeError("Lock is not acquired")
+
+        if self._heartbeat is not None:
+            self._stopped.set()
+            self._heartbeat.join()
+            self._heartbeat = None
+
+        # the file might have been removed as stale and re-created by another owner, which must be kept
+        if self._read_token(self.path) == self.token:
+            remove(self.path)
+        else:
+            logger.warning("Lock <%s> was removed as stale while it was held", self.path)
+        self.locked = False
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.release()
+
+
 def sopen(
     path: PathType,
     mode: str = "rb",
@@ -62,11 +234,27 @@ def sopen(
     errors: Optional[str] = None,
     newline: Optional[str] = None,
     safe: bool = False,
+    compresslevel: int = 9,
+    threads: int = 0,
 ) -> ContextManager[IO]:
+    """Opens `path` using `TransactionalCreateFile` if `safe` is True and `file.copen` otherwise.
+    `compresslevel` and `threads` are passed to `file.copen`.
+    """
+
     if safe:
-        return TransactionalCreateFile(path, mode, encoding=encoding, errors=errors, newline=newline)
+        return TransactionalCreateFile(
+            path,
+            mode,
+            encoding=encoding,
+            errors=errors,
+            newline=newline,
+            compresslevel=compresslevel,
+            threads=threads,
+        )
     else:
-        return copen(path, mode, encoding=encoding, errors=errors, newline=newline)
+        return copen(
+            path, mode, encoding=encoding, errors=errors, newline=newline, compresslevel=compresslevel, threads=threads
+        )
 
 
 def write_file(
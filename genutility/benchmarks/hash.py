@@ -0,0 +1,40 @@
+_setup = """
+import os
+from genutility.hash import hash_file, hash_file_zerocopy
+path = "testtemp/benchmark-hash.bin"
+if not os.path.exists(path):
+    with open(path, "wb") as fw:
+        fw.write(os.urandom(64 * 1024 * 1024))
+"""
+
+benchmarks = {
+    "hash_file": {
+        f"{size // 1024}KiB": {
+            "stmt": f"hash_file(path, 'md5', chunk_size={size})",
+            "setup": _setup,
+            "number": 10,
+        }
+        for size in (64 * 1024, 1024 * 1024, 8 * 1024 * 1024)
+    },
+    "hash_file_zerocopy-readinto": {
+        f"{size // 1024}KiB": {
+            "stmt": f"hash_file_zerocopy(path, 'md5', chunk_size={size})",
+            "setup": _setup,
+            "number": 10,
+        }
+        for size in (64 * 1024, 1024 * 1024, 8 * 1024 * 1024)
+    },
+    "hash_file_zerocopy-mmap": {
+        f"{size // 1024}KiB": {
+            "stmt": f"hash_file_zerocopy(path, 'md5', chunk_size={size}, use_mmap=True)",
+            "setup": _setup,
+            "number": 10,
+        }
+        for size in (64 * 1024, 1024 * 1024, 8 * 1024 * 1024)
+    },
+}
+
+if __name__ == "__main__":
+    from genutility.benchmarks import run
+
+    run(benchmarks)
@@ -0,0 +1,62 @@
+_setup_read = """
+import json
+from io import BytesIO, StringIO
+from genutility.json import json_lines
+objs = [{"id": i, "name": f"name-{i}", "tags": ["a", "b", "c"], "score": i / 7, "ok": True} for i in range(10000)]
+text = "".join(json.dumps(obj) + "\\n" for obj in objs)
+data = text.encode("utf-8")
+"""
+
+_setup_write = """
+from io import BytesIO, StringIO
+from genutility.json import json_lines
+objs = [{"id": i, "name": f"name-{i}", "tags": ["a", "b", "c"], "score": i / 7, "ok": True} for i in range(10000)]
+"""
+
+
+def _read(backend: str, binary: bool) -> dict:
+    stream = "BytesIO(data)" if binary else "StringIO(text)"
+    return {
+        "stmt": f"list(json_lines.from_stream({stream}, backend={backend!r}))",
+        "setup": _setup_read,
+        "number": 10,
+    }
+
+
+def _write(backend: str) -> dict:
+    return {
+        "stmt": f"json_lines.from_stream(BytesIO(), backend={backend!r}).writelines(objs)",
+        "setup": _setup_write,
+        "number": 10,
+    }
+
+
+def _write_legacy() -> dict:
+    # the previous implementation: `json.dump` and a separate newline write per object
+    return {
+        "stmt": "fw = StringIO()\nfor obj in objs:\n    json.dump(obj, fw)\n    fw.write('\\n')",
+        "setup": _setup_write + "import json\n",
+        "number": 10,
+    }
+
+
+benchmarks = {
+    "json_lines_read": {
+        "json-text": _read("json", False),
+        "simplejson-text": _read("simplejson", False),
+        "orjson-text": _read("orjson", False),
+        "orjson-binary": _read("orjson", True),
+        "msgspec-binary": _read("msgspec", True),
+    },
+    "json_lines_write": {
+        "legacy": _write_legacy(),
+        "json": _write("json"),
+        "orjson": _write("orjson"),
+        "msgspec": _write("msgspec"),
+    },
+}
+
+if __name__ == "__main__":
+    from genutility.benchmarks import run
+
+    run(benchmarks)
@@ -1,16 +1,24 @@
 import logging
 import os
 import os.path
-from datetime import timedelta
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from datetime import datetime, timedelta
 from functools import wraps
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional, TypeVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, TypeVar
 
 from typing_extensions import ParamSpec
 
+from .atomic import FileLock
+from .concurrency import KeyedLock
 from .datetime import now
+from .exceptions import assert_choice_map
 from .filesystem import mdatetime
 from .object import args_to_key
+from .records import index_path
 from .time import MeasureTime
 
 T = TypeVar("T")
@@ -18,6 +26,121 @@ P = ParamSpec("P")
 
 logger = logging.getLogger(__name__)
 
+COMPRESSION_EXTS = {"gzip": ".gz", "bz2": ".bz2", "zstd": ".zst", "lz4": ".lz4"}
+
+
+class CacheStats:
+    """Counters of a function decorated with `cache`. `load_time` and `compute_time` are the total
+    number of seconds spent loading results from disk and calculating results respectively.
+    """
+
+    __slots__ = ("memory_hits", "disk_hits", "misses", "evictions", "load_time", "compute_time")
+
+    def __init__(self) -> None:
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+        self.compute_time = 0.0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def __repr__(self) -> str:
+        args = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__)
+        return f"CacheStats({args})"
+
+
+class _MemoryCache:
+    """Thread-safe LRU mapping of cache file paths to `(creation time, result)` tuples."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.data: "OrderedDict[str, Tuple[datetime, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[datetime, Any]]:
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key: str, created: datetime, value: Any) -> None:
+        with self.lock:
+            self.data[key] = (created, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+
+def _touch_atime(path: str) -> None:
+    """Updates the access time of `path` without changing the modification time,
+    because filesystems are often mounted with `relatime` or `noatime`.
+    """
+
+    stats = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), stats.st_mtime_ns))
+
+
+def _evict_cache_files(
+    path: str, file_ext: str, max_bytes: Optional[int], max_entries: Optional[int]
+) -> Tuple[int, int, int]:
+    """Returns the number of removed files and the number of files and bytes which are left."""
+
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.endswith(file_ext) and entry.is_file():
+                try:
+                    stats = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stats.st_atime_ns, stats.st_size, entry.path))
+
+    entries.sort()
+    num_entries = len(entries)
+    num_bytes = sum(size for _atime, size, _filepath in entries)
+    removed = 0
+
+    for _atime, size, filepath in entries:
+        if _within_limits(num_entries, num_bytes, max_bytes, max_entries):
+            break
+
+        try:
+            os.remove(filepath)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        try:
+            os.remove(index_path(filepath))
+        except FileNotFoundError:
+            pass
+        num_entries -= 1
+        num_bytes -= size
+
+    return removed, num_entries, num_bytes
+
+
+def _within_limits(num_entries: int, num_bytes: int, max_bytes: Optional[int], max_entries: Optional[int]) -> bool:
+    return (max_entries is None or num_entries <= max_entries) and (max_bytes is None or num_bytes <= max_bytes)
+
+
+def evict_cache_files(
+    path: str, file_ext: str, max_bytes: Optional[int] = None, max_entries: Optional[int] = None
+) -> int:
+    """Removes the least recently accessed files ending with `file_ext` from directory `path`
+    until there are no more than `max_entries` files with no more than `max_bytes` bytes in total.
+    Returns the number of removed files.
+    """
+
+    removed, _num_entries, _num_bytes = _evict_cache_files(path, file_ext, max_bytes, max_entries)
+    return removed
+
 
 def cache(
     path: Path,
@@ -33,6 +156,17 @@ def cache(
     return_cached: bool = False,
     file_ext: Optional[str] = None,
     cached_only: bool = False,
+    memory_maxsize: int = 0,
+    max_bytes: Optional[int] = None,
+    max_entries: Optional[int] = None,
+    single_flight: bool = True,
+    process_lock: bool = False,
+    lock_timeout: Optional[float] = None,
+    lock_stale: Optional[float] = None,
+    index: bool = False,
+    compression: Optional[str] = None,
+    compresslevel: Optional[int] = None,
+    compression_threads: int = 0,
 ) -> Callable[[Callable[P, T]], Callable[P, Any]]:
     """Decorator to cache function calls. Doesn't take function arguments into regard.
     It's using `pickle` to deserialize the data. So don't use it with untrusted inputs.
@@ -43,9 +177,32 @@ def cache(
     `generator`: set to True to store the results of generator objects
     `protocol`: pickle protocol version
     `file_ext`: File extension to use for cache files. Should start with `.`.
+    `memory_maxsize`: Keep up to this many results in memory in addition to the files,
+            so hits don't need to stat and deserialize the cache file. The results are returned as is,
+            so they must not be modified by the caller. Not used for generators unless `consume` is True.
+    `max_bytes`, `max_entries`: Limit the size of the cache directory. If they are exceeded after a new result
+            was written, the least recently accessed files are removed. The directory is only scanned
+            when the size tracked since the last scan exceeds the limits, so files written by other processes
+            are only taken into account then. For generators the file is written when the result is exhausted.
+    `single_flight`: If multiple threads miss the same key at the same time, only one of them calls the function
+            and the others wait for and use its result. Not used for generators unless `consume` is True.
+    `process_lock`: Extend `single_flight` to multiple processes using a lock file next to the cache file.
+    `lock_timeout`, `lock_stale`: Passed to `atomic.FileLock` as `timeout` and `stale`.
+    `index`: Write an offset index for generator results. Cache hits then return a `records.IndexedRecordFile`
+            instead of an iterator, which also supports `len()`, indexing and slicing.
+            Only supported by the pickle and msgpack serializers.
+    `compression`: Compress the cache files using one of "gzip", "bz2", "zstd" or "lz4".
+            The corresponding extension is appended to `file_ext`. zstd and lz4 require optional dependencies.
+    `compresslevel`: Compression level, see `file.copen`. Defaults to the highest level for gzip and bz2,
+            and to level 9 for zstd and lz4 (high compression mode).
+    `compression_threads`: Number of compression threads for zstd, gzip and bz2, see `file.copen`.
 
     If `ignoreargs` is True, the cache won't take function arguments into regard.
             The path will be interpreted as template string to a file instead of a directory.
+
+    Cache files are written atomically using `atomic.TransactionalCreateFile`,
+    so concurrent readers never see partially written files.
+    The decorated function exposes a `cache_stats` attribute with hit, miss and latency counters.
     """
 
     from . import pickle  # nosec
@@ -61,6 +218,7 @@ def cache(
         write_iter = pickle.write_iter
         write_file = pickle.write_pickle
         read_iter = pickle.read_iter
+        open_indexed: Optional[Callable[[str], Any]] = pickle.open_indexed
         read_file = pickle.read_pickle
         key_to_hash = pickle.key_to_hash
         _hash_sep: Any = None
@@ -74,6 +232,7 @@ def cache(
         write_iter = msgpack.write_iter
         write_file = msgpack.write_msgpack
         read_iter = msgpack.read_iter
+        open_indexed = msgpack.open_indexed
         read_file = msgpack.read_msgpack
         key_to_hash = msgpack.key_to_hash
         _hash_sep = None
@@ -87,6 +246,7 @@ def cache(
         write_iter = json.write_json_lines
         write_file = json.write_json
         read_iter = json.read_json_lines
+        open_indexed = None
         read_file = json.read_json
         key_to_hash = json.key_to_hash
         _hash_sep = {}
@@ -95,21 +255,143 @@ def cache(
     else:
         raise ValueError(f"Invalid serializer: {serializer}")
 
+    if compression is not None:
+        if ignoreargs:
+            raise ValueError("`compression` can only be specified if ignoreargs is False")
+        _file_ext += assert_choice_map("compression", compression, COMPRESSION_EXTS)
+        if compresslevel is not None:
+            _serializer_kwargs["compresslevel"] = compresslevel
+        if compression_threads != 0:
+            _serializer_kwargs["threads"] = compression_threads
+    elif compresslevel is not None or compression_threads != 0:
+        raise ValueError("`compresslevel` and `compression_threads` can only be specified with `compression`")
+
     _serializer_kwargs.update(serializer_kwargs)
     _deserializer_kwargs.update(deserializer_kwargs)
 
     _pure_serializer_kwargs = _serializer_kwargs.copy()
     _pure_serializer_kwargs.pop("safe")
+    _pure_serializer_kwargs.pop("compresslevel", None)
+    _pure_serializer_kwargs.pop("threads", None)
 
     if not generator and consume:
         raise ValueError("consume can only be used for generator")
 
+    if index and (not generator or consume or open_indexed is None or compression is not None):
+        raise ValueError(
+            "index can only be used for non-consumed generators with the uncompressed pickle or msgpack serializer"
+        )
+
+    if ignoreargs and (max_bytes is not None or max_entries is not None):
+        raise ValueError("`max_bytes` or `max_entries` can only be specified if ignoreargs is False")
+
     if duration is None:
         _duration = timedelta.max
     else:
         _duration = duration
 
+    evict = max_bytes is not None or max_entries is not None
+    in_memory = memory_maxsize > 0 and not (generator and not consume)
+
     def decorator(func: Callable[P, T]) -> Callable[P, Any]:
+        memory = _MemoryCache(memory_maxsize) if in_memory else None
+        stats = CacheStats()
+        stats_lock = threading.Lock()
+        key_locks: KeyedLock[str] = KeyedLock()
+        evict_lock = threading.Lock()
+        # size of the cache directory as of the last scan plus the files written since then
+        num_entries: Optional[int] = None
+        num_bytes = 0
+
+        def count(name: str, delta: float = 1) -> None:
+            with stats_lock:
+                setattr(stats, name, getattr(stats, name) + delta)
+
+        def lookup(fullpath: str) -> Tuple[bool, Any]:
+            if memory is not None:
+                item = memory.get(fullpath)
+                if item is not None and now() - item[0] <= _duration:
+                    count("memory_hits")
+                    return True, item[1]
+
+            try:
+                mdate = mdatetime(fullpath)
+            except FileNotFoundError:
+                return False, None
+            if now() - mdate > _duration:
+                return False, None
+            if index and not os.path.exists(index_path(fullpath)):
+                # written without index, or the index is not yet written
+                logger.debug("Index of <%s> is missing", fullpath)
+                return False, None
+
+            count("disk_hits")
+            if evict:
+                _touch_atime(fullpath)
+
+            if generator and not consume:
+                logger.debug("Loading iterable from <%s>", fullpath)
+                if index:
+                    assert open_indexed is not None
+                    result = open_indexed(fullpath)
+                else:
+                    result = read_iter(fullpath, **_deserializer_kwargs)
+            else:
+                with MeasureTime() as m:
+                    result = read_file(fullpath, **_deserializer_kwargs)
+                logger.debug("Result loaded from <%s> in %s seconds", fullpath, m.get())
+                count("load_time", m.get())
+                if memory is not None:
+                    memory.set(fullpath, mdate, result)
+
+            return True, result
+
+        def evict_after_write(fullpath: str, strpath: str) -> None:
+            nonlocal num_entries, num_bytes
+
+            with evict_lock:
+                if num_entries is not None:
+                    num_entries += 1
+                    num_bytes += os.path.getsize(fullpath)
+                    if _within_limits(num_entries, num_bytes, max_bytes, max_entries):
+                        return
+                removed, num_entries, num_bytes = _evict_cache_files(strpath, _file_ext, max_bytes, max_entries)
+            count("evictions", removed)
+
+        def evict_after_iter(it: Iterator[Any], fullpath: str, strpath: str) -> Iterator[Any]:
+            yield from it
+            evict_after_write(fullpath, strpath)
+
+        def compute(fullpath: str, strpath: str, args: tuple, kwargs: dict) -> Any:
+            count("misses")
+            if not ignoreargs:
+                path.mkdir(parents=True, exist_ok=True)
+
+            if generator and not consume:
+                it = func(*args, **kwargs)
+                logger.debug("Writing iterable to <%s>", fullpath)
+                if index:
+                    result: Any = write_iter(it, fullpath, index=True, **_serializer_kwargs)
+                else:
+                    result = write_iter(it, fullpath, **_serializer_kwargs)
+                if evict:
+                    result = evict_after_iter(result, fullpath, strpath)
+            else:
+                with MeasureTime() as m:
+                    if generator and consume:
+                        result = list(func(*args, **kwargs))
+                    else:
+                        result = func(*args, **kwargs)
+                logger.debug("Result calculated in %s seconds and written to <%s>", m.get(), fullpath)
+                count("compute_time", m.get())
+                write_file(result, fullpath, **_serializer_kwargs)
+                if memory is not None:
+                    memory.set(fullpath, now(), result)
+                if evict:
+                    evict_after_write(fullpath, strpath)
+
+            return result
+
         @wraps(func)
         def inner(*args: P.args, **kwargs: P.kwargs) -> Any:
             strpath = os.fspath(path).format_map(_serializer_kwargs)
@@ -132,46 +414,39 @@ def cache(
                     logger.warning("cache file decorator for %s called with arguments", func.__name__)
                 fullpath = strpath
 
-            try:
-                invalid = now() - mdatetime(fullpath) > _duration
-            except FileNotFoundError:
-                invalid = True
-
-            if invalid:
-                if cached_only:
-                    raise LookupError("Not in cache")
-
+            found, result = lookup(fullpath)
+            if found:
+                cached = True
+            elif cached_only:
+                raise LookupError("Not in cache")
+            elif generator and not consume:
+                # the lazy result cannot be shared, writing is still atomic though
                 cached = False
-                if not ignoreargs:
-                    path.mkdir(parents=True, exist_ok=True)
-
-                if generator and not consume:
-                    it = func(*args, **kwargs)
-                    logger.debug("Writing iterable to <%s>", fullpath)
-                    result: Any = write_iter(it, fullpath, **_serializer_kwargs)
-                else:
-                    with MeasureTime() as m:
-                        if generator and consume:
-                            result = list(func(*args, **kwargs))
-                        else:
-                            result = func(*args, **kwargs)
-                    logger.debug("Result calculated in %s seconds and written to <%s>", m.get(), fullpath)
-                    write_file(result, fullpath, **_serializer_kwargs)
+                result = compute(fullpath, strpath, args, kwargs)
             else:
-                cached = True
-                if generator and not consume:
-                    logger.debug("Loading iterable from <%s>", fullpath)
-                    result = read_iter(fullpath, **_deserializer_kwargs)
-                else:
-                    with MeasureTime() as m:
-                        result = read_file(fullpath, **_deserializer_kwargs)
-                    logger.debug("Result loaded from <%s> in %s seconds", fullpath, m.get())
+                with ExitStack() as stack:
+                    if single_flight:
+                        stack.enter_context(key_locks(fullpath))
+                        found, result = lookup(fullpath)
+
+                    if not found and process_lock:
+                        if not ignoreargs:
+                            path.mkdir(parents=True, exist_ok=True)
+                        stack.enter_context(FileLock(fullpath + ".lock", lock_timeout, lock_stale))
+                        found, result = lookup(fullpath)
+
+                    if found:
+                        cached = True
+                    else:
+                        cached = False
+                        result = compute(fullpath, strpath, args, kwargs)
 
             if return_cached:
                 return cached, result
             else:
                 return result
 
+        inner.cache_stats = stats  # type: ignore[attr-defined]
         return inner
 
     return decorator
@@ -0,0 +1,155 @@
+import hashlib
+from typing import IO, Iterator, List, Tuple
+
+import numpy as np
+
+from .file import PathType
+from .hash import HashCls
+
+
+def gear_table() -> np.ndarray:
+    """Returns the 256 random 64-bit integers used by the Gear rolling hash.
+    They are derived from SHA-256 so the chunk boundaries are stable across versions and platforms.
+    """
+
+    values = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "little") for i in range(256)]
+    return np.array(values, dtype=np.uint64)
+
+
+_GEAR = gear_table()
+
+
+def gear_hash(data: np.ndarray) -> np.ndarray:
+    """Calculates the Gear hash `h[i] = (h[i-1] << 1) + G[data[i]]` (modulo 2**64)
+    for every position of the uint8 array `data`.
+    Because of the shift, `h[i]` only depends on the 64 bytes up to and including `data[i]`.
+    So the hash can be computed for all positions at once by doubling the window size six times
+    instead of iterating over the data byte by byte.
+    """
+
+    h = _GEAR[data]
+    width = 1
+    while width < 64:
+        shifted = h[:-width] << np.uint64(width)
+        h[width:] += shifted
+        width *= 2
+    return h
+
+
+def _top_bits_mask(bits: int) -> np.uint64:
+    # the upper bits of the Gear hash depend on more input bytes than the lower ones
+    return np.uint64(((1 << bits) - 1) << (64 - bits))
+
+
+def find_chunk_boundaries(
+    data: bytes, min_size: int, avg_size: int, max_size: int, eof: bool = True, normalization: int = 2
+) -> List[int]:
+    """Returns the end offsets of the content-defined chunks in `data` using FastCDC-style normalized chunking.
+
+    Between `min_size` and `avg_size` a stricter mask is used than between `avg_size` and `max_size`,
+    which narrows the distribution of chunk sizes around `avg_size`. Chunks are cut at `max_size` at the latest.
+    If `eof` is False, the data after the last returned boundary is incomplete and should be passed again
+    together with the following data.
+    """
+
+    if not 64 <= min_size <= avg_size <= max_size:
+        raise ValueError("64 <= min_size <= avg_size <= max_size is required")
+
+    bits = avg_size.bit_length() - 1
+    mask_s = _top_bits_mask(bits + normalization)
+    mask_l = _top_bits_mask(max(bits - normalization, 1))
+
+    n = len(data)
+    h = gear_hash(np.frombuffer(data, dtype=np.uint8))
+    # end offsets (exclusive) of possible chunk boundaries
+    cand_s = np.flatnonzero((h & mask_s) == 0) + 1
+    cand_l = np.flatnonzero((h & mask_l) == 0) + 1
+
+    out: List[int] = []
+    start = 0
+    while start < n:
+        lo = start + min_size
+        mid = start + avg_size
+        hi = start + max_size
+
+        if n - start <= min_size:
+            if eof:
+                out.append(n)
+            break
+
+        i = np.searchsorted(cand_s, lo)
+        if i < len(cand_s) and cand_s[i] < mid:
+            cut = int(cand_s[i])
+        elif mid > n and not eof:
+            break
+        else:
+            i = np.searchsorted(cand_l, mid)
+            if i < len(cand_l) and cand_l[i] < hi:
+                cut = int(cand_l[i])
+            elif hi <= n:
+                cut = hi
+            elif eof:
+                cut = n
+            else:
+                break
+
+        out.append(cut)
+        start = cut
+
+    return out
+
+
+def iter_chunks(
+    fr: IO[bytes],
+    min_size: int = 2 * 1024,
+    avg_size: int = 8 * 1024,
+    max_size: int = 64 * 1024,
+    hashcls: HashCls = "sha256",
+    buffer_size: int = 4 * 1024 * 1024,
+) -> Iterator[Tuple[int, int, bytes]]:
+    """Splits the binary file-like object `fr` into content-defined chunks and yields `(offset, length, digest)`
+    tuples. Unlike fixed-size blocks, inserting or removing data only changes the chunks around the modification,
+    which makes the digests usable for deduplication and delta synchronization.
+
+    `buffer_size`: Amount of data which is read and scanned at once. Must be larger than `max_size`.
+    """
+
+    if buffer_size <= max_size:
+        raise ValueError("buffer_size must be larger than max_size")
+
+    offset = 0
+    buf = b""
+    eof = False
+
+    while not eof:
+        data = fr.read(buffer_size)
+        eof = not data
+        buf += data
+
+        start = 0
+        with memoryview(buf) as view:
+            for end in find_chunk_boundaries(buf, min_size, avg_size, max_size, eof):
+                if isinstance(hashcls, str):
+                    m = hashlib.new(hashcls)
+                else:
+                    m = hashcls()
+                m.update(view[start:end])
+                yield offset + start, end - start, m.digest()
+                start = end
+
+        offset += start
+        buf = buf[start:]
+
+
+def chunk_file(
+    path: PathType,
+    min_size: int = 2 * 1024,
+    avg_size: int = 8 * 1024,
+    max_size: int = 64 * 1024,
+    hashcls: HashCls = "sha256",
+    buffer_size: int = 4 * 1024 * 1024,
+) -> Iterator[Tuple[int, int, bytes]]:
+    """Splits the file at `path` into content-defined chunks. See `iter_chunks`."""
+
+    with open(path, "rb") as fr:
+        yield from iter_chunks(fr, min_size, avg_size, max_size, hashcls, buffer_size)
@@ -0,0 +1,309 @@
+import bz2
+import gzip
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BufferedIOBase
+from typing import IO, Any, Deque, Iterator, Optional
+
+from .concurrency import executor_map
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# gzip header with mtime 0 and unknown OS
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# same with FEXTRA flag, followed by XLEN and the start of one subfield which stores the uint32 member size
+_MEMBER_SUBFIELD_ID = b"GU"
+_MEMBER_HEADER_PREFIX = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x08\x00" + _MEMBER_SUBFIELD_ID + b"\x04\x00"
+_MEMBER_HEADER_SIZE = len(_MEMBER_HEADER_PREFIX) + 4
+
+
+def num_threads(threads: int) -> int:
+    """Returns the number of worker threads to use, where -1 means one per logical core."""
+
+    if threads == -1:
+        return os.cpu_count() or 1
+    elif threads < 1:
+        raise ValueError("threads must be positive or -1")
+    return threads
+
+
+def _deflate_block(block: bytes, zdict: bytes, level: int) -> bytes:
+    if zdict:
+        c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, zdict)
+    else:
+        c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # the sync flush ends the data at a byte boundary without marking it as the final block
+    return c.compress(block) + c.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _gzip_member(block: bytes, level: int) -> bytes:
+    c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = c.compress(block) + c.flush()
+    trailer = struct.pack("<II", zlib.crc32(block), len(block) & 0xFFFFFFFF)
+    size = _MEMBER_HEADER_SIZE + len(body) + len(trailer)
+    return _MEMBER_HEADER_PREFIX + struct.pack("<I", size) + body + trailer
+
+
+class _ParallelBlockWriter(BufferedIOBase):
+    """Base class for writers which split the data into blocks, compress them in a thread pool
+    and write the results in order. The compression libraries release the GIL, so this scales with the threads.
+    """
+
+    def __init__(self, fp: IO[bytes], threads: int, block_size: int, closefd: bool) -> None:
+        self.fp = fp
+        self.block_size = block_size
+        self.closefd = closefd
+        self.threads = num_threads(threads)
+        self.executor = ThreadPoolExecutor(self.threads)
+        self.pending: Deque[Future] = deque()
+        self.buffer = bytearray()
+
+    def _compress(self, block: bytes) -> "Future[bytes]":
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        pass
+
+    def writable(self) -> bool:
+        return True
+
+    def _submit(self, block: bytes) -> None:
+        self.pending.append(self._compress(block))
+        while len(self.pending) > 2 * self.threads:
+            self.fp.write(self.pending.popleft().result())
+
+    def write(self, data: Any) -> int:
+        if self.closed:
+            raise ValueError("write to closed file")
+
+        with memoryview(data) as view:
+            self.buffer += view
+            num = view.nbytes
+
+        pos = 0
+        while len(self.buffer) - pos >= self.block_size:
+            self._submit(bytes(self.buffer[pos : pos + self.block_size]))
+            pos += self.block_size
+        del self.buffer[:pos]
+
+        return num
+
+    def flush(self) -> None:
+        """Writes all complete blocks. Incomplete blocks are only written when the file is closed."""
+
+        if self.closed:
+            return
+
+        while self.pending:
+            self.fp.write(self.pending.popleft().result())
+        self.fp.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self.fp.write(self.pending.popleft().result())
+            self._finish()
+            self.fp.flush()
+        finally:
+            self.executor.shutdown()
+            try:
+                super().close()
+            finally:
+                if self.closefd:
+                    self.fp.close()
+
+
+class ParallelGzipWriter(_ParallelBlockWriter):
+    """Writes gzip files using multiple threads.
+
+    By default, like pigz, a single gzip member is written. The blocks are compressed as independent deflate
+    streams, where each block uses the last 32 KiB of the previous block as dictionary to keep the compression ratio.
+    If `multi_member` is True, each block is written as separate gzip member instead,
+    which can be decompressed in parallel by `ParallelGzipReader`, at the cost of a slightly worse compression ratio.
+    Either way the output can be read by any gzip implementation.
+
+    `fp`: Binary file-like object to write to.
+    `compresslevel`: zlib compression level 0-9.
+    `threads`: Number of compression threads. -1 uses all logical cores.
+    `block_size`: Uncompressed size of the blocks.
+    `closefd`: Close `fp` when this file is closed.
+    """
+
+    def __init__(
+        self,
+        fp: IO[bytes],
+        compresslevel: int = 9,
+        threads: int = -1,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        multi_member: bool = False,
+        closefd: bool = False,
+    ) -> None:
+        if multi_member and block_size >= 2**31:
+            raise ValueError("block_size must be smaller than 2 GiB")
+
+        super().__init__(fp, threads, block_size, closefd)
+        self.compresslevel = compresslevel
+        self.multi_member = multi_member
+        self.crc = 0
+        self.size = 0
+        self.last = b""
+
+        if not multi_member:
+            self.fp.write(_GZIP_HEADER)
+
+    def _compress(self, block: bytes) -> "Future[bytes]":
+        if self.multi_member:
+            return self.executor.submit(_gzip_member, block, self.compresslevel)
+
+        future = self.executor.submit(_deflate_block, block, self.last, self.compresslevel)
+        self.last = block[-32 * 1024 :]
+        self.crc = zlib.crc32(block, self.crc)
+        self.size += len(block)
+        return future
+
+    def _finish(self) -> None:
+        if not self.multi_member:
+            self.fp.write(zlib.compressobj(self.compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS).flush())  # final block
+            self.fp.write(struct.pack("<II", self.crc, self.size & 0xFFFFFFFF))
+
+
+class ParallelBz2Writer(_ParallelBlockWriter):
+    """Writes bzip2 files using multiple threads, like pbzip2. Each block is compressed as a separate bzip2 stream.
+    Multi-stream files can be read by the `bz2` module and other bzip2 implementations.
+
+    `fp`: Binary file-like object to write to.
+    `compresslevel`: bzip2 compression level 1-9, which selects the bzip2 block size of 100-900 KB.
+    `threads`: Number of compression threads. -1 uses all logical cores.
+    `block_size`: Uncompressed size of the blocks. Defaults to the bzip2 block size.
+    `closefd`: Close `fp` when this file is closed.
+    """
+
+    def __init__(
+        self,
+        fp: IO[bytes],
+        compresslevel: int = 9,
+        threads: int = -1,
+        block_size: Optional[int] = None,
+        closefd: bool = False,
+    ) -> None:
+        super().__init__(fp, threads, block_size or compresslevel * 100 * 1000, closefd)
+        self.compresslevel = compresslevel
+
+    def _compress(self, block: bytes) -> "Future[bytes]":
+        return self.executor.submit(bz2.compress, block, self.compresslevel)
+
+
+def _iter_members(fp: IO[bytes]) -> Iterator[bytes]:
+    """Yields the gzip members written by `ParallelGzipWriter(multi_member=True)`.
+    Stops before the first member which doesn't contain the member size.
+    """
+
+    while True:
+        pos = fp.tell()
+        header = fp.read(_MEMBER_HEADER_SIZE)
+        if len(header) < _MEMBER_HEADER_SIZE or not header.startswith(_MEMBER_HEADER_PREFIX):
+            fp.seek(pos)
+            return
+
+        size = struct.unpack_from("<I", header, len(_MEMBER_HEADER_PREFIX))[0]
+        rest = fp.read(size - len(header))
+        if len(rest) != size - len(header):
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+        yield header + rest
+
+
+def _decompress_member(member: bytes) -> bytes:
+    return zlib.decompress(member, 16 + zlib.MAX_WBITS)
+
+
+class ParallelGzipReader(BufferedIOBase):
+    """Reads gzip files, decompressing members written by `ParallelGzipWriter(multi_member=True)` using multiple
+    threads. Other gzip files, or the remainder of the file after the first foreign member, are decompressed
+    sequentially.
+
+    `fp`: Seekable binary file-like object to read from.
+    `threads`: Number of decompression threads. -1 uses all logical cores.
+    `closefd`: Close `fp` when this file is closed.
+    """
+
+    def __init__(self, fp: IO[bytes], threads: int = -1, closefd: bool = False) -> None:
+        self.fp = fp
+        self.threads = num_threads(threads)
+        self.closefd = closefd
+        self.blocks = self._blocks()
+        self.buffer = b""
+        self.pos = 0
+
+    def _blocks(self) -> Iterator[bytes]:
+        for future in executor_map(_decompress_member, _iter_members(self.fp), workers=self.threads):
+            yield future.result()
+
+        with gzip.GzipFile(fileobj=self.fp, mode="rb") as fr:
+            while True:
+                data = fr.read(DEFAULT_BLOCK_SIZE)
+                if not data:
+                    break
+                yield data
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self) -> bool:
+        for block in self.blocks:
+            if block:
+                self.buffer = block
+                self.pos = 0
+                return True
+        return False
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if self.closed:
+            raise ValueError("read from closed file")
+
+        if size is None or size < 0:
+            out = [self.buffer[self.pos :]]
+            out.extend(self.blocks)
+            self.buffer = b""
+            self.pos = 0
+            return b"".join(out)
+
+        if self.pos >= len(self.buffer) and not self._fill():
+            return b""
+
+        data = self.buffer[self.pos : self.pos + size]
+        self.pos += len(data)
+        return data
+
+    def read1(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+    def readinto(self, b: Any) -> int:
+        with memoryview(b) as view:
+            data = self.read(view.nbytes)
+            view[: len(data)] = data
+        return len(data)
+
+    def peek(self, size: int = 0) -> bytes:
+        if self.pos >= len(self.buffer) and not self._fill():
+            return b""
+        return self.buffer[self.pos :]
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        try:
+            self.blocks.close()
+        finally:
+            if self.closefd:
+                self.fp.close()
+            super().close()
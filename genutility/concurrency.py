@@ -211,6 +211,65 @@ def NotThreadSafe(verify: bool = False) -> Callable[[type], type]:
     return OnClass
 
 
+class KeyedLock(Generic[T]):
+    """A collection of locks, one for each key. Locks are created on demand and discarded once unused,
+    so it can be used with an unbounded number of keys.
+
+    Example:
+        locks = KeyedLock()
+        with locks(key):
+            ...
+    """
+
+    __slots__ = ("_lock", "_locks")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._locks: Dict[T, List[Any]] = {}  # key -> [lock, refcount]
+
+    def acquire(self, key: T) -> None:
+        with self._lock:
+            try:
+                entry = self._locks[key]
+            except KeyError:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+
+        entry[0].acquire()
+
+    def release(self, key: T) -> None:
+        with self._lock:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def locked(self, key: T) -> bool:
+        with self._lock:
+            return key in self._locks
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def __call__(self, key: T) -> "_KeyedLockContext[T]":
+        return _KeyedLockContext(self, key)
+
+
+class _KeyedLockContext(Generic[T]):
+    __slots__ = ("keyedlock", "key")
+
+    def __init__(self, keyedlock: KeyedLock[T], key: T) -> None:
+        self.keyedlock = keyedlock
+        self.key = key
+
+    def __enter__(self) -> None:
+        self.keyedlock.acquire(self.key)
+
+    def __exit__(self, *args: Any) -> None:
+        self.keyedlock.release(self.key)
+
+
 class AbortIteration(Exception):
     pass
 
@@ -0,0 +1,148 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from .file import PathType
+from .filesystem import MyDirEntryT, scandir_error_log, scandir_rec
+from .hash import HashCls, hash_file_ends, hash_file_zerocopy
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+
+
+class DuplicateStats:
+    """Counts how many bytes were read by `find_duplicates` in each stage.
+    `total_bytes` is the size of all scanned files, ie. the amount of data a full hash of every file would read.
+    """
+
+    __slots__ = ("files", "total_bytes", "size_candidates", "partial_bytes", "full_candidates", "full_bytes")
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.total_bytes = 0
+        self.size_candidates = 0
+        self.partial_bytes = 0
+        self.full_candidates = 0
+        self.full_bytes = 0
+
+    @property
+    def read_bytes(self) -> int:
+        return self.partial_bytes + self.full_bytes
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.total_bytes - self.read_bytes
+
+    def __repr__(self) -> str:
+        args = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__)
+        return f"DuplicateStats({args})"
+
+
+def _try_hash(func: Callable[..., bytes], path: str, *args) -> Optional[bytes]:
+    try:
+        return func(path, *args)
+    except OSError as e:
+        logger.warning("Failed to hash <%s>: %s", path, e)
+        return None
+
+
+def _partial_digest(path: str, hashcls: HashCls, size: int) -> bytes:
+    return hash_file_ends(path, hashcls, size).digest()
+
+
+def _full_digest(path: str, hashcls: HashCls, chunk_size: int) -> bytes:
+    return hash_file_zerocopy(path, hashcls, chunk_size).digest()
+
+
+def _regroup(
+    executor: ThreadPoolExecutor,
+    groups: Iterable[Tuple[K, List[str]]],
+    func: Callable[..., bytes],
+    *args,
+) -> Dict[Tuple[K, bytes], List[str]]:
+    """Splits all `groups` further by the output of `func`. The paths of all groups are processed concurrently."""
+
+    keys: List[K] = []
+    paths: List[str] = []
+    for key, group in groups:
+        keys.extend(key for _ in group)
+        paths.extend(group)
+
+    out: Dict[Tuple[K, bytes], List[str]] = defaultdict(list)
+    digests = executor.map(_try_hash, [func] * len(paths), paths, *([arg] * len(paths) for arg in args))
+    for key, path, digest in zip(keys, paths, digests):
+        if digest is not None:
+            out[(key, digest)].append(path)
+
+    return out
+
+
+def find_duplicates(
+    paths: Iterable[PathType],
+    hashcls: HashCls = "sha1",
+    partial_size: int = 64 * 1024,
+    chunk_size: int = 1024 * 1024,
+    min_size: int = 1,
+    workers: Optional[int] = None,
+    follow_symlinks: bool = False,
+    errorfunc: Callable[[MyDirEntryT, Exception], None] = scandir_error_log,
+    stats: Optional[DuplicateStats] = None,
+) -> Iterator[List[str]]:
+    """Finds files with the same contents in the directories `paths` and yields lists of their paths.
+
+    To avoid reading most of the data, files are first grouped by size. Files in groups with more than one member
+    are hashed using only their first and last `partial_size` bytes. Only files which still share a group
+    are hashed completely. Files which are not larger than `2 * partial_size` are fully hashed in the second stage
+    and thus skip the last one. Hashing is done using a pool of `workers` threads.
+
+    `min_size`: Ignore files smaller than this. By default empty files are ignored.
+    `stats`: If given, it's updated with the number of bytes read in each stage.
+    """
+
+    stats = stats or DuplicateStats()
+
+    sizes: Dict[int, List[str]] = defaultdict(list)
+    for path in paths:
+        for entry in scandir_rec(path, files=True, follow_symlinks=follow_symlinks, errorfunc=errorfunc):
+            try:
+                size = entry.stat(follow_symlinks=follow_symlinks).st_size
+            except OSError as e:
+                errorfunc(entry, e)
+                continue
+
+            stats.files += 1
+            stats.total_bytes += size
+            if size >= min_size:
+                sizes[size].append(entry.path)
+
+    size_groups = [(size, group) for size, group in sizes.items() if len(group) > 1]
+    del sizes
+
+    with ThreadPoolExecutor(workers) as executor:
+        stats.size_candidates = sum(len(group) for size, group in size_groups)
+        stats.partial_bytes = sum(min(size, 2 * partial_size) * len(group) for size, group in size_groups)
+
+        partial_groups = _regroup(executor, size_groups, _partial_digest, hashcls, partial_size)
+
+        full_candidates = []
+        for (size, digest), group in partial_groups.items():
+            if len(group) < 2:
+                continue
+
+            if size <= 2 * partial_size:
+                yield group
+            else:
+                full_candidates.append(((size, digest), group))
+
+        del partial_groups
+
+        stats.full_candidates = sum(len(group) for key, group in full_candidates)
+        stats.full_bytes = sum(key[0] * len(group) for key, group in full_candidates)
+
+        full_groups = _regroup(executor, full_candidates, _full_digest, hashcls, chunk_size)
+
+        for group in full_groups.values():
+            if len(group) > 1:
+                yield group
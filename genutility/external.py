@@ -0,0 +1,231 @@
+import os
+import sys
+from itertools import chain, count
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from .exceptions import assert_choice
+from .file import copen
+from .records import DEFAULT_BUFFER_SIZE, read_length_prefixed, serializer_functions, write_length_prefixed
+
+T = TypeVar("T")
+U = TypeVar("U")
+K = TypeVar("K", bound=Hashable)
+
+DEFAULT_MAX_BYTES_TEMP = 256 * 1024 * 1024
+DEFAULT_PARTITIONS = 64
+
+# partitions which still don't fit into memory after this many levels of repartitioning are processed in memory.
+# this only happens for heavily skewed inputs, where a single key doesn't fit into memory.
+MAX_LEVELS = 4
+
+_FLUSH_ITEMS = 10000
+
+
+class _SpillContext:
+    """Creates and removes the spill files of one group-by or join operation."""
+
+    def __init__(
+        self,
+        temp_file_template: str,
+        serializer: str,
+        partitions: int,
+        max_bytes_temp: int,
+        buffer_size: int,
+    ) -> None:
+        if partitions < 2:
+            raise ValueError("partitions must be at least 2")
+
+        self.temp_file_template = temp_file_template
+        self.encode, self.decode = serializer_functions(serializer)
+        self.partitions = partitions
+        self.max_bytes_temp = max_bytes_temp
+        self.buffer_size = buffer_size
+        self.counter = count()
+        self.paths: List[str] = []
+
+    def buffer(self, pairs: Iterator[Tuple[K, T]]) -> Tuple[List[Tuple[K, T]], bool]:
+        """Consumes `pairs` until the memory budget is reached.
+        Returns the consumed pairs and whether `pairs` is exhausted.
+        """
+
+        buffered: List[Tuple[K, T]] = []
+        nbytes = 0
+        for pair in pairs:
+            buffered.append(pair)
+            nbytes += sys.getsizeof(pair[1])
+            if nbytes >= self.max_bytes_temp:
+                return buffered, False
+        return buffered, True
+
+    def partition(self, pairs: Iterable[Tuple[K, T]], level: int) -> List[str]:
+        """Distributes `pairs` to spill files by the hash of the key and returns the paths of the files.
+        Different levels use different hash functions, so oversized partitions can be split again.
+        Partitions of the same level and keys end up in files with the same index.
+        """
+
+        paths = [self.temp_file_template.format(next(self.counter)) for _ in range(self.partitions)]
+        self.paths.extend(paths)
+
+        buffers: List[List[Tuple[K, T]]] = [[] for _ in range(self.partitions)]
+        files = []
+        try:
+            for path in paths:
+                files.append(copen(path, "wb", compresslevel=1))
+
+            buffered = 0
+            for pair in pairs:
+                buffers[hash((level, pair[0])) % self.partitions].append(pair)
+                buffered += 1
+                if buffered >= _FLUSH_ITEMS:
+                    self._flush(files, buffers)
+                    buffered = 0
+            self._flush(files, buffers)
+        finally:
+            for fw in files:
+                fw.close()
+
+        return paths
+
+    def _flush(self, files: list, buffers: List[List[Tuple[K, T]]]) -> None:
+        for fw, buffer in zip(files, buffers):
+            if buffer:
+                write_length_prefixed(fw, buffer, self.encode)
+                buffer.clear()
+
+    def read(self, path: str) -> Iterator[Tuple[K, T]]:
+        """Yields the pairs of the spill file `path` and removes it afterwards."""
+
+        yield from read_length_prefixed(path, self.decode, self.buffer_size)
+        os.remove(path)
+
+    def cleanup(self) -> None:
+        for path in self.paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _groupby_pairs(ctx: _SpillContext, pairs: Iterator[Tuple[K, T]], level: int) -> Iterator[Tuple[K, List[T]]]:
+    buffered, exhausted = ctx.buffer(pairs)
+
+    if exhausted or level >= MAX_LEVELS:
+        groups: Dict[K, List[T]] = {}
+        for key, item in chain(buffered, pairs):
+            try:
+                groups[key].append(item)
+            except KeyError:
+                groups[key] = [item]
+        yield from groups.items()
+        return
+
+    paths = ctx.partition(chain(buffered, pairs), level)
+    del buffered
+    for path in paths:
+        yield from _groupby_pairs(ctx, ctx.read(path), level + 1)
+
+
+def _join_pairs(
+    ctx: _SpillContext,
+    left: Iterator[Tuple[K, T]],
+    right: Iterator[Tuple[K, U]],
+    how: str,
+    level: int,
+) -> Iterator[Tuple[T, Optional[U]]]:
+    buffered, exhausted = ctx.buffer(right)
+
+    if exhausted or level >= MAX_LEVELS:
+        table: Dict[K, List[U]] = {}
+        for key, item in chain(buffered, right):
+            try:
+                table[key].append(item)
+            except KeyError:
+                table[key] = [item]
+
+        for key, litem in left:
+            matches = table.get(key)
+            if matches:
+                for ritem in matches:
+                    yield litem, ritem
+            elif how == "left":
+                yield litem, None
+        return
+
+    right_paths = ctx.partition(chain(buffered, right), level)
+    del buffered
+    left_paths = ctx.partition(left, level)
+    for left_path, right_path in zip(left_paths, right_paths):
+        yield from _join_pairs(ctx, ctx.read(left_path), ctx.read(right_path), how, level + 1)
+
+
+def _with_keys(it: Iterable[T], key: Optional[Callable[[T], K]]) -> Iterator[Tuple[Any, T]]:
+    if key is None:
+        return ((item, item) for item in it)
+    else:
+        return ((key(item), item) for item in it)
+
+
+def external_groupby(
+    it: Iterable[T],
+    temp_file_template: str,
+    key: Optional[Callable[[T], K]] = None,
+    serializer: str = "pickle",
+    partitions: int = DEFAULT_PARTITIONS,
+    max_bytes_temp: int = DEFAULT_MAX_BYTES_TEMP,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+) -> Iterator[Tuple[K, List[T]]]:
+    """Groups the items of `it` by `key` and yields `(key, items)` tuples, where `items` is the list of items
+    with this key in input order. The order of the groups is unspecified.
+
+    If the input doesn't fit into the memory budget, it's hash-partitioned by key into spill files, which are
+    grouped one after another. Partitions which are still too large are partitioned again.
+    So only one partition, and all items of a single key, need to fit into memory.
+    Unlike grouping after `sort.external_sort_records`, the input is not sorted.
+
+    `temp_file_template`: Spill files are created by formatting it with a counter. A compressed file extension
+            like ".gz" enables fast compression. All spill files are removed afterwards.
+    `key`: Key function, which is called once per item. The keys must be hashable. Defaults to the items themselves.
+    `serializer`: "pickle" or "msgpack", see `records.serializer_functions`.
+    `partitions`: Number of spill files per partitioning step. Limits the number of open files.
+    `max_bytes_temp`: Memory budget in bytes. Only the shallow size of the items as returned by `sys.getsizeof`
+            is considered.
+    `buffer_size`: Read buffer size of the spill files.
+    """
+
+    ctx = _SpillContext(temp_file_template, serializer, partitions, max_bytes_temp, buffer_size)
+    try:
+        yield from _groupby_pairs(ctx, _with_keys(it, key), 0)
+    finally:
+        ctx.cleanup()
+
+
+def external_join(
+    left: Iterable[T],
+    right: Iterable[U],
+    temp_file_template: str,
+    left_key: Optional[Callable[[T], K]] = None,
+    right_key: Optional[Callable[[U], K]] = None,
+    how: str = "inner",
+    serializer: str = "pickle",
+    partitions: int = DEFAULT_PARTITIONS,
+    max_bytes_temp: int = DEFAULT_MAX_BYTES_TEMP,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+) -> Iterator[Tuple[T, Optional[U]]]:
+    """Equi-joins `left` and `right` on `left_key(l) == right_key(r)` and yields `(l, r)` tuples.
+    If `how` is "left", unmatched items of `left` are yielded as `(l, None)`.
+    The output order is unspecified.
+
+    `right` is the build side: if it fits into the memory budget, it's loaded into a hash table and `left`
+    is streamed through it without any spill files. Otherwise both inputs are hash-partitioned into spill files
+    and joined partition by partition (grace hash join). So `right` should be the smaller input.
+
+    See `external_groupby` for the other arguments.
+    """
+
+    assert_choice("how", how, {"inner", "left"})
+
+    ctx = _SpillContext(temp_file_template, serializer, partitions, max_bytes_temp, buffer_size)
+    try:
+        yield from _join_pairs(ctx, _with_keys(left, left_key), _with_keys(right, right_key), how, 0)
+    finally:
+        ctx.cleanup()
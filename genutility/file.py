@@ -1,6 +1,6 @@
 import os
 import os.path
-from io import BufferedIOBase, RawIOBase, TextIOBase, TextIOWrapper
+from io import BufferedIOBase, BufferedReader, RawIOBase, TextIOBase, TextIOWrapper
 from mmap import mmap
 from os import SEEK_END, SEEK_SET
 from pathlib import Path
@@ -125,7 +125,27 @@ def wrap_text(bf, mode, encoding, errors, newline):
 
 
 def will_compress(suffix: str) -> bool:
-    return suffix in (".gz", ".bz2", ".zip")
+    return suffix in (".gz", ".bz2", ".zip", ".zst", ".lz4")
+
+
+def _bz2_reader(file: Union[PathType, IO[bytes]], closefd: bool) -> IO[bytes]:
+    """Opens `file` for reading with `bz2.BZ2File`, which only closes the files it opened itself.
+    If `closefd` is True, a file object `file` is closed together with the returned file.
+    """
+
+    import bz2
+
+    if isinstance(file, (str, os.PathLike)) or not closefd:
+        return bz2.open(file, "rb")
+
+    class ClosingBZ2File(bz2.BZ2File):
+        def close(self) -> None:
+            try:
+                super().close()
+            finally:
+                file.close()
+
+    return ClosingBZ2File(file, "rb")
 
 
 def copen(
@@ -138,6 +158,7 @@ def copen(
     compresslevel: int = 9,
     ext: Optional[str] = None,
     handle_archives: bool = True,
+    threads: int = 0,
 ) -> IO:
     """Generic file open method. It supports transparent compression and improved text-mode handling.
 
@@ -147,10 +168,16 @@ def copen(
     `encoding`: if `None` it defaults to "utf-8" in text-mode. It doesn't use any locale.
     `compresslevel`: 0-9, 0: no compression, 1: least, 9: highest compression.
             Only used if a compressed format is specified.
-    `ext`: if `file` is a file-like object, than this can be one of {".gz", ".bz2", ".zip"}
+            For zstd (1-22) and lz4 (0-16) the value is passed as is, where 0 selects the default level.
+    `ext`: if `file` is a file-like object, than this can be one of {".gz", ".bz2", ".zip", ".zst", ".lz4"}
             to enable transparent compression
     `handle_archives`: Allow transparent handling of archives. Defaults to `True`.
         If `archive_file` is not given for archives which require it, the archive file will be treated as a normal file.
+    `threads`: Number of compression worker threads for zstd, gzip and bzip2. 0 compresses in the calling thread,
+            -1 uses all logical cores. gzip files written by `compression.ParallelGzipWriter(multi_member=True)`
+            are also decompressed in parallel.
+
+    zstd and lz4 require the optional `zstandard` and `lz4` packages.
 
     Returns a file-like object. If `file` was a fd,
             it will be closed when the file-like object is closed.
@@ -161,6 +188,8 @@ def copen(
     if archive_file is not None and handle_archives is False:
         raise ValueError("handle_archives must be True to allow archive_file to be used")
 
+    closefd = isinstance(file, (str, os.PathLike, int))
+
     if isinstance(file, (str, os.PathLike)):
         ext = os.path.splitext(file)[1].lower()
     elif isinstance(file, int):
@@ -176,7 +205,26 @@ def copen(
     if handle_archives:
         # fixme: if file is a file-like object, it needs to be in binary mode here
 
-        if ext == ".gz":
+        if ext in (".gz", ".bz2") and threads != 0:
+            from .compression import ParallelBz2Writer, ParallelGzipReader, ParallelGzipWriter
+
+            newmode = _stripmode(mode)
+            if "r" in newmode and ext == ".bz2":  # bz2 decompression is not parallelized
+                return wrap_text(_bz2_reader(file, closefd), mode, encoding, errors, newline)
+
+            if isinstance(file, (str, os.PathLike)):
+                file = open(file, newmode + "b")
+
+            if "r" in newmode:
+                bf = ParallelGzipReader(file, threads, closefd)
+            elif ext == ".gz":
+                bf = ParallelGzipWriter(file, compresslevel, threads, closefd=closefd)
+            else:
+                bf = ParallelBz2Writer(file, compresslevel, threads, closefd=closefd)
+
+            return wrap_text(bf, mode, encoding, errors, newline)
+
+        elif ext == ".gz":
             import gzip
 
             return gzip.open(file, mode, compresslevel=compresslevel, encoding=encoding, errors=errors, newline=newline)
@@ -186,6 +234,25 @@ def copen(
 
             return bz2.open(file, mode, compresslevel=compresslevel, encoding=encoding, errors=errors, newline=newline)
 
+        elif ext == ".zst":
+            import zstandard
+
+            newmode = _stripmode(mode) + "b"
+            if "r" in newmode:
+                bf: IO = BufferedReader(zstandard.open(file, newmode, closefd=closefd))  # adds `peek()`
+            else:
+                cctx = zstandard.ZstdCompressor(level=compresslevel, threads=threads)
+                bf = zstandard.open(file, newmode, cctx=cctx, closefd=closefd)
+
+            return wrap_text(bf, mode, encoding, errors, newline)
+
+        elif ext == ".lz4":
+            import lz4.frame
+
+            return lz4.frame.open(
+                file, mode, compression_level=compresslevel, encoding=encoding, errors=errors, newline=newline
+            )
+
         elif ext == ".zip" and archive_file:
             from zipfile import ZipFile
 
@@ -2,8 +2,9 @@ import logging
 import os
 import os.path
 import sqlite3
+import stat
 import warnings
-from collections import UserDict
+from contextlib import contextmanager
 from functools import lru_cache
 from itertools import chain, repeat
 from pathlib import Path
@@ -27,10 +28,22 @@ from typing import (
 from tls_property import tls_property
 from typing_extensions import Self
 
+from ._files import PathType
+from .callbacks import Progress
+from .datetime import datetime_from_utc_timestamp
 from .exceptions import NoResult
-from .filesystem import EntryType, normalize_seps
+from .filesystem import (
+    EntryType,
+    FileProperties,
+    long_path_support,
+    normalize_seps,
+    scandir_error_log,
+    scandir_rec,
+)
+from .iter import batch
 from .sql import fetchone, iterfetch
-from .sqlite import quote_identifier
+from .sqlite import QueryProfiler, ReadConnectionPool, max_variable_number, quote_identifier, set_pragmas
+from .time import MeasureTime
 from .typing import HashableContainer
 
 logger = logging.getLogger(__name__)
@@ -38,13 +51,36 @@ logger = logging.getLogger(__name__)
 T = TypeVar("T")
 
 
-class Keys(UserDict):
-    def __hash__(self):
-        return hash(tuple(self))
+# trade durability for speed during bulk ingestion. In WAL mode, readers aren't blocked by the writer
+# and with `synchronous=NORMAL` a power loss can only lose the last transactions, but not corrupt the database.
+INGEST_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -64 * 1024,  # KiB
+}
+
+
+class IngestStats:
+    __slots__ = ("rows", "seconds")
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        if self.seconds == 0.0:
+            return 0.0
+        return self.rows / self.seconds
+
+    def __repr__(self) -> str:
+        return f"IngestStats(rows={self.rows}, seconds={self.seconds:.3f}, rows_per_sec={self.rows_per_sec:.0f})"
 
 
 class GenericDb:
     order_col = "_order"
+    max_rows_per_statement = 500
 
     def _filtered_derived(self, derived: Collection[str], select: str) -> Iterable[Tuple[str, str, str]]:
         if select == "null":
@@ -82,7 +118,20 @@ class GenericDb:
         )
         return sql
 
-    def __init__(self, dbpath: Union[str, os.PathLike], table: str, debug: bool = True, allow_add: bool = True) -> None:
+    def __init__(
+        self,
+        dbpath: Union[str, os.PathLike],
+        table: str,
+        debug: bool = True,
+        allow_add: bool = True,
+        readers: int = 0,
+    ) -> None:
+        """`readers`: If larger than 0, the database is switched to WAL mode and read queries
+        (`get`, `get_latest`, `get_latest_many`, `iter`, `len` and `bool`) are served by a pool of up to `readers`
+        read-only connections shared by all threads. They can run in parallel to each other and to a writer,
+        but only see committed data. Writes use the connection of the current thread.
+        """
+
         if sqlite3.sqlite_version_info < (3, 35, 0):
             warnings.warn(
                 f"SQLite version 3.35.0 or higher required for some features (current version {sqlite3.sqlite_version}). ",
@@ -96,6 +145,8 @@ class GenericDb:
         self._derived = self.derived()
 
         self.dbpath = dbpath
+        self.readers = readers
+        self.profiler: Optional[QueryProfiler] = None
         self.setup()
 
         if logger.isEnabledFor(logging.DEBUG):
@@ -123,7 +174,45 @@ class GenericDb:
             else:
                 raise ValueError(f"Database is missing columns: {', '.join(missing_cols)}")
 
-        self._get_latest_sql = lru_cache(maxsize=128)(self._get_latest_sql)  # type: ignore[assignment,method-assign]
+        self._create_indexes()
+        self._cache_sql()
+        self._setup_readers()
+
+    def _setup_readers(self) -> None:
+        self._pool: Optional[ReadConnectionPool] = None
+        if self.readers > 0:
+            if os.fspath(self.dbpath) == ":memory:":
+                raise ValueError("In-memory databases cannot be shared with readers")
+            set_pragmas(self.cursor, {"journal_mode": "WAL"})
+            self._pool = ReadConnectionPool(
+                os.fspath(self.dbpath), self.readers, self._on_connect, detect_types=sqlite3.PARSE_DECLTYPES
+            )
+
+    def _on_connect(self, connection: sqlite3.Connection) -> None:
+        if logger.isEnabledFor(logging.DEBUG):
+            connection.set_trace_callback(self.trace)
+
+    @contextmanager
+    def read_cursor(self) -> Iterator[sqlite3.Cursor]:
+        """Context manager which yields a cursor for read-only queries.
+        It uses a pooled read-only connection if `readers` was given and the connection of the current thread otherwise.
+        """
+
+        if self._pool is None:
+            yield self.cursor
+        else:
+            with self._pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    yield cursor
+                finally:
+                    cursor.close()
+
+    def _cache_sql(self) -> None:
+        self._get_latest_sql = lru_cache(maxsize=128)(self._get_latest_sql)  # type: ignore[method-assign]
+        self._get_latest_many_sql = lru_cache(maxsize=128)(self._get_latest_many_sql)  # type: ignore[method-assign]
+        self._add_file_query = lru_cache(maxsize=128)(self._add_file_query)  # type: ignore[method-assign]
+        self._add_file_no_dup_sql = lru_cache(maxsize=128)(self._add_file_no_dup_sql)  # type: ignore[method-assign]
 
     @tls_property
     def connection(self):
@@ -174,11 +263,46 @@ class GenericDb:
 
         return []
 
+    @classmethod
+    def indexes(cls) -> List[Tuple[str, ...]]:
+        """Secondary indexes given as tuples of column names.
+        Missing indexes are created when the database is opened.
+        """
+
+        return []
+
+    def _index_name(self, columns: Tuple[str, ...]) -> str:
+        return quote_identifier("_".join((self.table[1:-1],) + columns))
+
+    def _create_indexes(self) -> None:
+        for columns in self.indexes():
+            sql = f"CREATE INDEX IF NOT EXISTS {self._index_name(columns)} ON {self.table} ({', '.join(columns)})"
+            self.cursor.execute(sql)
+        self.commit()
+
+    def enable_profiling(self, warn_scans: bool = True) -> QueryProfiler:
+        """Captures the query plans and latencies of the queries executed from now on.
+        If `warn_scans` is True, a `sqlite.FullTableScanWarning` is issued the first time a lookup query
+        reads the whole table, which usually means an index is missing, see `indexes()`.
+        """
+
+        self.profiler = QueryProfiler({self.table[1:-1], "t"}, warn_scans)
+        return self.profiler
+
+    def _execute(
+        self, cursor: sqlite3.Cursor, sql: str, args: Sequence[Any] = (), scan_ok: bool = False
+    ) -> sqlite3.Cursor:
+        if self.profiler is None:
+            return cursor.execute(sql, args)
+        return self.profiler.execute(cursor, sql, args, scan_ok)
+
     def close(self) -> None:
-        """Only closes connections and cursors opened in the current thread"""
+        """Only closes connections and cursors opened in the current thread and the pooled read-only connections"""
 
         self.cursor.close()
         self.connection.close()
+        if self._pool is not None:
+            self._pool.close()
 
     def setup(self) -> None:
         fields = ", ".join(f"{n} {t}" for n, t, v in chain(self._primary, self._auto, self._mandatory, self._derived))
@@ -224,21 +348,61 @@ class GenericDb:
     def iter(
         self, only: HashableContainer[str] = frozenset(), no: HashableContainer[str] = frozenset()
     ) -> Iterator[tuple]:
-        if only and no:
-            raise ValueError("Only `only` or `no` can be specified")
+        for rows in self.iter_batches(only, no):
+            yield from rows
 
-        if only:
-            fields = ", ".join(
-                n for n, t, v in chain(self._primary, self._auto, self._mandatory, self._derived) if n in only
-            )
-        else:
-            fields = ", ".join(
-                n for n, t, v in chain(self._primary, self._auto, self._mandatory, self._derived) if n not in no
-            )
+    def iter_batches(
+        self,
+        only: HashableContainer[str] = frozenset(),
+        no: HashableContainer[str] = frozenset(),
+        batchsize: int = 1000,
+    ) -> Iterator[List[tuple]]:
+        """Like `iter`, but yields lists of at most `batchsize` rows.
+        Every batch is queried separately by rowid, so no read connection is held while the batches are consumed.
+        """
 
-        sql = f"SELECT {fields} FROM {self.table}"  # nosec
-        self.cursor.execute(sql)
-        return iterfetch(self.cursor)
+        fields = ", ".join(self._get_fields(only, no))
+        sql = f"SELECT rowid, {fields} FROM {self.table} WHERE rowid > ? ORDER BY rowid LIMIT ?"  # nosec
+        last = -(2**63)
+        while True:
+            with self.read_cursor() as cursor:
+                self._execute(cursor, sql, (last, batchsize))
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            yield [row[1:] for row in rows]
+            if len(rows) < batchsize:
+                break
+
+    def export_parquet(
+        self,
+        path: PathType,
+        only: HashableContainer[str] = frozenset(),
+        no: HashableContainer[str] = frozenset(),
+        row_group_size: int = 64 * 1024,
+        compression: str = "zstd",
+        progress: Optional[Progress] = None,
+    ) -> int:
+        """Streams the selected columns of all rows to the Parquet file `path`, one row group of `row_group_size` rows
+        at a time. The Arrow types are derived from the declared column types. Requires `pyarrow`.
+
+        Returns the number of exported rows.
+        """
+
+        from .parquet import sql_type_to_arrow, write_parquet_batches
+
+        fields = self._get_fields(only, no)
+        decltypes = {n: t for n, t, v in chain(self._primary, self._auto, self._mandatory, self._derived)}
+        types = {n: sql_type_to_arrow(decltypes[n]) for n in fields}
+        return write_parquet_batches(
+            path,
+            self.iter_batches(only, no, row_group_size),
+            fields,
+            types=types,
+            compression=compression,
+            progress=progress,
+        )
 
     def _get_latest(
         self,
@@ -261,40 +425,30 @@ class GenericDb:
         """
 
         derived = derived or {}
-        sql = self._get_latest_sql(Keys(derived), ignore_null, only, no)
+        sql = self._get_latest_sql(frozenset(derived), ignore_null, only, no)
         args = self._args(mandatory, derived, ignore_null)
-        self.cursor.execute(sql, args)
-        return fetchone(self.cursor)
+        with self.read_cursor() as cursor:
+            self._execute(cursor, sql, args)
+            return fetchone(cursor)
 
-    def get_latest_many(
+    def _get_latest_many_sql(
         self,
-        mandatory: Iterable[Sequence[Any]],
+        derived_names: Tuple[str, ...],
+        ignore_null: bool,
+        only: HashableContainer[str],
+        no: HashableContainer[str],
         total: int,
-        derived_names: Optional[Tuple[str, ...]] = None,
-        derived: Optional[Iterable[Dict[str, Any]]] = None,
-        ignore_null: bool = True,
-        only: HashableContainer[str] = frozenset(),
-        no: HashableContainer[str] = frozenset(),
-    ) -> Iterator[tuple]:
-        """Retrieve multiple latest rows based on mandatory and derived information.
-        `derived_names` must be equal to the keys of the `derived` dicts.
-
-        See `_get_latest` for more details.
-        """
-
+    ) -> str:
         # This function creates a join table to match multiple values at once
         # and also allow carrying the input order over to the output.
         # Another implementation could use `WHERE (x1 AND y1) OR (x2 AND y2)`,
         # but this way doesn't easily support sorting.
 
-        derived_names = derived_names or ()
-        derived = derived or {}
-
         _derived = self._filtered_derived(derived_names, "not-null" if ignore_null else "all")
         affected_fields = [n for n, t, v in chain(self._mandatory, _derived)]
         group_by = ", ".join(affected_fields)
-        vars = len(affected_fields)
-        values = ", ".join(f"({i}, {', '.join(repeat('?', vars))})" for i in range(total))
+        num_vars = len(affected_fields)
+        values = ", ".join(f"({i}, {', '.join(repeat('?', num_vars))})" for i in range(total))
         select = ", ".join(f"t.{n}" for n in self._get_fields(only, no))
         join_on = " AND ".join(f"c.{n} = t.{n}" for n in affected_fields)
         join_group_by = ", ".join(f"t.{n}" for n in affected_fields)
@@ -308,20 +462,50 @@ class GenericDb:
             ORDER BY c.{self.order_col}  -- order rows according to input order
         """  # nosec
 
-        args = tuple(chain.from_iterable(self._args_many(mandatory, derived, ignore_null)))
+        return sql
 
-        self.cursor.execute(sql, args)
+    def get_latest_many(
+        self,
+        mandatory: Iterable[Sequence[Any]],
+        total: int,
+        derived_names: Optional[Tuple[str, ...]] = None,
+        derived: Optional[Iterable[Dict[str, Any]]] = None,
+        ignore_null: bool = True,
+        only: HashableContainer[str] = frozenset(),
+        no: HashableContainer[str] = frozenset(),
+    ) -> Iterator[tuple]:
+        """Retrieve multiple latest rows based on mandatory and derived information.
+        `derived_names` must be equal to the keys of the `derived` dicts.
+        `total` is the number of rows in `mandatory`. The rows are queried in chunks
+        which don't exceed the maximum number of SQL variables.
+
+        See `_get_latest` for more details.
+        """
+
+        derived_names = tuple(derived_names or ())
+        derived = derived or {}
+
+        _derived = self._filtered_derived(derived_names, "not-null" if ignore_null else "all")
+        num_vars = len(self._mandatory) + sum(1 for _ in _derived)
+        chunk_size = max(1, min(total, max_variable_number(self.connection) // num_vars))
 
-        return iterfetch(self.cursor)
+        for chunk in batch(self._args_many(mandatory, derived, ignore_null), chunk_size, list):
+            sql = self._get_latest_many_sql(derived_names, ignore_null, only, no, len(chunk))
+            # fetch the chunk at once, so no read connection is held while the rows are consumed
+            with self.read_cursor() as cursor:
+                self._execute(cursor, sql, tuple(chain.from_iterable(chunk)))
+                rows = cursor.fetchall()
+            yield from rows
 
     def _filtered_values_str(self, derived, ignore_null: bool):
         return
 
-    def _add_file_query(self, derived_names: Optional[Tuple[str, ...]] = None, replace: bool = True) -> str:
+    def _add_file_query(self, derived_names: HashableContainer[str] = (), replace: bool = True, rows: int = 1) -> str:
         _derived = list(self._filtered_derived(derived_names, "not-null"))
         affected_fields = [n for n, t, v in chain(self._auto, self._mandatory, _derived)]
         fields = ", ".join(affected_fields)
-        values = ", ".join(v for n, t, v in chain(self._auto, self._mandatory, _derived))
+        row = ", ".join(v for n, t, v in chain(self._auto, self._mandatory, _derived))
+        values = "), (".join(repeat(row, rows))
 
         if replace:
             sql = f"REPLACE INTO {self.table} ({fields}) VALUES ({values})"
@@ -350,10 +534,10 @@ class GenericDb:
         not given derived values will be reset to zero.  This makes sure out-dated values are removed.
         """
 
-        sql = self._add_file_query(derived, replace)
+        sql = self._add_file_query(frozenset(derived), replace)
         args = self._args(mandatory, derived, ignore_null=True)
 
-        assert self.cursor.execute(sql, args).rowcount == 1
+        assert self._execute(self.cursor, sql, args).rowcount == 1
 
     def _add_file_many(
         self,
@@ -368,10 +552,73 @@ class GenericDb:
         See `_add_file` for more details.
         """
 
-        sql = self._add_file_query(derived_names, replace)
+        sql = self._add_file_query(tuple(derived_names or ()), replace)
         args = self._args_many(mandatory, derived, ignore_null=True)
         self.cursor.executemany(sql, args)
 
+    def bulk_add(
+        self,
+        mandatory: Iterable[Sequence[Any]],
+        derived_names: Optional[Tuple[str, ...]] = None,
+        derived: Optional[Iterable[Dict[str, Any]]] = None,
+        replace: bool = True,
+        batch_size: int = 100000,
+        pragmas: Optional[Dict[str, Any]] = INGEST_PRAGMAS,
+        progress: Optional[Progress] = None,
+    ) -> IngestStats:
+        """Replace or upsert a large number of files, see `_add_file_many`.
+        `derived_names` must be equal to the keys of the `derived` dicts.
+
+        Every `batch_size` rows are written in one transaction using multi-row statements,
+        which are limited by the maximum number of SQL variables. `pragmas` are set before ingestion
+        and persist for the connection. The default enables WAL mode, which unlike the other pragmas
+        is stored in the database file and persists for all future connections.
+
+        Returns the number of rows and the time it took.
+        """
+
+        derived_names = tuple(derived_names or ())
+        progress = progress or Progress()
+        stats = IngestStats()
+
+        if pragmas:
+            self.commit()  # some pragmas cannot be changed within a transaction
+            set_pragmas(self.cursor, pragmas)
+
+        num_vars = len(self._mandatory) + len(list(self._filtered_derived(derived_names, "not-null")))
+        rows_per_statement = max(1, min(self.max_rows_per_statement, max_variable_number(self.connection) // num_vars))
+
+        with MeasureTime() as m:
+            self.commit()
+            for rows in batch(progress.track(self._args_many(mandatory, derived, ignore_null=True)), batch_size, list):
+                self.cursor.execute("BEGIN TRANSACTION")
+                try:
+                    for i in range(0, len(rows), rows_per_statement):
+                        chunk = rows[i : i + rows_per_statement]
+                        sql = self._add_file_query(derived_names, replace, len(chunk))
+                        self.cursor.execute(sql, tuple(chain.from_iterable(chunk)))
+                    self.commit()
+                except BaseException:
+                    self.connection.rollback()
+                    raise
+
+                stats.rows += len(rows)
+                stats.seconds = m.get()
+                logger.debug("Ingested %d rows (%.0f rows/s)", stats.rows, stats.rows_per_sec)
+
+        stats.seconds = m.get()
+        logger.info("Ingested %d rows in %.1f seconds (%.0f rows/s)", stats.rows, stats.seconds, stats.rows_per_sec)
+        return stats
+
+    def _add_file_no_dup_sql(self, derived_keys: Collection[str], ignore_null: bool) -> str:
+        _derived = list(self._filtered_derived(derived_keys, "not-null" if ignore_null else "all"))
+        fields = ", ".join(n for n, t, v in chain(self._auto, self._mandatory, _derived))
+        values = ", ".join(v for n, t, v in chain(self._auto, self._mandatory, _derived))
+        conditions = " AND ".join(f"{n} IS ?" for n, t, v in chain(self._mandatory, _derived))
+
+        sql = f"REPLACE INTO {self.table} ({fields}) SELECT {values} WHERE NOT EXISTS (SELECT 1 FROM {self.table} WHERE {conditions})"  # nosec
+        return sql
+
     def _add_file_no_dup(
         self,
         mandatory: Sequence[Any],
@@ -383,15 +630,10 @@ class GenericDb:
         """
 
         derived = derived or {}
-        _derived = list(self._filtered_derived(derived, "not-null" if ignore_null else "all"))
-        fields = ", ".join(n for n, t, v in chain(self._auto, self._mandatory, _derived))
-        values = ", ".join(v for n, t, v in chain(self._auto, self._mandatory, _derived))
-        conditions = " AND ".join(f"{n} IS ?" for n, t, v in chain(self._mandatory, _derived))
-
-        sql = f"REPLACE INTO {self.table} ({fields}) SELECT {values} WHERE NOT EXISTS (SELECT 1 FROM {self.table} WHERE {conditions})"  # nosec
+        sql = self._add_file_no_dup_sql(frozenset(derived), ignore_null)
         args = self._args(mandatory, derived, ignore_null) * 2
 
-        return self.cursor.execute(sql, args).rowcount == 1
+        return self._execute(self.cursor, sql, args).rowcount == 1
 
         """ fixme: benchmark if this is really slower
         try:
@@ -405,14 +647,16 @@ class GenericDb:
 
     def __len__(self) -> int:
         sql = f"SELECT count(*) FROM {self.table}"  # nosec
-        self.cursor.execute(sql)
-        (result,) = fetchone(self.cursor)
+        with self.read_cursor() as cursor:
+            self._execute(cursor, sql, scan_ok=True)
+            (result,) = fetchone(cursor)
         return result
 
     def __bool__(self) -> bool:
         sql = f"SELECT EXISTS (SELECT 1 FROM {self.table})"  # nosec
-        self.cursor.execute(sql)
-        (result,) = fetchone(self.cursor)
+        with self.read_cursor() as cursor:
+            self._execute(cursor, sql, scan_ok=True)
+            (result,) = fetchone(cursor)
         return result == 1
 
     def __enter__(self) -> Self:
@@ -428,12 +672,15 @@ class GenericDb:
 
     def __getstate__(self):
         state = self.__dict__.copy()
-        del state["_get_latest_sql"]
+        for name in ("_get_latest_sql", "_get_latest_many_sql", "_add_file_query", "_add_file_no_dup_sql", "_pool"):
+            del state[name]
+        state["profiler"] = None
         return state
 
     def __setstate__(self, state):
         self.__dict__.update(state)
-        self._get_latest_sql = lru_cache(maxsize=128)(self._get_latest_sql)
+        self._cache_sql()
+        self._setup_readers()
 
 
 class GenericFileDb(GenericDb):
@@ -532,6 +779,10 @@ class FileDbHistory(GenericFileDb):
             ("mod_date", "INTEGER", "?"),
         ]
 
+    @classmethod
+    def indexes(cls):
+        return [("path",)]
+
     def normalize_mandatory(self, mandatory: Sequence) -> Sequence:
         path, filesize, mod_date = mandatory
         drive, path = os.path.splitdrive(mandatory[0])
@@ -590,8 +841,15 @@ def uint64_from_bytes(blob: bytes) -> int:
 
 
 class FileDbWithId(GenericFileDb):
-    def __init__(self, dbpath: Union[str, os.PathLike], table: str, debug: bool = True, allow_add: bool = True) -> None:
-        GenericFileDb.__init__(self, dbpath, table, debug, allow_add)
+    def __init__(
+        self,
+        dbpath: Union[str, os.PathLike],
+        table: str,
+        debug: bool = True,
+        allow_add: bool = True,
+        readers: int = 0,
+    ) -> None:
+        GenericFileDb.__init__(self, dbpath, table, debug, allow_add, readers)
         sqlite3.register_adapter(Uint64, uint64_to_bytes)
         sqlite3.register_converter("uint64", uint64_from_bytes)
 
@@ -651,3 +909,206 @@ class FileDbWithId(GenericFileDb):
         self._add_file(mandatory, derived, replace)
         if commit:
             self.commit()
+
+
+class FileDbSnapshot(GenericFileDb):
+    """Stores the state of directory trees to detect changes between runs.
+
+    Files and directories are stored with their size, modification time and inode. When a tree is updated,
+    directories whose modification time didn't change are not listed again. Their children are taken
+    from the database instead and only subdirectories are stat'ed. Because the modification time of a directory
+    only changes when entries are added, removed or renamed, files which are modified in-place are only
+    detected with `rescan=True`.
+
+    Symlinks are not followed and stored as files. Subclasses which add derived fields
+    should extend the fields of this class.
+    """
+
+    def __init__(
+        self,
+        dbpath: Union[str, os.PathLike],
+        table: str,
+        debug: bool = True,
+        allow_add: bool = True,
+        readers: int = 0,
+    ) -> None:
+        GenericFileDb.__init__(self, dbpath, table, debug, allow_add, readers)
+        sqlite3.register_adapter(Uint64, uint64_to_bytes)
+        sqlite3.register_converter("uint64", uint64_from_bytes)
+
+    @classmethod
+    def primary(cls):
+        return []
+
+    @classmethod
+    def auto(cls):
+        return [
+            ("entry_date", "DATETIME", "datetime('now')"),
+        ]
+
+    @classmethod
+    def mandatory(cls):
+        return [
+            ("path", "VARCHAR(256) NOT NULL PRIMARY KEY", "?"),
+            ("filesize", "INTEGER", "?"),
+            ("mod_date", "INTEGER", "?"),
+        ]
+
+    @classmethod
+    def derived(cls):
+        return [
+            ("inode", "uint64", "?"),
+            ("isdir", "INTEGER", "?"),
+            ("parent", "VARCHAR(256)", "?"),
+        ]
+
+    @classmethod
+    def indexes(cls):
+        return [("parent",)]
+
+    def _row(self, path: str) -> Optional[tuple]:
+        sql = f"SELECT path, filesize, mod_date, inode, isdir FROM {self.table} WHERE path = ?"  # nosec
+        self._execute(self.cursor, sql, (path,))
+        try:
+            return fetchone(self.cursor)
+        except NoResult:
+            return None
+
+    def _children(self, path: str) -> Dict[str, tuple]:
+        sql = f"SELECT path, filesize, mod_date, inode, isdir FROM {self.table} WHERE parent = ?"  # nosec
+        self._execute(self.cursor, sql, (path,))
+        return {row[0]: row for row in iterfetch(self.cursor)}
+
+    def _remove_tree(self, row: tuple) -> Iterator[tuple]:
+        """Removes `row` and all its descendants from the database and yields the removed rows."""
+
+        removed = [row]
+        stack = [row]
+        while stack:
+            path, filesize, mod_date, inode, isdir = stack.pop()
+            if isdir:
+                children = list(self._children(path).values())
+                removed.extend(children)
+                stack.extend(children)
+
+        sql = f"DELETE FROM {self.table} WHERE path = ?"  # nosec
+        self.cursor.executemany(sql, ((r[0],) for r in removed))
+        return iter(removed)
+
+    def _upsert(self, rows: List[Tuple[str, os.stat_result, Optional[str]]]) -> None:
+        mandatory = [(path, stats.st_size, stats.st_mtime_ns) for path, stats, parent in rows]
+        derived = [
+            {"inode": Uint64(stats.st_ino), "isdir": stat.S_ISDIR(stats.st_mode), "parent": parent}
+            for path, stats, parent in rows
+        ]
+        self._add_file_many(mandatory, ("inode", "isdir", "parent"), derived)
+
+    def update(
+        self,
+        path: Union[str, os.PathLike],
+        rescan: bool = False,
+        errorfunc: Callable[[os.DirEntry, Exception], None] = scandir_error_log,
+    ) -> Iterator[Tuple[str, FileProperties]]:
+        """Updates the snapshot of the tree at `path` and yields `(event, FileProperties)` tuples
+        where event is one of "added", "modified" or "removed". Directories are only reported
+        when they are added or removed. The first update of a tree reports all entries as added.
+
+        `rescan`: List all directories, not only the ones with a changed modification time.
+        `errorfunc`: Called for errors during the directory listing. Directories which cannot be listed
+            are kept unchanged in the database.
+
+        The changes are committed when the iterator is exhausted and rolled back if it's closed early.
+        """
+
+        root = long_path_support(os.path.abspath(path))
+        rootstats = os.stat(root)
+        if not stat.S_ISDIR(rootstats.st_mode):
+            raise NotADirectoryError(root)
+
+        def props(row: tuple) -> FileProperties:
+            _path, filesize, mod_date, inode, isdir = row
+            return FileProperties(
+                relpath=os.path.relpath(_path, root),
+                size=filesize,
+                isdir=bool(isdir),
+                abspath=_path,
+                id=inode,
+                modtime=datetime_from_utc_timestamp(mod_date / 10**9),
+            )
+
+        def newrow(_path: str, stats: os.stat_result) -> tuple:
+            return (_path, stats.st_size, stats.st_mtime_ns, stats.st_ino, stat.S_ISDIR(stats.st_mode))
+
+        failed = False
+
+        def _errorfunc(entry: os.DirEntry, exception: Exception) -> None:
+            nonlocal failed
+            failed = True
+            errorfunc(entry, exception)
+
+        stack: List[Tuple[str, os.stat_result, Optional[tuple]]] = [(root, rootstats, self._row(root))]
+
+        try:
+            while stack:
+                dirpath, dirstats, oldrow = stack.pop()
+                oldchildren = self._children(dirpath)
+
+                if not rescan and oldrow is not None and oldrow[2] == dirstats.st_mtime_ns:
+                    subdirs = []
+                    try:
+                        for row in oldchildren.values():
+                            if row[4]:
+                                subdirs.append((row[0], os.stat(row[0], follow_symlinks=False), row))
+                    except FileNotFoundError:
+                        # the modification time was not updated, maybe because of a coarse timestamp resolution
+                        pass
+                    else:
+                        stack.extend(subdirs)
+                        continue
+
+                failed = False
+                current: Dict[str, os.stat_result] = {}
+                for entry in scandir_rec(
+                    dirpath, files=True, dirs=True, others=True, rec=False, follow_symlinks=False, errorfunc=_errorfunc
+                ):
+                    try:
+                        current[entry.path] = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        _errorfunc(entry, e)
+
+                if failed:
+                    continue
+
+                for _path, row in oldchildren.items():
+                    stats = current.get(_path)
+                    if stats is None or bool(row[4]) != stat.S_ISDIR(stats.st_mode):
+                        for removed in self._remove_tree(row):
+                            yield "removed", props(removed)
+
+                changed = []
+                for _path, stats in current.items():
+                    row = oldchildren.get(_path)
+                    isdir = stat.S_ISDIR(stats.st_mode)
+
+                    if row is None or bool(row[4]) != isdir:
+                        yield "added", props(newrow(_path, stats))
+                        row = None
+                    elif not isdir and row[1:4] != (stats.st_size, stats.st_mtime_ns, stats.st_ino):
+                        yield "modified", props(newrow(_path, stats))
+
+                    # directory rows are only updated after they were listed successfully
+                    if isdir:
+                        stack.append((_path, stats, row))
+                    elif row is None or row[1:4] != (stats.st_size, stats.st_mtime_ns, stats.st_ino):
+                        changed.append((_path, stats, dirpath))
+
+                self._upsert(changed)
+                self._upsert([(dirpath, dirstats, None if dirpath == root else os.path.dirname(dirpath))])
+
+        except BaseException:
+            self.connection.rollback()
+            raise
+
+        self.commit()
@@ -6,18 +6,21 @@ import platform
 import re
 import shutil
 import stat
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 from fnmatch import fnmatch
 from functools import partial
-from itertools import chain, zip_longest
+from itertools import chain, count, islice, zip_longest
 from operator import attrgetter
 from pathlib import Path, PurePath
-from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from typing_extensions import Self
 
 from ._files import BaseDirEntry, MyDirEntryT, PathType, entrysuffix, to_dos_device_path
 from .datetime import datetime_from_utc_timestamp
+from .exceptions import assert_choice
 from .file import FILE_IO_BUFFER_SIZE, equal_files, iterfilelike
 from .iter import is_empty
 from .ops import logical_implication
@@ -352,89 +355,138 @@ def _is_loop(rootentry: os.DirEntry, entry: os.DirEntry, is_link: bool, loops: O
     return False
 
 
-def _scandir_rec_skippable(
+def _close_frame(frame: List[Any]) -> None:
+    if frame[2] is not None:
+        frame[2].close()
+        frame[2] = None
+
+
+def _scandir_iter(
     rootentry: os.DirEntry,
     files: bool = True,
+    dirs: bool = False,
     others: bool = False,
+    rec: bool = True,
     follow_symlinks: bool = True,
     prevent_loops_set: Optional[Set[str]] = None,
     errorfunc: Callable[[os.DirEntry, Exception], None] = scandir_error_raise,
-) -> Iterator[MyDirEntry]:
-    is_link = False
+    skippable: bool = False,
+    order: str = "dfs",
+    max_open_dirs: Optional[int] = None,
+) -> Iterator[os.DirEntry]:
+    """Traverses the tree below `rootentry` using an explicit stack (`order="dfs"`)
+    or queue (`order="bfs"`) instead of one nested generator per directory level.
+
+    `skippable`: Yield `MyDirEntry` objects. Directories are always yielded and only followed
+        if their `follow` attribute is still True when the iteration is resumed.
+    `max_open_dirs`: Maximum number of `os.scandir` handles which are open at the same time.
+        If the limit is reached, the remaining entries of the outermost open directory
+        are read into memory and its handle is closed. BFS never keeps more than one handle open.
+    """
 
-    try:
-        with os.scandir(rootentry.path) as it:
-            for entry in it:
-                if files and entry.is_file(follow_symlinks=follow_symlinks):
-                    yield MyDirEntry(entry)
-                elif entry.is_dir(follow_symlinks=follow_symlinks):
-                    if not follow_symlinks or prevent_loops_set is not None:
-                        is_link = islink(entry)
+    assert_choice("order", order, {"dfs", "bfs"})
+    if max_open_dirs is not None and max_open_dirs < 1:
+        raise ValueError("max_open_dirs must be at least 1")
 
-                    se = MyDirEntry(entry)
-                    yield se
+    bfs = order == "bfs"
+    check_links = not follow_symlinks or prevent_loops_set is not None
 
-                    if (
-                        not follow_symlinks and is_link
-                    ):  # must be a windows junction since `entry.is_symlink()` returns `False` for junctions
-                        continue
+    # a frame is [directory entry, iterator over its children, open `os.scandir` handle or None]
+    stack: List[List[Any]] = []
+    queue: Deque[os.DirEntry] = deque()
+    nopen = 0
 
-                    if se.follow and not _is_loop(rootentry, entry, is_link, prevent_loops_set):
-                        for e in _scandir_rec_skippable(
-                            entry, files, others, follow_symlinks, prevent_loops_set, errorfunc
-                        ):
-                            yield e
-                else:
-                    if others:
-                        yield MyDirEntry(entry)
-    except OSError as e:
-        errorfunc(rootentry, e)
+    def open_dir(direntry: os.DirEntry) -> None:
+        nonlocal nopen
 
+        if max_open_dirs is not None and nopen >= max_open_dirs:
+            for frame in stack:
+                if frame[2] is not None:
+                    remaining: List[os.DirEntry] = []
+                    try:
+                        remaining.extend(frame[1])
+                    except OSError as e:
+                        errorfunc(frame[0], e)
+                    _close_frame(frame)
+                    frame[1] = iter(remaining)
+                    nopen -= 1
+                    break
 
-def _scandir_rec(
-    rootentry: os.DirEntry,
-    files: bool = True,
-    dirs: bool = False,
-    others: bool = False,
-    rec: bool = True,
-    follow_symlinks: bool = True,
-    prevent_loops_set: Optional[Set[str]] = None,
-    errorfunc: Callable[[os.DirEntry, Exception], None] = scandir_error_raise,
-) -> Iterator[os.DirEntry]:
-    is_link = False
+        try:
+            handle = os.scandir(direntry.path)
+        except OSError as e:
+            errorfunc(direntry, e)
+        else:
+            stack.append([direntry, handle, handle])
+            nopen += 1
+
+    def close_top() -> None:
+        nonlocal nopen
+
+        frame = stack.pop()
+        if frame[2] is not None:
+            _close_frame(frame)
+            nopen -= 1
+
+    if bfs:
+        queue.append(rootentry)
+    else:
+        open_dir(rootentry)
 
     try:
-        with os.scandir(rootentry.path) as it:
-            for entry in it:
-                try:
-                    if files and entry.is_file(follow_symlinks=follow_symlinks):
-                        yield entry
-                    elif entry.is_dir(follow_symlinks=follow_symlinks):
-                        if not follow_symlinks or prevent_loops_set is not None:
-                            is_link = islink(entry)
+        while True:
+            if not stack:
+                if not queue:
+                    break
+                open_dir(queue.popleft())
+                continue
 
-                        if dirs:
-                            yield entry
+            parent, it, _ = stack[-1]
+            try:
+                entry = next(it)
+            except StopIteration:
+                close_top()
+                continue
+            except OSError as e:
+                # this is caused by the iteration of the scandir handle
+                close_top()
+                errorfunc(parent, e)
+                continue
 
-                        if (
-                            not follow_symlinks and is_link
-                        ):  # must be a windows junction since `entry.is_symlink()` returns `False` for junctions
-                            continue
+            try:
+                if files and entry.is_file(follow_symlinks=follow_symlinks):
+                    yield MyDirEntry(entry) if skippable else entry
+                elif entry.is_dir(follow_symlinks=follow_symlinks):
+                    is_link = islink(entry) if check_links else False
 
-                        if rec and not _is_loop(rootentry, entry, is_link, prevent_loops_set):
-                            for e in _scandir_rec(
-                                entry, files, dirs, others, rec, follow_symlinks, prevent_loops_set, errorfunc
-                            ):
-                                yield e
+                    if skippable:
+                        se = MyDirEntry(entry)
+                        yield se
+                        follow = se.follow
                     else:
-                        if others:
+                        if dirs:
                             yield entry
-                except OSError as e:
-                    # this can be caused by islink for example
-                    errorfunc(rootentry, e)
-    except OSError as e:
-        # this can either be caused by the scandir call or by the iteration
-        errorfunc(rootentry, e)
+                        follow = rec
+
+                    if (
+                        not follow_symlinks and is_link
+                    ):  # must be a windows junction since `entry.is_symlink()` returns `False` for junctions
+                        continue
+
+                    if follow and not _is_loop(parent, entry, is_link, prevent_loops_set):
+                        if bfs:
+                            queue.append(entry)
+                        else:
+                            open_dir(entry)
+                else:
+                    if others:
+                        yield MyDirEntry(entry) if skippable else entry
+            except OSError as e:
+                # this can be caused by islink for example
+                errorfunc(parent, e)
+    finally:
+        for frame in stack:
+            _close_frame(frame)
 
 
 def _get_entry_stub(path: str) -> os.DirEntry:
@@ -452,6 +504,8 @@ def scandir_rec(
     relative: bool = False,
     allow_skip: bool = False,
     errorfunc: Callable[[MyDirEntryT, Exception], None] = scandir_error_log,
+    order: str = "dfs",
+    max_open_dirs: Optional[int] = None,
 ) -> Iterator[MyDirEntryT]:
     r"""Variant of `os.scandir()` which recurses into subfolders.
     `path`: Relative or absolute filesystem path. On Windows this path is converted to a absolute device path <\\?\X:\path\file.exe> to support long paths.
@@ -472,6 +526,9 @@ def scandir_rec(
     `allow_skip`: Yield `MyDirEntry` objects which expose a `follow` attribute. If this is set to False for directories,
         they will not be followed.
     `errorfunc`: A callback function to handle errors. By default errors are logged as exceptions and ignored.
+    `order`: Traverse the tree depth-first ("dfs") or breadth-first ("bfs").
+    `max_open_dirs`: Limit the number of directory handles which are open at the same time.
+        Only relevant for depth-first traversal of deep trees.
 
 
     CHANGE: previously junctions were not returned at all when follow_symlinks=False,
@@ -489,10 +546,9 @@ def scandir_rec(
     entry = _get_entry_stub(path)
     prevent_loops_set: Optional[Set[str]] = set() if prevent_loops else None
 
-    if not allow_skip:
-        it = _scandir_rec(entry, files, dirs, others, rec, follow_symlinks, prevent_loops_set, errorfunc)
-    else:
-        it = _scandir_rec_skippable(entry, files, others, follow_symlinks, prevent_loops_set, errorfunc)
+    it = _scandir_iter(
+        entry, files, dirs, others, rec, follow_symlinks, prevent_loops_set, errorfunc, allow_skip, order, max_open_dirs
+    )
 
     if not relative:
         return it
@@ -514,6 +570,243 @@ def scandir_rec(
         return map(modpathrelative, it)
 
 
+_ENTRY_FILE = 0
+_ENTRY_DIR = 1
+_ENTRY_OTHER = 2
+_ENTRY_ERROR = 3
+
+_ListingT = List[Tuple[int, Any, bool]]
+
+
+def _scandir_listing(
+    rootentry: os.DirEntry, files: bool, others: bool, follow_symlinks: bool, check_links: bool
+) -> _ListingT:
+    """Lists a single directory and classifies the entries like `_scandir_iter` does.
+    Errors are returned inline so they can be handled in the order they occurred.
+    """
+
+    out: _ListingT = []
+
+    try:
+        with os.scandir(rootentry.path) as it:
+            for entry in it:
+                try:
+                    if files and entry.is_file(follow_symlinks=follow_symlinks):
+                        out.append((_ENTRY_FILE, entry, False))
+                    elif entry.is_dir(follow_symlinks=follow_symlinks):
+                        is_link = islink(entry) if check_links else False
+                        out.append((_ENTRY_DIR, entry, is_link))
+                    elif others:
+                        out.append((_ENTRY_OTHER, entry, False))
+                except OSError as e:
+                    out.append((_ENTRY_ERROR, e, False))
+    except OSError as e:
+        out.append((_ENTRY_ERROR, e, False))
+
+    return out
+
+
+def _scandir_rec_parallel_unordered(
+    executor: ThreadPoolExecutor,
+    rootentry: os.DirEntry,
+    files: bool,
+    dirs: bool,
+    others: bool,
+    follow_symlinks: bool,
+    prevent_loops_set: Optional[Set[str]],
+    errorfunc: Callable[[os.DirEntry, Exception], None],
+    max_pending: int,
+) -> Iterator[os.DirEntry]:
+    check_links = not follow_symlinks or prevent_loops_set is not None
+
+    # directories are taken from the end of the queue so it only grows with depth times width of the tree
+    queue: Deque[os.DirEntry] = deque([rootentry])
+    pending: Dict[Future, os.DirEntry] = {}
+
+    try:
+        while queue or pending:
+            while queue and len(pending) < max_pending:
+                direntry = queue.pop()
+                future = executor.submit(_scandir_listing, direntry, files, others, follow_symlinks, check_links)
+                pending[future] = direntry
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                parent = pending.pop(future)
+                for kind, entry, is_link in future.result():
+                    if kind == _ENTRY_DIR:
+                        if dirs:
+                            yield entry
+
+                        if not follow_symlinks and is_link:
+                            continue
+
+                        try:
+                            if not _is_loop(parent, entry, is_link, prevent_loops_set):
+                                queue.append(entry)
+                        except OSError as e:
+                            errorfunc(parent, e)
+                    elif kind == _ENTRY_ERROR:
+                        errorfunc(parent, entry)
+                    else:
+                        yield entry
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _scandir_rec_parallel_ordered(
+    executor: ThreadPoolExecutor,
+    rootentry: os.DirEntry,
+    files: bool,
+    dirs: bool,
+    others: bool,
+    follow_symlinks: bool,
+    prevent_loops_set: Optional[Set[str]],
+    errorfunc: Callable[[os.DirEntry, Exception], None],
+    max_pending: int,
+) -> Iterator[os.DirEntry]:
+    """Yields entries in exactly the same order as `_scandir_iter` with `order="dfs"`. The listings of subdirectories
+    are prefetched as soon as their parent is visited and discarded if they are not followed.
+    Prefetches along the current path take precedence: if more than `max_pending` listings would be prefetched,
+    the ones which are visited last are discarded, ie. the later siblings of the directories closest to the root.
+    """
+
+    check_links = not follow_symlinks or prevent_loops_set is not None
+    # maps paths to (depth, sequence number, future)
+    prefetched: Dict[str, Tuple[int, int, Future]] = {}
+    seq = count()
+
+    def submit(direntry: os.DirEntry) -> Future:
+        return executor.submit(_scandir_listing, direntry, files, others, follow_symlinks, check_links)
+
+    def evict(depth: int) -> bool:
+        # the prefetch which is visited last has the lowest depth and the highest sequence number
+        path, (pdepth, _, future) = min(prefetched.items(), key=lambda item: (item[1][0], -item[1][1]))
+        if pdepth >= depth:
+            return False
+        del prefetched[path]
+        future.cancel()
+        return True
+
+    def prefetch(listing: _ListingT, start: int, depth: int) -> None:
+        for kind, entry, is_link in islice(listing, start, None):
+            if kind != _ENTRY_DIR or not (follow_symlinks or not is_link) or entry.path in prefetched:
+                continue
+            if len(prefetched) >= max_pending and not evict(depth):
+                break
+            prefetched[entry.path] = (depth, next(seq), submit(entry))
+
+    stack: List[Tuple[os.DirEntry, _ListingT, int]] = []
+
+    def push(direntry: os.DirEntry, listing: _ListingT) -> None:
+        prefetch(listing, 0, len(stack))
+        stack.append((direntry, listing, 0))
+
+    try:
+        push(rootentry, submit(rootentry).result())
+
+        while stack:
+            parent, listing, i = stack[-1]
+            depth = len(stack) - 1
+            while i < len(listing):
+                kind, entry, is_link = listing[i]
+                i += 1
+                if kind == _ENTRY_DIR:
+                    if dirs:
+                        yield entry
+
+                    if not follow_symlinks and is_link:
+                        continue
+
+                    _, _, future = prefetched.pop(entry.path, (None, None, None))
+                    try:
+                        follow = not _is_loop(parent, entry, is_link, prevent_loops_set)
+                    except OSError as e:
+                        errorfunc(parent, e)
+                        follow = False
+
+                    if follow:
+                        if future is None:
+                            future = submit(entry)
+                        stack[-1] = (parent, listing, i)
+                        push(entry, future.result())
+                        break
+                    elif future is not None:
+                        future.cancel()
+                elif kind == _ENTRY_ERROR:
+                    errorfunc(parent, entry)
+                else:
+                    yield entry
+            else:
+                stack.pop()
+                if stack:
+                    # refill the prefetches of the parent which might have been discarded for deeper directories
+                    _, listing, i = stack[-1]
+                    prefetch(listing, i, depth - 1)
+    finally:
+        for _, _, future in prefetched.values():
+            future.cancel()
+
+
+def scandir_rec_parallel(
+    path: PathType,
+    files: bool = True,
+    dirs: bool = False,
+    others: bool = False,
+    follow_symlinks: bool = True,
+    prevent_loops: bool = True,
+    relative: bool = False,
+    errorfunc: Callable[[MyDirEntryT, Exception], None] = scandir_error_log,
+    workers: Optional[int] = None,
+    ordered: bool = False,
+    max_pending: Optional[int] = None,
+) -> Iterator[MyDirEntryT]:
+    """Variant of `scandir_rec()` which lists directories concurrently using a pool of `workers` threads.
+    This helps when the traversal is limited by the latency of the `os.scandir` calls,
+    for example on network shares. `files`, `dirs`, `others`, `follow_symlinks`, `prevent_loops`,
+    `relative` and `errorfunc` have the same meaning as for `scandir_rec()`.
+    `errorfunc` is always called from the thread which consumes the iterator.
+
+    `workers`: Number of threads. Uses the `ThreadPoolExecutor` default if None.
+    `ordered`: Yield entries in the same order as `scandir_rec()`. Otherwise they are yielded
+        in the order the directory listings complete.
+    `max_pending`: Maximum number of directory listings which are submitted or buffered at the same time.
+        Defaults to four times the number of workers.
+    """
+
+    if isinstance(path, os.PathLike):
+        path = os.fspath(path)
+
+    if not follow_symlinks:
+        prevent_loops = False
+
+    entry = _get_entry_stub(path)
+    prevent_loops_set: Optional[Set[str]] = set() if prevent_loops else None
+
+    if ordered:
+        func = _scandir_rec_parallel_ordered
+    else:
+        func = _scandir_rec_parallel_unordered
+
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)  # the `ThreadPoolExecutor` default
+    if max_pending is None:
+        max_pending = workers * 4
+
+    with ThreadPoolExecutor(workers) as executor:
+        it = func(executor, entry, files, dirs, others, follow_symlinks, prevent_loops_set, errorfunc, max_pending)
+
+        if not relative:
+            yield from it
+        else:
+            basepath = long_path_support(path)
+            for entry in it:
+                myentry = MyDirEntry(entry)
+                myentry.basepath = basepath
+                yield myentry
+
+
 def filter_recall(recall: bool = False) -> Callable[[MyDirEntryT], bool]:
     """Returns a functions to use with filter, which takes a direntry and returns False
     when `recall` is False and the file is only available online For example using OneDrive.
@@ -549,7 +842,7 @@ def scandir_rec_simple(
     entry = DirEntryStub(os.path.basename(path), path)
     prevent_loops_set: Optional[Set[str]] = set() if prevent_loops else None
 
-    return _scandir_rec(entry, files, dirs, others, rec, follow_symlinks, prevent_loops_set, errorfunc)
+    return _scandir_iter(entry, files, dirs, others, rec, follow_symlinks, prevent_loops_set, errorfunc)
 
 
 def scandir_ext(
@@ -1,11 +1,20 @@
 import hashlib
+import mmap
+import os
+import threading
 import zlib
 from functools import partial
+from io import RawIOBase
 from pathlib import Path
-from typing import IO, Callable, Optional, Union
+from queue import Queue
+from types import TracebackType
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
 
 from _hashlib import HASH as Hashobj
+from typing_extensions import Self
 
+from .callbacks import Progress
+from .concurrency import executor_map
 from .file import PathType, blockfileiter, iterfilelike, read_file
 
 HashCls = Union[Callable[[], Hashobj], str]
@@ -72,6 +81,238 @@ def hash_file(
     return m
 
 
+def _advise_sequential(fd: int) -> None:
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:  # not supported for all file types
+            pass
+
+
+def _hash_readinto(
+    fr: RawIOBase, m: Hashobj, chunk_size: int, callback: Optional[Callable[[int], None]] = None
+) -> None:
+    buffer = bytearray(chunk_size)
+    with memoryview(buffer) as view:
+        while True:
+            n = fr.readinto(buffer)
+            if not n:
+                break
+            m.update(view[:n])
+            if callback is not None:
+                callback(n)
+
+
+def hash_file_zerocopy(
+    path: PathType,
+    hashcls: HashCls,
+    chunk_size: int = FILE_IO_BUFFER_SIZE,
+    use_mmap: bool = False,
+    sequential: bool = True,
+) -> Hashobj:
+    """Hashes the binary file at `path` without allocating a new bytes object for every chunk.
+
+    If `use_mmap` is False (the default), the file is read unbuffered into a single reused buffer of size `chunk_size`.
+    Otherwise it is memory-mapped and hashed in slices of `chunk_size`.
+    If `sequential` is True, the OS is advised that the file will be read sequentially (`posix_fadvise`)
+    where supported, which increases the read-ahead on Linux.
+    """
+
+    if isinstance(hashcls, str):
+        m = hashlib.new(hashcls)
+    else:
+        m = hashcls()
+
+    with open(path, "rb", buffering=0) as fr:
+        fd = fr.fileno()
+        if sequential:
+            _advise_sequential(fd)
+
+        if use_mmap:
+            size = os.fstat(fd).st_size
+            if size == 0:  # empty files cannot be mapped
+                return m
+
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                for pos in range(0, size, chunk_size):
+                    m.update(view[pos : pos + chunk_size])
+        else:
+            _hash_readinto(fr, m, chunk_size)
+
+    return m
+
+
+def hash_files(
+    paths: Iterable[PathType],
+    hashcls: HashCls,
+    workers: Optional[int] = None,
+    chunk_size: int = FILE_IO_BUFFER_SIZE,
+    ordered: bool = True,
+    bufsize: int = 1,
+    progress: Optional[Progress] = None,
+) -> Iterator[Tuple[PathType, Hashobj]]:
+    """Hashes the binary files `paths` concurrently using a pool of `workers` threads
+    and yields `(path, hashobj)` tuples. `hashlib` releases the GIL while hashing,
+    so this scales with the number of cores for large enough `chunk_size`.
+
+    `ordered`: Yield the results in the same order as `paths`. Otherwise they are yielded as soon as they complete.
+    `bufsize`: Number of files which are opened in addition to the ones currently processed by the workers.
+    `progress`: Reports the total number of bytes hashed and one transient task per file which is currently hashed.
+    """
+
+    progress = progress or Progress()
+
+    with progress.task(description="Hashing files") as total_task:
+
+        def func(path: PathType) -> Tuple[PathType, Hashobj]:
+            if isinstance(hashcls, str):
+                m = hashlib.new(hashcls)
+            else:
+                m = hashcls()
+
+            with open(path, "rb", buffering=0) as fr:
+                size = os.fstat(fr.fileno()).st_size
+                with progress.task(total=size, description=os.fspath(path), transient=True) as task:
+
+                    def callback(n: int) -> None:
+                        task.advance(n)
+                        total_task.advance(n)
+
+                    _hash_readinto(fr, m, chunk_size, callback)
+
+            return path, m
+
+        for future in executor_map(func, paths, ordered=ordered, workers=workers, bufsize=bufsize):
+            yield future.result()
+
+
+def hash_file_ends(path: PathType, hashcls: HashCls, size: int) -> Hashobj:
+    """Hashes the first and the last `size` bytes of the file at `path`.
+    Files which are not larger than `2 * size` are hashed completely.
+    """
+
+    if isinstance(hashcls, str):
+        m = hashlib.new(hashcls)
+    else:
+        m = hashcls()
+
+    with open(path, "rb") as fr:
+        filesize = os.fstat(fr.fileno()).st_size
+        if filesize <= 2 * size:
+            for d in iterfilelike(fr, chunk_size=FILE_IO_BUFFER_SIZE):
+                m.update(d)
+        else:
+            m.update(fr.read(size))
+            fr.seek(-size, os.SEEK_END)
+            m.update(fr.read(size))
+
+    return m
+
+
+class _HashWorker(threading.Thread):
+    def __init__(self, m: Hashobj, queue_size: int) -> None:
+        threading.Thread.__init__(self, daemon=True)
+        self.m = m
+        self.queue: "Queue[Optional[bytes]]" = Queue(queue_size)
+        self.exception: Optional[BaseException] = None
+
+    def run(self) -> None:
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            if self.exception is None:
+                try:
+                    self.m.update(data)
+                except BaseException as e:
+                    self.exception = e
+
+
+class MultiHasher:
+    """Feeds the same data into multiple hash objects, so a file has to be read only once to compute multiple hashes.
+
+    `hashclss`: Maps names to hash classes, eg. `{"sha1": hashlib.sha1, "crc": HashobjCRC, "ed2k": HashobjED2K}`.
+    `threaded`: Update every hash object in its own thread. This way the total time is bound by the slowest
+        hash function instead of the sum of all of them. The data passed to `update()` must not be modified afterwards.
+    `queue_size`: Maximum number of chunks per thread which wait to be hashed.
+
+    Example:
+        with MultiHasher({"md5": "md5", "sha1": "sha1"}, threaded=True) as hasher:
+            hasher.update(b"data")
+        hexdigests = hasher.hexdigests()
+    """
+
+    def __init__(self, hashclss: Dict[str, HashCls], threaded: bool = False, queue_size: int = 4) -> None:
+        self.hashobjs: Dict[str, Hashobj] = {}
+        for name, hashcls in hashclss.items():
+            if isinstance(hashcls, str):
+                self.hashobjs[name] = hashlib.new(hashcls)
+            else:
+                self.hashobjs[name] = hashcls()
+
+        self.workers: List[_HashWorker] = []
+        if threaded:
+            self.workers = [_HashWorker(m, queue_size) for m in self.hashobjs.values()]
+            for worker in self.workers:
+                worker.start()
+
+    def update(self, data: bytes) -> None:
+        if self.workers:
+            for worker in self.workers:
+                worker.queue.put(data)
+        else:
+            for m in self.hashobjs.values():
+                m.update(data)
+
+    def finish(self) -> Dict[str, Hashobj]:
+        """Waits until all data is hashed and returns the hash objects.
+        Exceptions raised in worker threads are re-raised here.
+        """
+
+        workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.queue.put(None)
+        for worker in workers:
+            worker.join()
+        for worker in workers:
+            if worker.exception is not None:
+                raise worker.exception
+
+        return self.hashobjs
+
+    def digests(self) -> Dict[str, bytes]:
+        return {name: m.digest() for name, m in self.finish().items()}
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {name: m.hexdigest() for name, m in self.finish().items()}
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.finish()
+
+
+def hash_file_multi(
+    path: PathType, hashclss: Dict[str, HashCls], chunk_size: int = FILE_IO_BUFFER_SIZE, threaded: bool = False
+) -> Dict[str, Hashobj]:
+    """Hashes the binary file at `path` with all hash classes in `hashclss` while reading the file only once.
+    See `MultiHasher` for the arguments.
+    """
+
+    with MultiHasher(hashclss, threaded) as hasher:
+        with open(path, "rb") as fr:
+            for data in iterfilelike(fr, chunk_size=chunk_size):
+                hasher.update(data)
+
+    return hasher.finish()
+
+
 def hash_filelike(fr: IO[bytes], hashcls: HashCls, chunk_size: int = FILE_IO_BUFFER_SIZE) -> Hashobj:
     if isinstance(hashcls, str):
         m = hashlib.new(hashcls)
@@ -113,6 +354,58 @@ def hashsum_file_format(hashobj: Hashobj, path: str) -> str:
 ed2k_chunksize = 9728000
 
 
+class HashobjED2K:
+    """Incremental ed2k hash object. `version=1` and `version=2` correspond to
+    `ed2k_hash_file_v1` and `ed2k_hash_file_v2` respectively.
+    """
+
+    digest_size = 16
+    name = "ed2k"
+
+    def __init__(self, version: int = 2) -> None:
+        if version not in (1, 2):
+            raise ValueError("version must be 1 or 2")
+
+        self.version = version
+        self.hashes: List[bytes] = []
+        self.current = hashlib.new("md4")  # nosec: B324
+        self.pos = 0
+
+    def update(self, data: bytes) -> None:
+        with memoryview(data) as view:
+            while view:
+                # a full chunk is only finished when more data arrives, so `digest()` knows if the last chunk is full
+                if self.pos == ed2k_chunksize:
+                    self.hashes.append(self.current.digest())
+                    self.current = hashlib.new("md4")  # nosec: B324
+                    self.pos = 0
+
+                n = min(ed2k_chunksize - self.pos, len(view))
+                self.current.update(view[:n])
+                self.pos += n
+                view = view[n:]
+
+    def digest(self) -> bytes:
+        full = self.version == 2 and self.pos == ed2k_chunksize
+        if not self.hashes and not full:
+            return self.current.digest()
+
+        hashes = self.hashes + [self.current.digest()]
+        if full:
+            hashes.append(md4_hash_data(b"").digest())
+        return md4_hash_data(b"".join(hashes)).digest()
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    def copy(self) -> "HashobjED2K":
+        out = HashobjED2K(self.version)
+        out.hashes = self.hashes.copy()
+        out.current = self.current.copy()
+        out.pos = self.pos
+        return out
+
+
 def ed2k_hash_file_v1(path: Path) -> str:
     """Returns ed2k hash.
     This hashing method is used by
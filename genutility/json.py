@@ -2,19 +2,38 @@ import csv
 import datetime
 import json
 import logging
-from functools import partial
+import os
+from functools import lru_cache, partial
+from io import TextIOBase
 from itertools import islice
 from pathlib import Path
 from traceback import TracebackException
 from types import ModuleType
-from typing import IO, Any, Callable, Dict, FrozenSet, Iterable, Iterator, Optional, Sequence, Tuple, Type, Union
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
 
 from typing_extensions import Self  # typing.Self is available in Python 3.11+
 from typing_extensions import TypedDict  # typing.TypedDict is available in Python 3.8+
 
 from .atomic import sopen
+from .concurrency import parallel_map
 from .datetime import datetime_from_utc_timestamp_ms, now
-from .file import copen
+from .exceptions import assert_choice_map
+from .file import copen, will_compress
+from .iter import batch
 from .string import truncate
 
 PathStr = Union[Path, str]
@@ -142,12 +161,15 @@ def write_json(
     sort_keys: bool = False,
     default: Optional[Callable] = None,
     safe: bool = False,
+    compresslevel: int = 9,
+    threads: int = 0,
     **kw: Any,
 ) -> None:
     """Writes python object `obj` to `path` as json files and optionally validates the object
     according to `schema`. The validation requires `jsonschema`.
     The remaining optional parameters are passed through to `json.dump`.
     `safe`: if True, don't overwrite original file in case any error occurs
+    `compresslevel`, `threads`: see `file.copen`
     """
 
     if schema:
@@ -158,12 +180,93 @@ def write_json(
 
         validate(obj, schema)
 
-    with sopen(path, mode, encoding="utf-8", safe=safe) as fw:
+    with sopen(path, mode, encoding="utf-8", safe=safe, compresslevel=compresslevel, threads=threads) as fw:
         json.dump(
             obj, fw, ensure_ascii=ensure_ascii, cls=cls, indent=indent, sort_keys=sort_keys, default=default, **kw
         )
 
 
+class JsonBackend:
+    """Encoder and decoder of a JSON library used for JSON Lines.
+    `loads` decodes a single document from `bytes` or `str`.
+    `dumps` encodes a single document on a single line and returns `bytes` if `binary` is True, `str` otherwise.
+    """
+
+    __slots__ = ("name", "loads", "dumps", "binary")
+
+    def __init__(
+        self, name: str, loads: Callable[[Union[bytes, str]], Any], dumps: Callable[[Any], Any], binary: bool
+    ) -> None:
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+        self.binary = binary
+
+    def __repr__(self) -> str:
+        return f"<JsonBackend {self.name}>"
+
+
+def _orjson_backend(sort_keys: bool, default: Optional[Callable]) -> JsonBackend:
+    import orjson
+
+    option = orjson.OPT_SORT_KEYS if sort_keys else None
+    return JsonBackend("orjson", orjson.loads, partial(orjson.dumps, default=default, option=option), True)
+
+
+def _msgspec_backend(sort_keys: bool, default: Optional[Callable]) -> JsonBackend:
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=default, order="sorted" if sort_keys else None)
+    return JsonBackend("msgspec", msgspec.json.Decoder().decode, encoder.encode, True)
+
+
+def _simplejson_backend(sort_keys: bool, default: Optional[Callable]) -> JsonBackend:
+    import simplejson
+
+    dumps = partial(simplejson.dumps, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=default)
+    return JsonBackend("simplejson", simplejson.loads, dumps, False)
+
+
+def _json_backend(sort_keys: bool, default: Optional[Callable]) -> JsonBackend:
+    # the default separators are kept, so the output is the same as `json.dump`
+    dumps = partial(json.dumps, ensure_ascii=False, sort_keys=sort_keys, default=default)
+    return JsonBackend("json", json.loads, dumps, False)
+
+
+# ordered from fastest to slowest
+_json_backends = {
+    "orjson": _orjson_backend,
+    "msgspec": _msgspec_backend,
+    "simplejson": _simplejson_backend,
+    "json": _json_backend,
+}
+
+
+@lru_cache(maxsize=32)
+def json_backend(name: str = "auto", sort_keys: bool = False, default: Optional[Callable] = None) -> JsonBackend:
+    """Returns the JSON backend `name`, which is one of "orjson", "msgspec", "simplejson" and "json".
+    "auto" selects the fastest installed one.
+
+    `sort_keys`: Sort the keys of objects when encoding.
+    `default`: Function which is called for objects which cannot be serialized otherwise.
+
+    Notes: orjson and msgspec encode NaN and infinity as `null`, reject them when decoding
+    and don't support integers larger than 64 bit. orjson decodes them as lossy floats.
+    So they are only used when selected explicitly or by "auto".
+    """
+
+    if name == "auto":
+        for factory in _json_backends.values():
+            try:
+                return factory(sort_keys, default)
+            except ImportError:
+                pass
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    factory = assert_choice_map("name", name, _json_backends)
+    return factory(sort_keys, default)
+
+
 class JsonLoadKwargs(TypedDict):
     cls: Optional[Type[json.JSONDecoder]]
     object_hook: Optional[Callable]
@@ -186,9 +289,16 @@ class json_lines:
         parse_int: Optional[Callable] = None,
         parse_constant: Optional[Callable] = None,
         object_pairs_hook: Optional[Callable] = None,
+        backend: str = "json",
         **kw: Any,
     ) -> None:
-        """Don't use directly. Use `from_path` or `from_stream` classmethods instead."""
+        """Don't use directly. Use `from_path` or `from_stream` classmethods instead.
+
+        `backend`: JSON library used for reading and writing, see `json_backend`. Options which are only
+                supported by the `json` module, like `cls` or `object_hook`, always use `json` or `simplejson`.
+                The default `json` supports all values of the `json` module, like NaN and large integers.
+                The faster backends like "orjson" or "auto" must be selected explicitly.
+        """
 
         """ fixme: how should `close` be handled?
             1: If you don't want to close `stream`, just don't call `close()` or use as context manager.
@@ -198,6 +308,8 @@ class json_lines:
         self.f = stream
         self.doclose = doclose
         self.newline = "\n"
+        self.binary = not isinstance(stream, TextIOBase)
+        self.backend = backend
 
         self.json_kwargs: JsonLoadKwargs = {
             "cls": cls,
@@ -222,10 +334,11 @@ class json_lines:
         parse_int: Optional[Callable] = None,
         parse_constant: Optional[Callable] = None,
         object_pairs_hook: Optional[Callable] = None,
+        backend: str = "json",
         **kw: Any,
     ) -> "json_lines":
-        """Binary writing modes "wb", "ab", "r+b", "w+b" are not supported by the python json module.
-        Use text modes instead. Binary read-only is fine.
+        """Binary modes skip the text decoding and encoding, which is faster with the orjson and msgspec backends.
+        Binary read-write modes like "r+b" are not supported.
         """
 
         if isinstance(file, str):
@@ -240,12 +353,26 @@ with open("{file}", "r") as fr:
 ```"""
                 raise ValueError(message)
 
-        if set(mode) not in (set("rt"), set("rb"), set("xt"), set("xb"), set("wt"), set("at"), set("r+t"), set("w+t")):
+        if set(mode) not in (
+            set("rt"),
+            set("rb"),
+            set("xt"),
+            set("xb"),
+            set("wt"),
+            set("wb"),
+            set("at"),
+            set("ab"),
+            set("r+t"),
+            set("w+t"),
+        ):
             raise ValueError(f"mode cannot be `{mode}`")
 
-        stream = copen(file, mode, encoding=encoding, errors=errors, newline=newline)
+        if "b" in mode:
+            stream = copen(file, mode)
+        else:
+            stream = copen(file, mode, encoding=encoding, errors=errors, newline=newline)
         return json_lines(
-            stream, True, cls, object_hook, parse_float, parse_int, parse_constant, object_pairs_hook, **kw
+            stream, True, cls, object_hook, parse_float, parse_int, parse_constant, object_pairs_hook, backend, **kw
         )
 
     @staticmethod
@@ -257,33 +384,89 @@ with open("{file}", "r") as fr:
         parse_int: Optional[Callable] = None,
         parse_constant: Optional[Callable] = None,
         object_pairs_hook: Optional[Callable] = None,
+        backend: str = "json",
         **kw: Any,
     ) -> "json_lines":
         return json_lines(
-            stream, False, cls, object_hook, parse_float, parse_int, parse_constant, object_pairs_hook, **kw
+            stream, False, cls, object_hook, parse_float, parse_int, parse_constant, object_pairs_hook, backend, **kw
         )
 
-    def iterrange(self, start: int = 0, stop: Optional[int] = None) -> Iterator:
-        try:
-            import simplejson as sjson
+    def _loads(self) -> Callable[[Union[bytes, str]], Any]:
+        if any(v is not None for v in self.json_kwargs.values()) or self.json_cls_kw:
+            try:
+                import simplejson as sjson
 
-            _json: ModuleType = sjson
-        except ImportError:
-            _json = json
+                _json: ModuleType = sjson
+            except ImportError:
+                _json = json
+            return partial(_json.loads, **self.json_kwargs, **self.json_cls_kw)
+
+        return json_backend(self.backend).loads
+
+    def iterrange(self, start: int = 0, stop: Optional[int] = None) -> Iterator:
+        loads = self._loads()
+        null = b"\x00" if self.binary else "\x00"
 
         linenum = start + 1
         try:
             for line in islice(self.f, start, stop):
-                line = line.rstrip().lstrip("\x00")  # fixme: strip \0 is only a temp fix!
+                line = line.rstrip().lstrip(null)  # fixme: strip \0 is only a temp fix!
                 if line:
-                    yield _json.loads(line, **self.json_kwargs, **self.json_cls_kw)
+                    yield loads(line)
                 linenum += 1
 
-        except json.JSONDecodeError as e:
+        except ValueError as e:  # json.JSONDecodeError and the errors of the other backends are ValueErrors
             e.lineno = linenum
             logger.error("JSON Lines parse error in line %s: %r", linenum, truncate(line, 100))
             raise
 
+    def _dumps(
+        self,
+        skipkeys: bool,
+        ensure_ascii: bool,
+        check_circular: bool,
+        allow_nan: bool,
+        cls: Optional[Type[json.JSONEncoder]],
+        separators: Optional[Tuple[str, str]],
+        default: Optional[Callable],
+        sort_keys: bool,
+        kw: Dict[str, Any],
+    ) -> Callable[[List[Any]], Union[bytes, str]]:
+        """Returns a function which encodes a batch of objects as JSON Lines for the stream."""
+
+        if skipkeys or ensure_ascii or not check_circular or not allow_nan or cls or separators or kw:
+            dumps: Callable[[Any], Any] = partial(
+                json.dumps,
+                skipkeys=skipkeys,
+                ensure_ascii=ensure_ascii,
+                check_circular=check_circular,
+                allow_nan=allow_nan,
+                cls=cls,
+                indent=None,
+                separators=separators,
+                default=default,
+                sort_keys=sort_keys,
+                **kw,
+            )
+            binary = False
+        else:
+            backend = json_backend(self.backend, sort_keys, default)
+            dumps = backend.dumps
+            binary = backend.binary
+
+        if binary:
+            newline = self.newline.encode("ascii")
+            if self.binary:
+                return lambda objs: newline.join(map(dumps, objs)) + newline
+            else:
+                return lambda objs: (newline.join(map(dumps, objs)) + newline).decode("utf-8")
+        else:
+            newline = self.newline
+            if self.binary:
+                return lambda objs: (newline.join(map(dumps, objs)) + newline).encode("utf-8")
+            else:
+                return lambda objs: newline.join(map(dumps, objs)) + newline
+
     def write(
         self,
         obj: Any,
@@ -297,21 +480,12 @@ with open("{file}", "r") as fr:
         sort_keys: bool = False,
         **kw: Any,
     ) -> None:
-        json.dump(
-            obj,
-            self.f,
-            skipkeys=skipkeys,
-            ensure_ascii=ensure_ascii,
-            check_circular=check_circular,
-            allow_nan=allow_nan,
-            cls=cls,
-            indent=None,
-            separators=separators,
-            default=default,
-            sort_keys=sort_keys,
-            **kw,
-        )
-        self.f.write(self.newline)
+        """Writes `obj` as a single line. The options are the same as for `json.dump`.
+        If they are supported by the backend, the backend is used, otherwise `json`.
+        """
+
+        dumps = self._dumps(skipkeys, ensure_ascii, check_circular, allow_nan, cls, separators, default, sort_keys, kw)
+        self.f.write(dumps([obj]))
 
     def writelines(
         self,
@@ -324,10 +498,16 @@ with open("{file}", "r") as fr:
         separators: Optional[Tuple[str, str]] = None,
         default: Optional[Callable] = None,
         sort_keys: bool = False,
+        batch_size: int = 1000,
         **kw: Any,
     ) -> None:
-        for obj in objs:
-            self.write(obj)
+        """Writes each object in `objs` as a line. The lines are joined and written in batches of `batch_size` objects.
+        See `write` for the other options.
+        """
+
+        dumps = self._dumps(skipkeys, ensure_ascii, check_circular, allow_nan, cls, separators, default, sort_keys, kw)
+        for objs_batch in batch(objs, batch_size, list):
+            self.f.write(dumps(objs_batch))
 
     def close(self) -> None:
         if self.doclose:
@@ -357,6 +537,84 @@ def read_json_lines(
         yield from fr
 
 
+def line_aligned_ranges(path: PathStr, chunk_size: int) -> List[Tuple[int, int]]:
+    """Splits the file at `path` into `(start, end)` byte ranges of about `chunk_size` bytes.
+    Every range starts at the beginning of a line and ends after a newline or at the end of the file.
+    """
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+
+    ranges: List[Tuple[int, int]] = []
+    with open(path, "rb") as fr:
+        size = os.fstat(fr.fileno()).st_size
+        start = 0
+        while start < size:
+            pos = start + chunk_size
+            if pos >= size:
+                end = size
+            else:
+                fr.seek(pos - 1)
+                fr.readline()
+                end = fr.tell()
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def _read_json_lines_range(args: Tuple[PathStr, int, int, str]) -> List[Any]:
+    path, start, end, backend = args
+    loads = json_backend(backend).loads
+
+    with open(path, "rb") as fr:
+        fr.seek(start)
+        data = fr.read(end - start)
+
+    out = []
+    offset = start
+    for line in data.splitlines(keepends=True):
+        stripped = line.rstrip().lstrip(b"\x00")  # fixme: strip \0 is only a temp fix!
+        if stripped:
+            try:
+                out.append(loads(stripped))
+            except ValueError as e:
+                # the line number is unknown, so the byte offset is reported instead.
+                # a new exception is raised, because the attributes of decode errors don't survive pickling.
+                snippet = truncate(stripped.decode("utf-8", "replace"), 100)
+                raise ValueError(f"JSON Lines parse error in line at byte {offset}: {e}: {snippet!r}") from None
+        offset += len(line)
+
+    return out
+
+
+def read_json_lines_parallel(
+    file: PathStr,
+    ordered: bool = True,
+    workers: Optional[int] = None,
+    chunk_size: int = 16 * 1024 * 1024,
+    backend: str = "json",
+) -> Iterator[Any]:
+    """Iterate over a JSON Lines `file` object by object, decoding it in a process pool.
+    The file is split into byte ranges of about `chunk_size` bytes aligned to line boundaries,
+    which are read and decoded independently by the worker processes.
+    If `ordered` is False, the objects of the ranges are yielded in the order they finish.
+    Compressed files cannot be split and are not supported.
+
+    `workers`: Number of processes. Defaults to the number of logical cores.
+    `backend`: JSON library used by the workers, see `json_backend`.
+    """
+
+    if will_compress(os.path.splitext(file)[1].lower()):
+        raise ValueError("Compressed files cannot be split into byte ranges")
+
+    num = workers or os.cpu_count() or 1
+    tasks = ((file, start, end, backend) for start, end in line_aligned_ranges(file, chunk_size))
+
+    for objs in parallel_map(_read_json_lines_range, tasks, ordered=ordered, workers=workers, bufsize=2 * num):
+        yield from objs
+
+
 def write_json_lines(
     it: Iterable[Any],
     path,
@@ -364,11 +622,13 @@ def write_json_lines(
     sort_keys: bool = False,
     default: Optional[Callable] = None,
     safe: bool = False,
+    compresslevel: int = 9,
+    threads: int = 0,
 ) -> Iterator[Any]:
-    with sopen(path, "wt", encoding="utf-8", safe=safe) as fw:
-        with json_lines.from_stream(fw, ensure_ascii=ensure_ascii, sort_keys=sort_keys, default=default) as fw:
+    with sopen(path, "wt", encoding="utf-8", safe=safe, compresslevel=compresslevel, threads=threads) as fw:
+        with json_lines.from_stream(fw) as fw:
             for obj in it:
-                fw.write(obj)
+                fw.write(obj, ensure_ascii=ensure_ascii, sort_keys=sort_keys, default=default)
                 yield obj
 
 
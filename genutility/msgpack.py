@@ -1,12 +1,14 @@
+from array import array
 from datetime import date, datetime, time
 from functools import partial
-from typing import Any, Iterable, Iterator
+from typing import IO, Any, Iterable, Iterator
 
 from msgpack import ExtType, Packer, Unpacker, pack, packb, unpack, unpackb
 
 from ._files import PathType
 from .atomic import sopen
 from .file import copen
+from .records import IndexedRecordFile, check_indexable, write_index
 
 
 class EXTID:
@@ -65,13 +67,14 @@ def read_msgpack(path: PathType) -> Any:
         return unpack(fr, use_list=False, raw=False, strict_map_key=False, ext_hook=ext_hook)
 
 
-def write_msgpack(obj: Any, path: PathType, safe: bool = False) -> None:
+def write_msgpack(obj: Any, path: PathType, safe: bool = False, compresslevel: int = 9, threads: int = 0) -> None:
     """Write `obj` to `path` using msgpack serialization.
 
     `safe`: if True, don't overwrite original file in case any error occurs
+    `compresslevel`, `threads`: see `file.copen`
     """
 
-    with sopen(path, "wb", safe=safe) as fw:
+    with sopen(path, "wb", safe=safe, compresslevel=compresslevel, threads=threads) as fw:
         pack(obj, fw, default=default, use_bin_type=True)
 
 
@@ -83,17 +86,47 @@ def read_iter(path: PathType) -> Iterator[Any]:
         yield from unpacker
 
 
-def write_iter(it: Iterable[Any], path: PathType, safe: bool = False) -> Iterator[Any]:
+def _iterload(fr: IO[bytes]) -> Iterator[Any]:
+    return Unpacker(fr, use_list=False, raw=False, strict_map_key=False, ext_hook=ext_hook)
+
+
+def open_indexed(path: PathType) -> IndexedRecordFile:
+    """Open msgpack'd iterable written with `write_iter(..., index=True)` for random access."""
+
+    return IndexedRecordFile(path, _iterload)
+
+
+def write_iter(
+    it: Iterable[Any],
+    path: PathType,
+    safe: bool = False,
+    index: bool = False,
+    compresslevel: int = 9,
+    threads: int = 0,
+) -> Iterator[Any]:
     """Write iterable `it` to `path` using msgpack serialization. This uses much less memory than
             writing a full list at once.
     Read back using `read_iter()`. If `safe` is True, the original file is not overwritten
             if any error occurs.
+    If `index` is True, the record offsets are written to a sidecar index file.
+            Such files can be read with random access using `open_indexed()`.
     This is a generator which yields the values read from `it`. So it must be consumed
             to actually write anything to disk.
+    `compresslevel`, `threads`: see `file.copen`
     """
 
-    with sopen(path, "wb", safe=safe) as fw:
+    if index:
+        check_indexable(path)
+
+    offsets = array("Q")
+    with sopen(path, "wb", safe=safe, compresslevel=compresslevel, threads=threads) as fw:
         packer = Packer(default=default, use_bin_type=True)
         for obj in it:
+            if index:
+                offsets.append(fw.tell())
             fw.write(packer.pack(obj))
             yield obj
+
+        if index:
+            offsets.append(fw.tell())
+            write_index(offsets, path, safe)
@@ -1,10 +1,19 @@
-from typing import Any, Callable, Dict, Iterable, TypeVar, Union
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, TypeVar, Union
 
 import pyarrow as pa
 from pyarrow import parquet as pq
 
+from ._files import PathType
+from .callbacks import Progress
+from .sql import CursorContext, iterfetchmany
+from .typing import Connection
+
 T = TypeVar("T")
 
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
 
 def table_dumps(table: pa.Table) -> bytes:
     writer = pa.BufferOutputStream()
@@ -58,3 +67,168 @@ def _to_pq_schema(d: Dict[str, Any], sort_keys: bool, outer: Callable[[list], T]
 
 def schema_simple_to_pq(schema: Dict[str, Any], sort_keys: bool = False) -> pa.schema:
     return _to_pq_schema(schema, sort_keys, pa.schema)
+
+
+def sql_type_to_arrow(decltype: str) -> Optional[pa.DataType]:
+    """Maps the declared SQL column type `decltype` to an Arrow type using the SQLite type affinity rules.
+    Returns None if the type cannot be determined from the declaration.
+    Dates and times are kept as strings, since that's how SQLite stores them.
+    Unsigned integer types like `UINT64` or `INTEGER UNSIGNED` become `uint64`, all other integers `int64`.
+    """
+
+    decltype = decltype.upper()
+
+    if "UINT" in decltype or ("INT" in decltype and "UNSIGNED" in decltype):
+        return pa.uint64()
+    elif "INT" in decltype:
+        return pa.int64()
+    elif "CHAR" in decltype or "CLOB" in decltype or "TEXT" in decltype or "DATE" in decltype or "TIME" in decltype:
+        return pa.string()
+    elif "BLOB" in decltype:
+        return pa.binary()
+    elif "REAL" in decltype or "FLOA" in decltype or "DOUB" in decltype:
+        return pa.float64()
+    elif "BOOL" in decltype:
+        return pa.bool_()
+    else:
+        return None
+
+
+def _infer_type(column: Sequence[Any]) -> pa.DataType:
+    try:
+        return pa.array(column).type
+    except OverflowError:  # integers which don't fit into int64
+        return pa.uint64()
+
+
+def _known_types(types: Optional[Dict[str, Optional[pa.DataType]]]) -> Dict[str, pa.DataType]:
+    return {name: type for name, type in (types or {}).items() if type is not None}
+
+
+def _infer_types(names: Sequence[str], rows: Sequence[Sequence[Any]], types: Dict[str, pa.DataType]) -> None:
+    """Adds the types of the columns of `rows` which are not in `types` yet and not only NULL to `types`."""
+
+    if not rows:
+        return
+
+    for name, column in zip(names, zip(*rows)):
+        if name not in types:
+            type = _infer_type(column)
+            if not pa.types.is_null(type):
+                types[name] = type
+
+
+def infer_schema(
+    names: Sequence[str], rows: Sequence[Sequence[Any]], types: Optional[Dict[str, Optional[pa.DataType]]] = None
+) -> pa.Schema:
+    """Creates a schema for the columns `names`. The types are taken from `types` if available (not None),
+    otherwise they are inferred from `rows`. Columns which only contain NULL values become strings.
+    """
+
+    _types = _known_types(types)
+    _infer_types(names, rows, _types)
+    return pa.schema([pa.field(name, _types.get(name, pa.string())) for name in names])
+
+
+def _to_array(column: Sequence[Any], type: pa.DataType) -> pa.Array:
+    # `pa.array(column, type=type)` silently truncates floats to integers, so a safe cast is used instead
+    try:
+        array = pa.array(column)
+    except OverflowError:  # integers which don't fit into int64
+        return pa.array(column, type=type)
+
+    if array.type == type:
+        return array
+    return array.cast(type, safe=True)
+
+
+def rows_to_record_batch(rows: Sequence[Sequence[Any]], schema: pa.Schema) -> pa.RecordBatch:
+    """Converts the row-oriented `rows` into a column-oriented Arrow record batch.
+    Raises `pyarrow.ArrowInvalid` if a value cannot be converted to the type of its column without loss.
+    """
+
+    if rows:
+        columns = zip(*rows)
+    else:
+        columns = ([] for _ in schema)
+
+    arrays = [_to_array(column, field.type) for column, field in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet_batches(
+    path: PathType,
+    batches: Iterable[Sequence[Sequence[Any]]],
+    names: Sequence[str],
+    schema: Optional[pa.Schema] = None,
+    types: Optional[Dict[str, pa.DataType]] = None,
+    compression: str = "zstd",
+    progress: Optional[Progress] = None,
+) -> int:
+    """Writes the batches of rows `batches` to the Parquet file `path`, one row group per batch.
+    Only one batch is kept in memory at a time.
+
+    `names`: Column names of the rows.
+    `schema`: Arrow schema of the file. If not given, it's created from `types` and the batches.
+            Batches are buffered until the type of every column is known, so columns which are NULL
+            for many rows should be given in `types`.
+    `types`: Arrow types of some or all columns.
+    `compression`: Parquet compression codec.
+
+    Returns the number of written rows.
+    """
+
+    progress = progress or Progress()
+    it = iter(batches)
+    buffered: List[List[Sequence[Any]]] = []
+
+    if schema is None:
+        _types = _known_types(types)
+        for batch in it:
+            buffered.append(list(batch))
+            _infer_types(names, buffered[-1], _types)
+            if all(name in _types for name in names):
+                break
+        schema = infer_schema(names, [], _types)
+    elif schema.names != list(names):
+        raise ValueError("Schema names don't match the column names")
+
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer, progress.task(
+        description="Writing rows"
+    ) as task:
+        for batch in chain(buffered, it):
+            if not batch:
+                continue
+            writer.write_batch(rows_to_record_batch(batch, schema), row_group_size=len(batch))
+            rows += len(batch)
+            task.advance(len(batch))
+
+    return rows
+
+
+def export_sql_to_parquet(
+    connection: Connection,
+    path: PathType,
+    query: str,
+    queryargs: tuple = (),
+    schema: Optional[pa.Schema] = None,
+    types: Optional[Dict[str, pa.DataType]] = None,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = "zstd",
+    progress: Optional[Progress] = None,
+) -> int:
+    """Exports the result of `query` from a SQL database to a Parquet file `path`.
+    `queryargs` will be passed to the query. The rows are fetched and written in row groups of `row_group_size` rows,
+    so memory usage doesn't depend on the size of the result. Unlike `sql.export_sql_to_csv`
+    the column types are preserved. See `write_parquet_batches` for the other arguments.
+
+    Returns the number of exported rows.
+    """
+
+    with CursorContext(connection) as cursor:
+        cursor.execute(query, queryargs)
+        names = tuple(map(itemgetter(0), cursor.description))
+        return write_parquet_batches(
+            path, iterfetchmany(cursor, row_group_size), names, schema, types, compression, progress
+        )
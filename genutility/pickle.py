@@ -1,11 +1,13 @@
 import importlib
 import logging
 import pickle  # nosec
-from typing import Any, Iterable, Iterator, Optional, Tuple
+from array import array
+from typing import IO, Any, Iterable, Iterator, Optional, Tuple
 
 from ._files import PathType
 from .atomic import sopen
 from .file import copen
+from .records import IndexedRecordFile, check_indexable, write_index
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +21,22 @@ def read_pickle(path: PathType) -> Any:
         return pickle.load(fr)  # nosec
 
 
-def write_pickle(result: Any, path: PathType, protocol: Optional[int] = None, safe: bool = False) -> None:
+def write_pickle(
+    result: Any,
+    path: PathType,
+    protocol: Optional[int] = None,
+    safe: bool = False,
+    compresslevel: int = 9,
+    threads: int = 0,
+) -> None:
     """Write `result` to `path` using pickle serialization.
 
     `protocol': pickle protocol version
     `safe`: if True, don't overwrite original file in case any error occurs
+    `compresslevel`, `threads`: see `file.copen`
     """
 
-    with sopen(path, "wb", safe=safe) as fw:
+    with sopen(path, "wb", safe=safe, compresslevel=compresslevel, threads=threads) as fw:
         pickle.dump(result, fw, protocol=protocol)
 
 
@@ -41,21 +51,57 @@ def read_iter(path: PathType) -> Iterator[Any]:
             yield unpickler.load()
 
 
-def write_iter(it: Iterable[Any], path: PathType, protocol: Optional[int] = None, safe: bool = False) -> Iterator[Any]:
+def _iterload(fr: IO[bytes]) -> Iterator[Any]:
+    unpickler = pickle.Unpickler(fr)  # nosec
+    while fr.peek(1):
+        yield unpickler.load()
+
+
+def open_indexed(path: PathType) -> IndexedRecordFile:
+    """Open pickled iterable written with `write_iter(..., index=True)` for random access.
+    Warning: All usual security consideration regarding the pickle module still apply.
+    """
+
+    return IndexedRecordFile(path, _iterload)
+
+
+def write_iter(
+    it: Iterable[Any],
+    path: PathType,
+    protocol: Optional[int] = None,
+    safe: bool = False,
+    index: bool = False,
+    compresslevel: int = 9,
+    threads: int = 0,
+) -> Iterator[Any]:
     """Write iterable `it` to `path` using pickle serialization. This uses much less memory than
             writing a full list at once.
     Read back using `read_iter()`. If `safe` is True, the original file is not overwritten
             if any error occurs.
+    If `index` is True, the records are pickled independently of each other and their offsets are written
+            to a sidecar index file. Such files can be read with random access using `open_indexed()`.
     This is a generator which yields the values read from `it`. So it must be consumed
             to actually write anything to disk.
+    `compresslevel`, `threads`: see `file.copen`
     """
 
-    with sopen(path, "wb", safe=safe) as fw:
+    if index:
+        check_indexable(path)
+
+    offsets = array("Q")
+    with sopen(path, "wb", safe=safe, compresslevel=compresslevel, threads=threads) as fw:
         pickler = pickle.Pickler(fw, protocol=protocol)
         for result in it:
+            if index:
+                offsets.append(fw.tell())
+                pickler.clear_memo()  # records must not reference previous records
             pickler.dump(result)
             yield result
 
+        if index:
+            offsets.append(fw.tell())
+            write_index(offsets, path, safe)
+
 
 def key_to_hash(key: Any, protocol: Optional[int] = None) -> str:
     from hashlib import md5
@@ -0,0 +1,228 @@
+import os
+import pickle  # nosec: B403
+import struct
+import sys
+from array import array
+from itertools import islice
+from types import TracebackType
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+from typing_extensions import Self
+
+from ._files import PathType
+from .atomic import sopen
+from .exceptions import assert_choice_map
+from .file import copen, will_compress
+
+INDEX_EXT = ".idx"
+LENGTH_PREFIX = struct.Struct("<I")
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+def index_path(path: PathType) -> str:
+    """Returns the path of the sidecar offset index of the record file at `path`."""
+
+    return os.fspath(path) + INDEX_EXT
+
+
+def check_indexable(path: PathType) -> None:
+    if will_compress(os.path.splitext(path)[1].lower()):
+        raise ValueError("Compressed record files cannot be indexed")
+
+
+def write_index(offsets: "array[int]", path: PathType, safe: bool = False) -> None:
+    """Writes the record offsets `offsets` as little-endian uint64 values to the index of the record file `path`.
+    The last offset must be the end of the last record.
+    """
+
+    if sys.byteorder == "big":
+        offsets = array("Q", offsets)
+        offsets.byteswap()
+
+    with sopen(index_path(path), "wb", safe=safe) as fw:
+        offsets.tofile(fw)
+
+
+def read_index(path: PathType) -> "array[int]":
+    """Reads the offsets from the index of the record file `path`."""
+
+    offsets = array("Q")
+    with open(index_path(path), "rb") as fr:
+        offsets.frombytes(fr.read())
+
+    if sys.byteorder == "big":
+        offsets.byteswap()
+
+    return offsets
+
+
+def shard_ranges(num: int, parts: int) -> List[Tuple[int, int]]:
+    """Splits `num` records into `parts` contiguous `(start, stop)` ranges of nearly equal size."""
+
+    if parts < 1:
+        raise ValueError("parts must be positive")
+
+    size, rest = divmod(num, parts)
+    out = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (i < rest)
+        out.append((start, stop))
+        start = stop
+    return out
+
+
+class IndexedRecordFile:
+    """Random access to a file of concatenated independently serialized records
+    using the offset index written alongside it, for example by `pickle.write_iter(..., index=True)`.
+    Seeking to a record doesn't require deserializing the records before it.
+    The iterators share one file handle, so they cannot be consumed interleaved.
+
+    `path`: Path of the record file.
+    `iterload`: Function which takes a binary file positioned at the start of a record
+            and yields the deserialized records from this position onwards.
+    """
+
+    def __init__(self, path: PathType, iterload: Callable[[IO[bytes]], Iterator[Any]]) -> None:
+        self.path = path
+        self.iterload = iterload
+        self.offsets = read_index(path)
+        self.fr = open(path, "rb")
+
+        size = os.fstat(self.fr.fileno()).st_size
+        if len(self.offsets) == 0 or self.offsets[-1] != size:
+            self.fr.close()
+            raise ValueError(f"Index doesn't match record file <{os.fspath(path)}>")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.iter()
+
+    def iter(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Any]:
+        """Yields the records `start` (inclusive) to `stop` (exclusive)."""
+
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start >= stop:
+            return
+
+        self.fr.seek(self.offsets[start])
+        yield from islice(self.iterload(self.fr), stop - start)
+
+    def shards(self, parts: int) -> List[Tuple[int, int]]:
+        """Splits the records into `parts` `(start, stop)` ranges, which can be passed to `iter()`
+        of different processes.
+        """
+
+        return shard_ranges(len(self), parts)
+
+    def __getitem__(self, key: Union[int, slice]) -> Any:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return list(self.iter(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+
+        num = len(self)
+        if key < 0:
+            key += num
+        if not 0 <= key < num:
+            raise IndexError("record index out of range")
+
+        return next(self.iter(key, key + 1))
+
+    def close(self) -> None:
+        self.fr.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+def _pickle_dumps(obj: Any) -> bytes:
+    return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _msgpack_dumps(obj: Any) -> bytes:
+    from .msgpack import default, packb
+
+    return packb(obj, use_bin_type=True, default=default)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    from .msgpack import ext_hook, unpackb
+
+    return unpackb(data, use_list=False, raw=False, ext_hook=ext_hook)
+
+
+_serializers: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "pickle": (_pickle_dumps, pickle.loads),
+    "msgpack": (_msgpack_dumps, _msgpack_loads),
+}
+
+
+def write_length_prefixed(fw: IO[bytes], items: Iterable[Any], encode: Callable[[Any], bytes]) -> None:
+    """Writes `items` as length-prefixed binary records encoded by `encode`.
+    The records are collected in a buffer first, since writing them one by one to compressed files is slow.
+    """
+
+    pack = LENGTH_PREFIX.pack
+    buf = bytearray()
+    for item in items:
+        data = encode(item)
+        buf += pack(len(data))
+        buf += data
+        if len(buf) >= DEFAULT_BUFFER_SIZE:
+            fw.write(buf)
+            buf.clear()
+    fw.write(buf)
+
+
+def read_length_prefixed(
+    path: PathType, decode: Callable[[bytes], Any], buffer_size: int = DEFAULT_BUFFER_SIZE
+) -> Iterator[Any]:
+    """Reads the length-prefixed binary records written by `write_length_prefixed` from the file `path`.
+    The file is read in blocks of `buffer_size` bytes.
+    """
+
+    size = LENGTH_PREFIX.size
+    unpack_from = LENGTH_PREFIX.unpack_from
+    buf = b""
+    pos = 0
+
+    with copen(path, "rb") as fr:
+        while True:
+            block = fr.read(buffer_size)
+            if not block:
+                break
+            buf = buf[pos:] + block
+            pos = 0
+            end = len(buf)
+            while pos + size <= end:
+                (length,) = unpack_from(buf, pos)
+                stop = pos + size + length
+                if stop > end:
+                    break
+                data = buf[pos + size : stop]
+                pos = stop
+                yield decode(data)
+
+    if pos != len(buf):
+        raise EOFError(f"Truncated record file <{os.fspath(path)}>")
+
+
+def serializer_functions(name: str) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    """Returns the `(dumps, loads)` functions of the serializer `name`, which is "pickle" or "msgpack".
+    The functions are picklable, so they can be passed to other processes.
+    msgpack only supports basic types and returns sequences as tuples.
+    """
+
+    return assert_choice_map("serializer", name, _serializers)
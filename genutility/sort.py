@@ -1,16 +1,21 @@
 import heapq
 import os
+import sys
+from collections import deque
 from collections.abc import Iterable
-from contextlib import ExitStack
-from itertools import islice
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import count, groupby, islice
 from operator import itemgetter
-from typing import Any, AnyStr, Callable, Generic
+from typing import Any, AnyStr, Callable, Deque, Generic
 from typing import Iterable as IterableT
 from typing import Iterator, List, MutableSequence, Optional, Tuple, TypeVar, Union
 
+from .concurrency import FutureWithResult
+from .exceptions import assert_choice
 from .file import copen
 from .func import identity
 from .math import argmax, argmin
+from .records import DEFAULT_BUFFER_SIZE, read_length_prefixed, serializer_functions, write_length_prefixed
 
 T = TypeVar("T")
 U = TypeVar("U")
@@ -117,81 +122,327 @@ def sorted_with_keys(it: IterableT[T], key: Callable[[T], U], reverse: bool = Fa
     return sorted(with_keys, key=itemgetter(1), reverse=reverse)
 
 
+_pair_key = itemgetter(0)
+_pair_value = itemgetter(1)
+
+DEFAULT_MAX_BYTES_TEMP = 256 * 1024 * 1024
+DEFAULT_MAX_FAN_IN = 64
+
+
+def _encode_text(item: str) -> bytes:
+    return item.encode("utf-8")
+
+
+def _decode_text(data: bytes) -> str:
+    return data.decode("utf-8")
+
+
+def _unique_sorted(it: IterableT[T], key: Optional[Callable[[T], Any]]) -> Iterator[T]:
+    """Yields the first item of each group of consecutive items with equal keys."""
+
+    for _, group in groupby(it, key):
+        yield next(group)
+
+
+def _finalize(it: IterableT[T], key: Optional[Callable[[T], Any]], unique: bool, limit: Optional[int]) -> IterableT[T]:
+    if unique:
+        it = _unique_sorted(it, key)
+    if limit is not None:
+        it = islice(it, limit)
+    return it
+
+
+def _sort_run(
+    path: str,
+    items: List[Any],
+    key: Optional[Callable[[Any], Any]],
+    encode: Callable[[Any], bytes],
+    unique: bool,
+    limit: Optional[int],
+) -> str:
+    items.sort(key=key)
+    with copen(path, "wb", compresslevel=1) as fw:
+        write_length_prefixed(fw, _finalize(items, key, unique, limit), encode)
+    return path
+
+
+def _sort_record_run(
+    path: str,
+    items: List[Any],
+    key: Callable[[Any], Any],
+    encode: Callable[[Any], bytes],
+    unique: bool,
+    limit: Optional[int],
+) -> str:
+    # the keys are calculated once here and stored together with the records in the run file
+    pairs = [(key(item), item) for item in items]
+    return _sort_run(path, pairs, _pair_key, encode, unique, limit)
+
+
+def _merge_runs(
+    path: str,
+    inpaths: List[str],
+    key: Optional[Callable[[Any], Any]],
+    encode: Callable[[Any], bytes],
+    decode: Callable[[bytes], Any],
+    unique: bool,
+    limit: Optional[int],
+    buffer_size: int,
+) -> str:
+    with copen(path, "wb", compresslevel=1) as fw:
+        merged = _merged_records(inpaths, key, decode, buffer_size)
+        write_length_prefixed(fw, _finalize(merged, key, unique, limit), encode)
+    for inpath in inpaths:
+        os.remove(inpath)
+    return path
+
+
+def _merged_records(
+    paths: List[str], key: Optional[Callable[[Any], Any]], decode: Callable[[bytes], Any], buffer_size: int
+) -> Iterator[Any]:
+    runs = [read_length_prefixed(path, decode, buffer_size) for path in paths]
+    try:
+        # heapq.merge is stable, so equal items keep the order of the runs
+        yield from heapq.merge(*runs, key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+class _RunPool:
+    """Executes the run tasks either in the calling process or in a process pool.
+    At most `workers` tasks are pending at once, which bounds the number of runs held in memory.
+    """
+
+    def __init__(self, workers: int) -> None:
+        if workers == -1:
+            workers = os.cpu_count() or 1
+        elif workers < 0:
+            raise ValueError("workers must be non-negative or -1")
+
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(workers) if workers else None
+        self.pending: Deque[Future] = deque()
+
+    def submit(self, func: Callable[..., str], *args: Any) -> "Future[str]":
+        if self.executor is None:
+            return FutureWithResult(func(*args))
+
+        future = self.executor.submit(func, *args)
+        self.pending.append(future)
+        while len(self.pending) > self.workers:
+            self.pending.popleft().result()
+        return future
+
+    def close(self) -> None:
+        if self.executor is not None:
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown()
+
+
+def _external_sort(
+    in_iterator: IterableT[Any],
+    temp_file_template: str,
+    run_func: Callable[..., str],
+    key: Optional[Callable[[Any], Any]],
+    merge_key: Optional[Callable[[Any], Any]],
+    encode: Callable[[Any], bytes],
+    decode: Callable[[bytes], Any],
+    unique: bool,
+    max_lines_temp: Optional[int],
+    max_lines_final: Optional[int],
+    max_bytes_temp: Optional[int],
+    workers: int,
+    max_fan_in: int,
+    buffer_size: int,
+) -> Iterator[Any]:
+    """Sorts the items of `in_iterator` into runs using `run_func` and merges them using `merge_key`.
+    Yields the decoded items of the run files.
+    """
+
+    if max_fan_in < 2:
+        raise ValueError("max_fan_in must be at least 2")
+
+    if max_lines_temp is None and max_bytes_temp is None:
+        max_bytes_temp = DEFAULT_MAX_BYTES_TEMP
+
+    file_count = count()
+    pool = _RunPool(workers)
+    run_args = (key, encode, unique, max_lines_final)
+
+    try:
+        # create sorted runs
+
+        futures: List["Future[str]"] = []
+        items: List[Any] = []
+        nbytes = 0
+
+        for item in in_iterator:
+            items.append(item)
+            nbytes += sys.getsizeof(item)
+            if (max_lines_temp is not None and len(items) >= max_lines_temp) or (
+                max_bytes_temp is not None and nbytes >= max_bytes_temp
+            ):
+                futures.append(pool.submit(run_func, temp_file_template.format(next(file_count)), items, *run_args))
+                items = []
+                nbytes = 0
+        if items:
+            futures.append(pool.submit(run_func, temp_file_template.format(next(file_count)), items, *run_args))
+            items = []
+        runs = [future.result() for future in futures]
+
+        # merge runs in multiple passes until the final merge doesn't exceed the fan-in.
+        # the groups are consecutive runs, so the merge stays stable.
+
+        while len(runs) > max_fan_in:
+            futures = []
+            for i in range(0, len(runs), max_fan_in):
+                group = runs[i : i + max_fan_in]
+                if len(group) == 1:
+                    futures.append(FutureWithResult(group[0]))
+                else:
+                    path = temp_file_template.format(next(file_count))
+                    futures.append(
+                        pool.submit(
+                            _merge_runs, path, group, merge_key, encode, decode, unique, max_lines_final, buffer_size
+                        )
+                    )
+            runs = [future.result() for future in futures]
+
+        merged = _merged_records(runs, merge_key, decode, buffer_size)
+        yield from _finalize(merged, merge_key, unique, max_lines_final)
+
+    finally:
+        pool.close()
+        for i in range(next(file_count)):
+            try:
+                os.remove(temp_file_template.format(i))
+            except FileNotFoundError:
+                pass
+
+
 def external_sort(
     in_iterator: IterableT[AnyStr],
     temp_file_template: str,
     mode: str = "t",
-    key: Optional[Callable[[str], Any]] = None,
+    key: Optional[Callable[[AnyStr], Any]] = None,
     max_lines_temp: Optional[int] = None,
     max_lines_final: Optional[int] = None,
+    max_bytes_temp: Optional[int] = None,
+    workers: int = 0,
+    max_fan_in: int = DEFAULT_MAX_FAN_IN,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    unique: bool = False,
 ) -> Iterator[AnyStr]:
-    """Sorts `in_iterator` by using external files. Keeps at most `max_lines_temp` lines in memory at any time.
-    `in_iterator` must not yield any newlines. They must be escaped beforehand.
+    """Sorts `in_iterator` by using external files. The sort is stable.
     If mode is "t" `in_iterator` must yield `str`, mode "b" it must yield `bytes`.
-    `max_lines_final` limits output size. `key` is the key function for `sort()`.
+    The items are stored in a length-prefixed binary format, so they can contain arbitrary data including newlines.
+    Run files are created by formatting `temp_file_template` with a counter. A compressed file extension
+    like ".gz" enables fast compression of the runs. All run files are removed afterwards.
+
+    `key`: Key function for `sort()`. Must be picklable if `workers` is used.
+    `max_lines_temp`: Maximum number of items per sorted run.
+    `max_lines_final`: Limits output size.
+    `max_bytes_temp`: Memory budget in bytes of the items of a sorted run. Defaults to 256 MiB
+            if neither `max_lines_temp` nor `max_bytes_temp` is given.
+            With `workers`, up to `workers + 1` runs are held in memory at the same time.
+    `workers`: Number of processes which sort and write the runs and perform the intermediate merges.
+            0 does everything in the calling process, -1 uses one process per logical core.
+    `max_fan_in`: Maximum number of runs which are merged at once. If there are more runs,
+            they are merged in multiple passes, which limits the number of open files.
+    `buffer_size`: Read buffer size per run file during merging.
+    `unique`: Only output the first of the items with equal keys.
+
+    See `external_sort_records` for sorting other objects than strings.
     """
 
-    # doesn't handle newlines in input correctly
-
-    assert mode in {"t", "b"}
+    assert_choice("mode", mode, {"t", "b"})
 
     if mode == "t":
-        encoding: Optional[str] = "utf-8"
-        errors: Optional[str] = "strict"
-        newline: AnyStr = "\n"
+        encode: Callable[[Any], bytes] = _encode_text
+        decode: Callable[[bytes], Any] = _decode_text
     else:
-        encoding = None
-        errors = None
-        newline = b"\n"
-
-    if key is None:
-        key = identity
-
-    if max_lines_temp is None:
-        # find some clever way to do that, based on memory and so on.
-        max_lines_temp = 10000000
-
-    def file_write_iter(path, it):
-        with copen(path, "w" + mode, compresslevel=1, encoding=encoding, errors=errors, newline=newline) as fw:
-            for line in it:
-                fw.write(line + newline)
-
-    # create temp files, write sequentially
-
-    file_count = 0
-    lines: List[AnyStr] = []
-
-    for line in in_iterator:
-        lines.append(line.rstrip(newline))  # removes newlines from input
-        if len(lines) >= max_lines_temp:
-            lines.sort(key=key)
-            file_write_iter(temp_file_template.format(file_count), lines)
-            file_count += 1
-            lines = []
-    if lines:
-        lines.sort(key=key)
-        file_write_iter(temp_file_template.format(file_count), lines)
-        file_count += 1
-        lines = []
-
-    # merge temp files, read parallel
+        encode = decode = identity
+
+    return _external_sort(
+        in_iterator,
+        temp_file_template,
+        _sort_run,
+        key,
+        key,
+        encode,
+        decode,
+        unique,
+        max_lines_temp,
+        max_lines_final,
+        max_bytes_temp,
+        workers,
+        max_fan_in,
+        buffer_size,
+    )
 
-    filenames = [temp_file_template.format(i) for i in range(file_count)]
-    with ExitStack() as stack:
-        files = [
-            stack.enter_context(copen(name, "r" + mode, encoding=encoding, errors=errors, newline=newline))
-            for name in filenames
-        ]
 
-        merged = heapq.merge(*files, key=key)
+def external_sort_records(
+    in_iterator: IterableT[T],
+    temp_file_template: str,
+    key: Optional[Callable[[T], Any]] = None,
+    serializer: str = "pickle",
+    unique: bool = False,
+    max_lines_temp: Optional[int] = None,
+    max_lines_final: Optional[int] = None,
+    max_bytes_temp: Optional[int] = None,
+    workers: int = 0,
+    max_fan_in: int = DEFAULT_MAX_FAN_IN,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+) -> Iterator[T]:
+    """Sorts the objects of `in_iterator` by using external files. The sort is stable.
+    Unlike `external_sort`, the objects can be anything which can be serialized by `serializer`.
+    `key` is called only once per object and the key is stored alongside the object in the run files,
+    so merging doesn't need to call it again. It must be picklable if `workers` is used.
+
+    `serializer`: "pickle" or "msgpack". msgpack is usually faster and more compact,
+            but only supports basic types and returns sequences as tuples.
+    `unique`: Only output the first of the objects with equal keys. Duplicates are already removed
+            from the runs and intermediate merges.
+    `max_lines_final`: Only output the first `max_lines_final` objects. The runs and intermediate merges
+            are truncated to this size as well, so small values make the sort much faster.
+    `max_bytes_temp`: Memory budget in bytes of the objects of a sorted run. Only the shallow size
+            of the objects as returned by `sys.getsizeof` is considered.
+
+    See `external_sort` for the other arguments.
+    """
 
-        for line in islice(merged, max_lines_final):
-            yield line.rstrip(newline)
+    encode, decode = serializer_functions(serializer)
 
-    # remove temp files
+    if key is None:
+        run_func: Callable[..., str] = _sort_run
+        merge_key = None
+    else:
+        run_func = _sort_record_run
+        merge_key = _pair_key
+
+    it = _external_sort(
+        in_iterator,
+        temp_file_template,
+        run_func,
+        key,
+        merge_key,
+        encode,
+        decode,
+        unique,
+        max_lines_temp,
+        max_lines_final,
+        max_bytes_temp,
+        workers,
+        max_fan_in,
+        buffer_size,
+    )
 
-    for name in filenames:
-        os.remove(name)
+    if key is None:
+        return it
+    else:
+        return map(_pair_value, it)
 
 
 def external_sort_file(
@@ -201,15 +452,20 @@ def external_sort_file(
     sort_key: Optional[Callable[[str], Any]] = None,
     max_lines_temp: Optional[int] = None,
     max_lines_final: Optional[int] = None,
+    max_bytes_temp: Optional[int] = None,
+    workers: int = 0,
 ) -> None:
     """Sorts file `in_file` to `out_file` line by line using external files
     provided by filename `template temp_file_template`.
-    At most `max_lines_temp` lines will be in memory at any time.
+    See `external_sort` for the memory limits and `workers`.
     """
 
     with copen(in_file, "rt", encoding="utf-8", errors="strict") as fr, copen(
         out_file, "wt", encoding="utf-8", errors="strict", newline="\n"
     ) as fw:
-        lines = external_sort(fr, temp_file_template, "t", sort_key, max_lines_temp, max_lines_final)
+        lines = (line.rstrip("\n") for line in fr)  # the last line might not end with a newline
+        lines = external_sort(
+            lines, temp_file_template, "t", sort_key, max_lines_temp, max_lines_final, max_bytes_temp, workers
+        )
 
         fw.writelines(map(lambda s: s + "\n", lines))
@@ -3,7 +3,7 @@ from datetime import datetime
 from decimal import Decimal
 from itertools import chain, repeat
 from operator import itemgetter
-from typing import Any, Iterator, Optional
+from typing import Any, Iterator, List, Optional
 
 from .callbacks import Progress
 from .dict import mapmap
@@ -110,13 +110,20 @@ def fetchone(cursor: Cursor) -> Any:
         raise InconsistentState("More than one result found")
 
 
-def iterfetch(cursor: Cursor, batchsize: int = 1000) -> Iterator[Any]:
-    """Iterate all results from `cursor`."""
+def iterfetchmany(cursor: Cursor, batchsize: int = 1000) -> Iterator[List[Any]]:
+    """Iterate all results from `cursor` in lists of at most `batchsize` rows."""
 
     while True:
         results = cursor.fetchmany(batchsize)
         if not results:
             break
+        yield results
+
+
+def iterfetch(cursor: Cursor, batchsize: int = 1000) -> Iterator[Any]:
+    """Iterate all results from `cursor`."""
+
+    for results in iterfetchmany(cursor, batchsize):
         yield from results
 
 
@@ -4,7 +4,25 @@ import os.path
 import platform
 import re
 import sqlite3
-from typing import Iterable, List, Optional
+import threading
+import warnings
+from contextlib import contextmanager
+from queue import Empty, LifoQueue, Queue
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 from urllib.parse import urlencode
 
 from ._files import to_dos_path
@@ -13,6 +31,8 @@ from .iter import batch
 from .signal import safe_for_loop
 from .string import build_multiple_replace
 
+T = TypeVar("T")
+
 _is_win = platform.system() == "Windows"
 
 
@@ -40,6 +60,215 @@ def quote_identifier(s: str, errors: str = "strict") -> str:
     return '"' + encodable.replace('"', '""') + '"'
 
 
+def max_variable_number(connection: sqlite3.Connection) -> int:
+    """Returns the maximum number of host parameters in a single statement (`SQLITE_MAX_VARIABLE_NUMBER`)."""
+
+    try:
+        return connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    except AttributeError:  # Python < 3.11
+        if sqlite3.sqlite_version_info >= (3, 32, 0):
+            return 32766
+        return 999
+
+
+def set_pragmas(cursor: sqlite3.Cursor, pragmas: Mapping[str, Any]) -> None:
+    """Sets the pragmas given as mapping of names to values, for example `{"journal_mode": "WAL"}`.
+    The names are not escaped.
+    """
+
+    for name, value in pragmas.items():
+        if isinstance(value, str):
+            cursor.execute(f"PRAGMA {name}={quote_identifier(value)}")
+        else:
+            cursor.execute(f"PRAGMA {name}={int(value)}")
+        cursor.fetchall()  # journal_mode returns the new mode
+
+
+class ConnectionPoolTimeout(TimeoutError):
+    pass
+
+
+class ReadConnectionPool:
+    """Pool of read-only connections to the SQLite database at `dbpath` which can be shared between threads.
+    Connections are opened on demand up to `size`. If all of them are in use, `connection()` blocks
+    until one is returned. Use the database in WAL mode, so readers don't block the writer and vice versa.
+    Connections should not be held across `yield`s of generators, since abandoned generators don't return them.
+
+    `on_connect`: Called with every newly opened connection.
+    `timeout`: Raise `ConnectionPoolTimeout` if no connection was returned within `timeout` seconds.
+            Wait indefinitely if None.
+    `kwargs`: Passed to `sqlite3.connect`.
+    """
+
+    def __init__(
+        self,
+        dbpath: str,
+        size: int,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> None:
+        if size < 1:
+            raise ValueError("size must be positive")
+
+        self.uri = to_uri(os.path.abspath(dbpath), mode="ro")
+        self.size = size
+        self.on_connect = on_connect
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self.idle: "LifoQueue[sqlite3.Connection]" = LifoQueue()
+        self.lock = threading.Lock()
+        self.connections: List[sqlite3.Connection] = []
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            pass
+
+        with self.lock:
+            if len(self.connections) < self.size:
+                conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False, **self.kwargs)
+                if self.on_connect is not None:
+                    self.on_connect(conn)
+                self.connections.append(conn)
+                return conn
+
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except Empty:
+            raise ConnectionPoolTimeout(f"No connection was returned to the pool within {self.timeout} seconds")
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle.put(conn)
+
+    def close(self) -> None:
+        """Closes all connections. Connections which are currently in use are closed as well."""
+
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+            self.idle = LifoQueue()
+
+
+class FullTableScanWarning(UserWarning):
+    pass
+
+
+_full_scan_pattern = re.compile(r"^SCAN (?:TABLE )?(\S+)$")
+
+
+def explain_query_plan(cursor: sqlite3.Cursor, sql: str, args: Sequence[Any] = ()) -> List[str]:
+    """Returns the details of the query plan of `sql`, like `SEARCH t USING INDEX t_path (path=?)`."""
+
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", args)
+    return [detail for _id, _parent, _notused, detail in cursor.fetchall()]
+
+
+def full_table_scans(plan: Iterable[str]) -> List[str]:
+    """Returns the names of tables (or aliases) which are scanned without using an index according to `plan`."""
+
+    out = []
+    for detail in plan:
+        m = _full_scan_pattern.match(detail)
+        if m:
+            out.append(m.group(1))
+    return out
+
+
+class QueryProfile:
+    """Latencies of a single SQL statement. `histogram` maps `k` to the number of executions which took
+    between 2**(k-1) and 2**k microseconds.
+    """
+
+    __slots__ = ("plan", "count", "total", "histogram")
+
+    def __init__(self, plan: List[str]) -> None:
+        self.plan = plan
+        self.count = 0
+        self.total = 0.0
+        self.histogram: Dict[int, int] = {}
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        bucket = int(seconds * 1_000_000).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    @property
+    def mean(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def __repr__(self) -> str:
+        return f"QueryProfile(count={self.count}, total={self.total:.6f}, plan={self.plan!r})"
+
+
+class QueryProfiler:
+    """Collects the query plan and a latency histogram for every distinct SQL statement executed by `execute()`.
+    The query plan is captured once on first execution. If the plan contains a full scan
+    of one of the tables (or aliases) in `tables`, a `FullTableScanWarning` is issued.
+    Latencies only include the `execute()` call, not fetching the results.
+    """
+
+    def __init__(self, tables: Collection[str] = (), warn_scans: bool = True) -> None:
+        self.tables = tables
+        self.warn_scans = warn_scans
+        self.queries: Dict[str, QueryProfile] = {}
+        self.lock = threading.Lock()
+
+    def execute(
+        self, cursor: sqlite3.Cursor, sql: str, args: Sequence[Any] = (), scan_ok: bool = False
+    ) -> sqlite3.Cursor:
+        """Executes `sql` with `args` on `cursor`. `scan_ok` disables the warning for queries
+        which are expected to read the whole table.
+        """
+
+        profile = self.queries.get(sql)
+        if profile is None:
+            plan = explain_query_plan(cursor, sql, args)
+            profile = QueryProfile(plan)
+            with self.lock:
+                profile = self.queries.setdefault(sql, profile)
+
+            if self.warn_scans and not scan_ok:
+                scanned = [name for name in full_table_scans(plan) if name in self.tables]
+                if scanned:
+                    warnings.warn(
+                        f"Query uses full table scan of {', '.join(scanned)}: {' '.join(sql.split())}",
+                        FullTableScanWarning,
+                        stacklevel=3,
+                    )
+
+        start = perf_counter()
+        cursor.execute(sql, args)
+        delta = perf_counter() - start
+        with self.lock:
+            profile.add(delta)
+
+        return cursor
+
+    def slowest(self, n: int = 10) -> List[Tuple[str, QueryProfile]]:
+        """Returns the `n` statements with the highest total latency."""
+
+        with self.lock:
+            items = list(self.queries.items())
+        return sorted(items, key=lambda item: item[1].total, reverse=True)[:n]
+
+    def reset(self) -> None:
+        with self.lock:
+            self.queries.clear()
+
+
 def vacuum(db_path: str) -> None:
     """Vacuums a sqlite database."""
 
@@ -47,6 +276,84 @@ def vacuum(db_path: str) -> None:
         conn.execute("VACUUM")
 
 
+class _PrefetchedBatches:
+    """Collects batches of `batch_size` items from `it` in a background thread and passes them
+    to the consumer through a queue of at most `maxsize` batches.
+    """
+
+    _END = object()
+
+    def __init__(self, it: Iterable[T], batch_size: int, maxsize: int) -> None:
+        self.it = it
+        self.batch_size = batch_size
+        self.queue: "Queue[Any]" = Queue(maxsize)
+        self.stopped = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+        self.thread.start()
+
+    def _produce(self) -> None:
+        try:
+            data: List[T] = []
+            for item in self.it:
+                data.append(item)
+                if len(data) == self.batch_size:
+                    self.queue.put(data)
+                    data = []
+                if self.stopped.is_set():
+                    break
+            if data:
+                self.queue.put(data)
+        except BaseException as e:
+            self.queue.put(_ProducerError(e))
+        finally:
+            self.queue.put(self._END)
+
+    def _get(self) -> Optional[List[T]]:
+        item = self.queue.get()
+        if item is self._END:
+            self.finished = True
+            self.thread.join()
+            return None
+        elif isinstance(item, _ProducerError):
+            raise item.exception
+        return item
+
+    def __iter__(self) -> Iterator[List[T]]:
+        while not self.finished:
+            data = self._get()
+            if data is None:
+                break
+            yield data
+
+    def stop(self) -> List[List[T]]:
+        """Stops consuming `it` after the current item and returns all batches of items
+        which were already consumed but not yet passed on.
+        """
+
+        self.stopped.set()
+        out = []
+        while not self.finished:
+            data = self._get()
+            if data is not None:
+                out.append(data)
+        return out
+
+
+class _ProducerError:
+    __slots__ = ("exception",)
+
+    def __init__(self, exception: BaseException) -> None:
+        self.exception = exception
+
+
+def _batches(it: Iterable[T], batch_size: int, prefetch: int) -> Iterable[List[T]]:
+    if prefetch > 0:
+        return _PrefetchedBatches(it, batch_size, prefetch)
+    else:
+        return batch(it, batch_size, list)
+
+
 def batch_executer(
     cursor: sqlite3.Cursor,
     query_str: str,
@@ -54,25 +361,52 @@ def batch_executer(
     batch_size: int = 10000,
     exclusive: bool = True,
     progress: Optional[Progress] = None,
+    prefetch: int = 0,
+    pragmas: Optional[Mapping[str, Any]] = None,
+    commit_interval: int = 1,
 ) -> int:
     """Execute `query_str` with parameters from `it` batch-wise with batches of size `batch_size`.
     If `exclusive` is True the database will be locked in exclusive mode.
+
+    `prefetch`: If larger than 0, `it` is consumed in a background thread which queues up to `prefetch` batches,
+            so producing the rows overlaps with writing them. The connection is only used by the calling thread.
+            The queue provides backpressure if the producer is faster than the database.
+    `pragmas`: Set before executing the queries, for example `{"journal_mode": "WAL", "synchronous": "NORMAL"}`.
+    `commit_interval`: Number of batches written in one transaction.
+
+    Returns the number of executed rows.
     """
 
     if exclusive:
         cursor.execute("PRAGMA locking_mode=EXCLUSIVE")  # might speed things up
+    if pragmas:
+        set_pragmas(cursor, pragmas)
 
     entries = 0
+    batches = 0
 
     progress = progress or Progress()
-    for data in batch(progress.track(it), batch_size, list):
-        # need to cache batch data, because if the iterable is exhausted,
-        # executemany raises `sqlite3.ProgrammingError`
-        if data:
-            cursor.execute("BEGIN TRANSACTION")
+    source = _batches(progress.track(it), batch_size, prefetch)
+    try:
+        for data in source:
+            # need to cache batch data, because if the iterable is exhausted,
+            # executemany raises `sqlite3.ProgrammingError`
+            if batches % commit_interval == 0:
+                cursor.execute("BEGIN TRANSACTION")
             cursor.executemany(query_str, data)
-            cursor.execute("COMMIT TRANSACTION")
+            batches += 1
             entries += len(data)
+            if batches % commit_interval == 0:
+                cursor.execute("COMMIT TRANSACTION")
+
+        if batches % commit_interval != 0:
+            cursor.execute("COMMIT TRANSACTION")
+    except BaseException:
+        if isinstance(source, _PrefetchedBatches):
+            source.stop()
+        if cursor.connection.in_transaction:
+            cursor.execute("ROLLBACK TRANSACTION")
+        raise
 
     return entries
 
@@ -84,36 +418,70 @@ def safe_batch_executer(
     batch_size: int = 10000,
     exclusive: bool = True,
     progress: Optional[Progress] = None,
+    prefetch: int = 0,
+    pragmas: Optional[Mapping[str, Any]] = None,
+    commit_interval: int = 1,
 ) -> None:
     """Execute `query_str` with parameters from `it` batch-wise with batches of size `batch_size`.
     If `exclusive` is True the database will be locked in exclusive mode.
     If an db integrity error occurs, the batch will be skipped and the transaction for
     this batch rolled back.
     If the iterable is advanced, the user can be sure its elements will be inserted into the
-    database, even if a KeyboardInterrupt is received in-between.
+    database, even if a KeyboardInterrupt is received in-between. With `prefetch`, the batches which
+    were already consumed from `it` are written before returning.
+
+    See `batch_executer` for `prefetch`, `pragmas` and `commit_interval`.
     """
 
     if exclusive:
         cursor.execute("PRAGMA locking_mode=EXCLUSIVE")  # might speed things up
+    if pragmas:
+        set_pragmas(cursor, pragmas)
 
     progress = progress or Progress()
-    source = batch(progress.track(it), batch_size)
+    source = _batches(progress.track(it), batch_size, prefetch)
+    batches = 0
 
     def sqlexec(queries_batch):
-        try:
+        nonlocal batches
+
+        if not cursor.connection.in_transaction:
             cursor.execute("BEGIN TRANSACTION")
+
+        # savepoints allow skipping single batches within longer transactions
+        cursor.execute("SAVEPOINT batch")
+        try:
             cursor.executemany(query_str, queries_batch)
-            cursor.execute("COMMIT TRANSACTION")
+            cursor.execute("RELEASE SAVEPOINT batch")
         except sqlite3.IntegrityError:
             logging.info("Skipping batch")
-            cursor.execute("ROLLBACK TRANSACTION")
+            cursor.execute("ROLLBACK TRANSACTION TO SAVEPOINT batch")
+            cursor.execute("RELEASE SAVEPOINT batch")
         except sqlite3.OperationalError:
             raise
 
+        batches += 1
+        if batches % commit_interval == 0:
+            cursor.execute("COMMIT TRANSACTION")
+
+    def commit():
+        if cursor.connection.in_transaction:
+            cursor.execute("COMMIT TRANSACTION")
+
     try:
-        safe_for_loop(source, sqlexec)
+        safe_for_loop(source, sqlexec, commit)
     except KeyboardInterrupt:
+        if isinstance(source, _PrefetchedBatches):
+            for queries_batch in source.stop():
+                sqlexec(queries_batch)
+        commit()
         logging.info("Batch execution safely interrupted")
+    except BaseException:
+        if isinstance(source, _PrefetchedBatches):
+            source.stop()
+        if cursor.connection.in_transaction:
+            cursor.execute("ROLLBACK TRANSACTION")
+        raise
 
 
 _percent_encode = build_multiple_replace({"%": "%25", "?": "%3f", "#": "%23"})
@@ -1,4 +1,7 @@
-from genutility.atomic import TransactionalCreateFile
+import os
+import time
+
+from genutility.atomic import FileLock, FileLockTimeout, TransactionalCreateFile
 from genutility.test import MyTestCase
 
 
@@ -16,6 +19,68 @@ class AtomicTest(MyTestCase):
 
         self.assertEqual("".join(values), result)
 
+    def test_FileLock(self):
+        path = "testtemp/FileLock.lock"
+        if os.path.exists(path):
+            os.remove(path)
+
+        with FileLock(path):
+            self.assertTrue(os.path.exists(path))
+            with self.assertRaises(FileLockTimeout):
+                FileLock(path, timeout=0.2, poll_interval=0.05).acquire()
+        self.assertFalse(os.path.exists(path))
+
+    def test_FileLock_stale(self):
+        path = "testtemp/FileLock-stale.lock"
+        with open(path, "wb"):
+            pass
+        os.utime(path, (0, 0))
+
+        with FileLock(path, timeout=1.0, stale=60.0):
+            pass
+        self.assertFalse(os.path.exists(path))
+
+    def test_FileLock_heartbeat(self):
+        path = "testtemp/FileLock-heartbeat.lock"
+        if os.path.exists(path):
+            os.remove(path)
+
+        with FileLock(path, stale=0.2):
+            time.sleep(0.5)  # longer than `stale`, the owner keeps the lock file fresh
+            with self.assertRaises(FileLockTimeout):
+                FileLock(path, timeout=0.3, stale=0.2, poll_interval=0.05).acquire()
+        self.assertFalse(os.path.exists(path))
+
+    def test_FileLock_remove_stale_live(self):
+        path = "testtemp/FileLock-remove-stale.lock"
+        if os.path.exists(path):
+            os.remove(path)
+
+        # the stale lock file was replaced by a live one between the checks and the rename
+        with FileLock(path) as owner:
+            lock = FileLock(path, stale=60.0)
+            tokens = iter(["token of the stale file"])
+            read_token = lock._read_token
+            lock._is_stale = lambda p: True
+            lock._read_token = lambda p: next(tokens, None) or read_token(p)
+            lock._remove_stale()
+            self.assertEqual(owner.token, read_token(path))
+        self.assertEqual([], [n for n in os.listdir("testtemp") if n.startswith("FileLock-remove-stale")])
+
+    def test_FileLock_release_foreign(self):
+        path = "testtemp/FileLock-release-foreign.lock"
+        if os.path.exists(path):
+            os.remove(path)
+
+        lock = FileLock(path)
+        lock.acquire()
+        os.remove(path)  # removed as stale
+        with FileLock(path, timeout=1.0) as other:
+            with self.assertLogs("genutility.atomic", "WARNING"):
+                lock.release()  # must not remove the lock file of `other`
+            self.assertEqual(other.token, FileLock._read_token(path))
+        self.assertFalse(os.path.exists(path))
+
 
 if __name__ == "__main__":
     import unittest
@@ -1,6 +1,11 @@
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
+from unittest.mock import patch
 
-from genutility.cache import cache
+from genutility.cache import _evict_cache_files, cache
 from genutility.test import MyTestCase, parametrize
 
 
@@ -50,6 +55,154 @@ class CacheTest(MyTestCase):
         result = list(cache(path, generator=True, serializer="json", cached_only=True)(passthrough)(obj))
         self.assertEqual([obj, obj], result)
 
+    def test_cache_memory(self):
+        calls = []
+
+        def func(x):
+            calls.append(x)
+            return [x]
+
+        path = Path("testtemp/memory")
+        shutil.rmtree(path, ignore_errors=True)
+        cached_func = cache(path, memory_maxsize=2, return_cached=True)(func)
+        self.assertEqual((False, [1]), cached_func(1))
+        self.assertEqual((True, [1]), cached_func(1))
+        self.assertEqual((False, [2]), cached_func(2))
+        self.assertEqual((False, [3]), cached_func(3))  # evicts 1 from memory
+        self.assertEqual((True, [1]), cached_func(1))  # loaded from disk
+        self.assertEqual([1, 2, 3], calls)
+
+        stats = cached_func.cache_stats
+        self.assertEqual(1, stats.memory_hits)
+        self.assertEqual(1, stats.disk_hits)
+        self.assertEqual(3, stats.misses)
+
+    def test_cache_eviction(self):
+        path = Path("testtemp/eviction")
+        shutil.rmtree(path, ignore_errors=True)
+        cached_func = cache(path, max_entries=2)(passthrough)
+        cached_func(1)
+        cached_func(2)
+        cached_func(1)  # disk hit, updates access time
+        cached_func(3)  # evicts 2
+
+        self.assertEqual(2, len(os.listdir(path)))
+        self.assertEqual(1, cached_func.cache_stats.evictions)
+        self.assertEqual(1, cache(path, cached_only=True)(passthrough)(1))
+        self.assertEqual(3, cache(path, cached_only=True)(passthrough)(3))
+        with self.assertRaises(LookupError):
+            cache(path, cached_only=True)(passthrough)(2)
+
+    def test_cache_eviction_generator(self):
+        path = Path("testtemp/eviction-generator")
+        shutil.rmtree(path, ignore_errors=True)
+        cached_func = cache(path, generator=True, max_entries=1)(passthrough_gen)
+        self.assertEqual([1, 1], list(cached_func(1)))
+        self.assertEqual([2, 2], list(cached_func(2)))  # evicts 1 after 2 is written
+
+        self.assertEqual(1, len(os.listdir(path)))
+        self.assertEqual(1, cached_func.cache_stats.evictions)
+        self.assertEqual([2, 2], list(cache(path, generator=True, cached_only=True)(passthrough_gen)(2)))
+
+    def test_cache_eviction_scans(self):
+        path = Path("testtemp/eviction-scans")
+        shutil.rmtree(path, ignore_errors=True)
+        cached_func = cache(path, max_entries=3)(passthrough)
+        with patch("genutility.cache._evict_cache_files", wraps=_evict_cache_files) as evict_cache_files:
+            for i in range(4):
+                cached_func(i)
+        self.assertEqual(2, evict_cache_files.call_count)  # first write and over budget
+        self.assertEqual(3, len(os.listdir(path)))
+
+    def test_cache_single_flight(self):
+        calls = []
+
+        def func(x):
+            calls.append(x)
+            time.sleep(0.2)
+            return x
+
+        path = Path("testtemp/single-flight")
+        shutil.rmtree(path, ignore_errors=True)
+        cached_func = cache(path, process_lock=True)(func)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cached_func(1))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([1], calls)
+        self.assertEqual([1, 1, 1, 1], results)
+        self.assertEqual([], [name for name in os.listdir(path) if name.endswith(".lock")])
+
+    def test_cache_index(self):
+        path = Path("testtemp/index")
+        shutil.rmtree(path, ignore_errors=True)
+        cached_func = cache(path, generator=True, index=True)(passthrough_gen)
+        self.assertEqual([1, 1], list(cached_func(1)))
+        records = cached_func(1)
+        self.assertEqual(2, len(records))
+        self.assertEqual(1, records[-1])
+        records.close()
+
+    def test_cache_index_missing(self):
+        path = Path("testtemp/index-missing")
+        shutil.rmtree(path, ignore_errors=True)
+        list(cache(path, generator=True)(passthrough_gen)(1))  # same cache file, but without index
+        cached_func = cache(path, generator=True, index=True, return_cached=True)(passthrough_gen)
+        cached, records = cached_func(1)
+        self.assertFalse(cached)
+        self.assertEqual([1, 1], list(records))
+        cached, records = cached_func(1)
+        self.assertTrue(cached)
+        self.assertEqual(1, records[-1])
+        records.close()
+
+    @parametrize(
+        ("gzip", ".p.gz"),
+        ("bz2", ".p.bz2"),
+        ("zstd", ".p.zst"),
+        ("lz4", ".p.lz4"),
+    )
+    def test_cache_compression(self, compression, ext):
+        path = Path("testtemp/compression-" + compression)
+        shutil.rmtree(path, ignore_errors=True)
+        obj = {"a": list(range(100))}
+        cache(path, compression=compression)(passthrough)(obj)
+        self.assertTrue(os.listdir(path)[0].endswith(ext))
+        result = cache(path, compression=compression, cached_only=True)(passthrough)(obj)
+        self.assertEqual(obj, result)
+
+        path = path / "gen"
+        list(cache(path, generator=True, compression=compression)(passthrough_gen)(obj))
+        result = list(cache(path, generator=True, compression=compression, cached_only=True)(passthrough_gen)(obj))
+        self.assertEqual([obj, obj], result)
+
+    @parametrize(
+        (1, 0, b"\x04"),
+        (9, 0, b"\x02"),
+        (1, 2, b"\x00"),  # compression.ParallelGzipWriter doesn't set the extra flags
+    )
+    def test_cache_compresslevel(self, compresslevel, threads, xfl):
+        path = Path(f"testtemp/compresslevel-{compresslevel}-{threads}")
+        shutil.rmtree(path, ignore_errors=True)
+        obj = {"a": list(range(1000))}
+        func = cache(path, compression="gzip", compresslevel=compresslevel, compression_threads=threads)(passthrough)
+        func(obj)
+
+        (filename,) = os.listdir(path)
+        with open(path / filename, "rb") as fr:
+            header = fr.read(10)
+        self.assertEqual(xfl, header[8:9])  # gzip extra flags: 2 for best, 4 for fastest compression
+
+        self.assertEqual(obj, func(obj))
+        self.assertEqual(1, func.cache_stats.disk_hits)
+
+    def test_cache_compresslevel_invalid(self):
+        with self.assertRaises(ValueError):
+            cache(Path("testtemp/compresslevel-invalid"), compresslevel=1)
+
 
 if __name__ == "__main__":
     import unittest
@@ -0,0 +1,58 @@
+import hashlib
+from io import BytesIO
+
+import numpy as np
+
+from genutility.chunking import _GEAR, gear_hash, iter_chunks
+from genutility.test import MyTestCase, parametrize
+
+
+class ChunkingTest(MyTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data = np.random.default_rng(0).bytes(1024 * 1024)
+
+    def test_gear_hash(self):
+        data = np.frombuffer(self.data[:1000], dtype=np.uint8)
+        truth = []
+        h = 0
+        for b in data:
+            h = ((h << 1) + int(_GEAR[b])) & 0xFFFFFFFFFFFFFFFF
+            truth.append(h)
+        result = gear_hash(data).tolist()
+        self.assertEqual(truth[63:], result[63:])
+
+    @parametrize(
+        (128 * 1024,),
+        (1024 * 1024,),
+    )
+    def test_iter_chunks(self, buffer_size):
+        chunks = list(iter_chunks(BytesIO(self.data), 1024, 4096, 16384, buffer_size=buffer_size))
+
+        offset = 0
+        for i, (pos, length, digest) in enumerate(chunks):
+            self.assertEqual(offset, pos)
+            self.assertEqual(hashlib.sha256(self.data[pos : pos + length]).digest(), digest)
+            self.assertLessEqual(length, 16384)
+            if i < len(chunks) - 1:
+                self.assertGreaterEqual(length, 1024)
+            offset += length
+        self.assertEqual(len(self.data), offset)
+
+        truth = list(iter_chunks(BytesIO(self.data), 1024, 4096, 16384))
+        self.assertEqual(truth, chunks)
+
+    def test_iter_chunks_insert(self):
+        data = self.data[:5000] + b"inserted" + self.data[5000:]
+        a = {digest for pos, length, digest in iter_chunks(BytesIO(self.data))}
+        b = {digest for pos, length, digest in iter_chunks(BytesIO(data))}
+        self.assertLessEqual(len(a - b), 2)
+
+    def test_iter_chunks_empty(self):
+        self.assertEqual([], list(iter_chunks(BytesIO(b""))))
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
@@ -0,0 +1,95 @@
+import bz2
+import gc
+import gzip
+import os
+import warnings
+from io import BytesIO
+
+from genutility.compression import ParallelBz2Writer, ParallelGzipReader, ParallelGzipWriter
+from genutility.file import copen
+from genutility.test import MyTestCase, parametrize
+
+DATA = b"".join(b"%d %d\n" % (i, i * i) for i in range(100000))
+
+
+class CompressionTest(MyTestCase):
+    @parametrize(
+        (False,),
+        (True,),
+    )
+    def test_ParallelGzipWriter(self, multi_member):
+        fw = BytesIO()
+        with ParallelGzipWriter(fw, 6, 2, block_size=50000, multi_member=multi_member) as w:
+            w.write(DATA[:1234])
+            w.write(DATA[1234:])
+        result = gzip.decompress(fw.getvalue())
+        self.assertEqual(DATA, result)
+
+    def test_ParallelBz2Writer(self):
+        fw = BytesIO()
+        with ParallelBz2Writer(fw, 9, 2, block_size=200000) as w:
+            w.write(DATA)
+        result = bz2.decompress(fw.getvalue())
+        self.assertEqual(DATA, result)
+
+    def test_ParallelGzipReader(self):
+        fw = BytesIO()
+        with ParallelGzipWriter(fw, 6, 2, block_size=50000, multi_member=True) as w:
+            w.write(DATA)
+        fw.write(gzip.compress(b"foreign member"))
+
+        fw.seek(0)
+        with ParallelGzipReader(fw, 2) as fr:
+            self.assertEqual(DATA[:10], fr.read(10))
+            result = fr.read()
+        self.assertEqual(DATA[10:] + b"foreign member", result)
+
+    def test_ParallelGzipReader_plain(self):
+        fr = BytesIO(gzip.compress(DATA))
+        with ParallelGzipReader(fr, 2) as fr:
+            result = fr.read()
+        self.assertEqual(DATA, result)
+
+    @parametrize(
+        ("testtemp/parallel.gz",),
+        ("testtemp/parallel.bz2",),
+    )
+    def test_copen(self, path):
+        with copen(path, "wt", threads=2) as fw:
+            fw.write(DATA.decode("ascii"))
+
+        with copen(path, "rt", threads=2) as fr:
+            result = fr.read()
+        self.assertEqual(DATA.decode("ascii"), result)
+
+        with copen(path, "rb") as fr:
+            result = fr.read()
+        self.assertEqual(DATA, result)
+
+    @parametrize(
+        ("testtemp/parallel-close.gz",),
+        ("testtemp/parallel-close.bz2",),
+    )
+    def test_copen_close(self, path):
+        with copen(path, "wb", threads=2) as fw:
+            fw.write(DATA)
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always", ResourceWarning)
+            with copen(path, "rb", threads=2) as fr:
+                self.assertEqual(DATA, fr.read())
+
+            fd = os.open(path, os.O_RDONLY)
+            with copen(fd, "rb", ext=os.path.splitext(path)[1], threads=2) as fr:
+                self.assertEqual(DATA, fr.read())
+            with self.assertRaises(OSError):
+                os.fstat(fd)  # the file descriptor is closed with the file
+
+            gc.collect()
+        self.assertEqual([], [str(x.message) for x in w if issubclass(x.category, ResourceWarning)])
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
@@ -1,7 +1,7 @@
 import threading
 import time
 
-from genutility.concurrency import NotThreadSafe, ThreadPool, gather_all_unsorted, gather_any
+from genutility.concurrency import KeyedLock, NotThreadSafe, ThreadPool, gather_all_unsorted, gather_any
 from genutility.test import MyTestCase
 from genutility.time import MeasureTime, iter_timer
 
@@ -82,6 +82,27 @@ class ConcurrencyTest(MyTestCase):
         t.start()
         t.join()
 
+    def test_KeyedLock(self):
+        locks = KeyedLock()
+        active = {"a": 0, "b": 0}
+        maxactive = {"a": 0, "b": 0}
+
+        def work(key):
+            with locks(key):
+                active[key] += 1
+                maxactive[key] = max(maxactive[key], active[key])
+                time.sleep(0.05)
+                active[key] -= 1
+
+        threads = [threading.Thread(target=work, args=(key,)) for key in "abab"]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual({"a": 1, "b": 1}, maxactive)
+        self.assertEqual(0, len(locks))
+
 
 if __name__ == "__main__":
     import logging
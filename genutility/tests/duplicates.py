@@ -0,0 +1,49 @@
+import os
+import shutil
+
+from genutility.duplicates import DuplicateStats, find_duplicates
+from genutility.file import write_file
+from genutility.test import MyTestCase
+
+
+class DuplicatesTest(MyTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.base = "testtemp/duplicates"
+        shutil.rmtree(cls.base, ignore_errors=True)
+        os.makedirs(os.path.join(cls.base, "sub"))
+
+        files = {
+            "small-1.bin": b"abc",
+            "sub/small-2.bin": b"abc",
+            "small-3.bin": b"abd",
+            "large-1.bin": b"a" * 100 + b"b" * 100 + b"a" * 100,
+            "sub/large-2.bin": b"a" * 100 + b"b" * 100 + b"a" * 100,
+            "large-3.bin": b"a" * 100 + b"c" * 100 + b"a" * 100,
+            "unique.bin": b"a" * 1000,
+            "empty-1.bin": b"",
+            "empty-2.bin": b"",
+        }
+        for path, data in files.items():
+            write_file(data, os.path.join(cls.base, path), "wb")
+
+    def test_find_duplicates(self):
+        stats = DuplicateStats()
+        results = sorted(
+            sorted(os.path.relpath(path, self.base).replace(os.sep, "/") for path in group)
+            for group in find_duplicates([self.base], partial_size=10, workers=2, stats=stats)
+        )
+        truth = [["large-1.bin", "sub/large-2.bin"], ["small-1.bin", "sub/small-2.bin"]]
+        self.assertEqual(truth, results)
+
+        self.assertEqual(9, stats.files)
+        self.assertEqual(6, stats.size_candidates)
+        self.assertEqual(3, stats.full_candidates)
+        self.assertEqual(3 * 3 + 3 * 20 + 3 * 300, stats.read_bytes)
+        self.assertEqual(stats.total_bytes - stats.read_bytes, stats.saved_bytes)
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+from collections import defaultdict
+from operator import itemgetter
+
+from genutility.external import external_groupby, external_join
+from genutility.rand import randomized
+from genutility.test import MyTestCase, parametrize
+
+
+class ExternalTest(MyTestCase):
+    def _base(self, name):
+        base = f"testtemp/{name}"
+        shutil.rmtree(base, ignore_errors=True)
+        os.makedirs(base)
+        return base
+
+    @parametrize(
+        ("pickle", 10**9, ""),
+        ("pickle", 500, ""),
+        ("msgpack", 500, ".gz"),
+        ("pickle", 1, ""),
+    )
+    def test_external_groupby(self, serializer, max_bytes_temp, ext):
+        base = self._base("external_groupby")
+        items = randomized([(i % 17, f"value-{i}") for i in range(300)])
+
+        truth = defaultdict(list)
+        for item in items:
+            truth[item[0]].append(item)
+
+        result = external_groupby(
+            items,
+            base + "/spill_{}" + ext,
+            key=itemgetter(0),
+            serializer=serializer,
+            partitions=4,
+            max_bytes_temp=max_bytes_temp,
+        )
+        self.assertEqual(dict(truth), dict(result))
+        self.assertEqual([], os.listdir(base))
+
+    @parametrize(
+        ("inner", 10**9),
+        ("inner", 300),
+        ("left", 10**9),
+        ("left", 300),
+        ("left", 1),
+    )
+    def test_external_join(self, how, max_bytes_temp):
+        base = self._base("external_join")
+        left = randomized([(i, f"left-{i}") for i in range(200)])
+        right = randomized([(i % 50, f"right-{i}") for i in range(0, 150, 2)])
+
+        truth = []
+        for litem in left:
+            matches = [ritem for ritem in right if ritem[0] == litem[0]]
+            if matches:
+                truth.extend((litem, ritem) for ritem in matches)
+            elif how == "left":
+                truth.append((litem, None))
+
+        result = external_join(
+            left,
+            right,
+            base + "/spill_{}",
+            left_key=itemgetter(0),
+            right_key=itemgetter(0),
+            how=how,
+            partitions=3,
+            max_bytes_temp=max_bytes_temp,
+        )
+        self.assertEqual(sorted(truth, key=repr), sorted(result, key=repr))
+        self.assertEqual([], os.listdir(base))
+
+    def test_external_groupby_abandoned(self):
+        base = self._base("external_groupby_abandoned")
+        it = external_groupby(range(1000), base + "/spill_{}", key=lambda x: x % 10, max_bytes_temp=100)
+        next(it)
+        it.close()
+        self.assertEqual([], os.listdir(base))
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
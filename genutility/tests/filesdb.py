@@ -1,11 +1,16 @@
+import os
 import pickle  # nosec: B403
+import shutil
 import unittest
+import warnings
 from sqlite3 import sqlite_version_info
 from time import sleep
 
 from genutility.exceptions import NoResult
-from genutility.filesdb import FileDbHistory, FileDbSimple
-from genutility.test import MyTestCase
+from genutility.file import write_file
+from genutility.filesdb import FileDbHistory, FileDbSimple, FileDbSnapshot, FileDbWithId, Uint64
+from genutility.sqlite import FullTableScanWarning
+from genutility.test import MyTestCase, parametrize
 
 
 class Simple(FileDbSimple):
@@ -33,6 +38,12 @@ class History2(FileDbHistory):
         ]
 
 
+class HistoryNoIndex(History):
+    @classmethod
+    def indexes(cls):
+        return []
+
+
 class SimpleDBTest(MyTestCase):
     def test_pickle(self):
         db = Simple(":memory:", "tests")
@@ -100,6 +111,17 @@ class SimpleDBTest(MyTestCase):
         assert len(db) == 1
         assert list(db.iter(no=("entry_date",))) == [("path/pathB", 123, "2013-01-01 12:00:00", "asd2")]
 
+    def test_sql_cache(self):
+        db = Simple(":memory:", "tests")
+        for i in range(10):
+            db._add_file((f"path{i}", i, "2013-01-01 12:00:00"), derived={"data": str(i)})
+            db._get_latest((f"path{i}", i, "2013-01-01 12:00:00"), derived={"data": str(i)})
+
+        info = db._add_file_query.cache_info()
+        self.assertEqual((9, 1), (info.hits, info.misses))
+        info = db._get_latest_sql.cache_info()
+        self.assertEqual((9, 1), (info.hits, info.misses))
+
     def test_add_file_replace(self):
         db = Simple(":memory:", "tests")
 
@@ -278,6 +300,124 @@ class SimpleDBTest(MyTestCase):
         )
         assert result == [("path2", 100, "2013-01-01 12:00:00", "qwe"), ("path1", 100, "2013-01-01 12:00:00", "asd")]
 
+        # chunked into multiple queries
+        result = list(
+            db.get_latest_many(
+                [("path3", 100, "2013-01-01 12:00:00"), ("path1", 100, "2013-01-01 12:00:00")], 1, no=("entry_date",)
+            )
+        )
+        assert result == [("path3", 100, "2013-01-01 12:00:00", "zxc"), ("path1", 100, "2013-01-01 12:00:00", "asd")]
+
+    @parametrize(
+        (True,),
+        (False,),
+    )
+    def test_bulk_add(self, replace):
+        if not replace and sqlite_version_info < (3, 35, 0):
+            self.skipTest("SQLite 3.35.0 or higher required")
+
+        db = Simple(":memory:", "tests")
+        db.max_rows_per_statement = 3
+
+        mandatory = [(f"path{i}", i, "2013-01-01 12:00:00") for i in range(10)] + [("path0", 0, "2013-01-01 12:00:00")]
+        derived = [{"data": str(i)} for i in range(10)] + [{"data": "new"}]
+        stats = db.bulk_add(mandatory, ("data",), derived, replace=replace, batch_size=4)
+        self.assertEqual(11, stats.rows)
+
+        truth = [(f"path{i}", i, "2013-01-01 12:00:00", str(i)) for i in range(1, 10)] + [
+            ("path0", 0, "2013-01-01 12:00:00", "new")
+        ]
+        result = list(db.iter(no=("entry_date",)))
+        self.assertUnorderedSeqEqual(truth, result)
+
+    def test_export_parquet(self):
+        import pyarrow as pa
+        from pyarrow import parquet as pq
+
+        path = "testtemp/filesdb-export.parquet"
+        os.makedirs("testtemp", exist_ok=True)
+
+        db = Simple(":memory:", "tests")
+        mandatory = [(f"path{i}", i, 1000 + i) for i in range(10)]
+        derived = [{"data": str(i) if i % 2 else None} for i in range(10)]
+        db.bulk_add(mandatory, ("data",), derived)
+
+        result = db.export_parquet(path, no=("entry_date",), row_group_size=4)
+        self.assertEqual(10, result)
+
+        pf = pq.ParquetFile(path)
+        self.assertEqual(3, pf.metadata.num_row_groups)
+        self.assertEqual(["path", "filesize", "mod_date", "data"], pf.schema_arrow.names)
+        self.assertEqual(pa.int64(), pf.schema_arrow.field("filesize").type)
+        self.assertEqual(pa.string(), pf.schema_arrow.field("data").type)
+        truth = [(f"path{i}", i, 1000 + i, str(i) if i % 2 else None) for i in range(10)]
+        self.assertUnorderedSeqEqual(truth, list(zip(*pf.read().to_pydict().values())))
+
+    def test_export_parquet_uint64(self):
+        import pyarrow as pa
+        from pyarrow import parquet as pq
+
+        path = "testtemp/filesdb-export-uint64.parquet"
+        os.makedirs("testtemp", exist_ok=True)
+
+        db = FileDbWithId(":memory:", "tests")
+        db._add_file(("path", Uint64(2**64 - 1), Uint64(2**63), 100, 1000), derived={})
+        db.commit()
+
+        db.export_parquet(path, only=("file_id", "device_id"))
+        table = pq.read_table(path)
+        self.assertEqual(pa.uint64(), table.schema.field("file_id").type)
+        self.assertEqual({"file_id": [2**64 - 1], "device_id": [2**63]}, table.to_pydict())
+
+    def test_readers(self):
+        import threading
+
+        path = "testtemp/filesdb-readers.sqlite"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+        with Simple(path, "tests", readers=2) as db:
+            db._add_file(("path1", 100, "2013-01-01 12:00:00"), derived={"data": "asd"})
+            db.commit()
+            db._add_file(("path2", 100, "2013-01-01 12:00:00"), derived={"data": "qwe"})  # uncommitted
+
+            results = []
+
+            def read():
+                results.append((len(db), db.get_latest("path1", 100, "2013-01-01 12:00:00", only=("data",))))
+
+            threads = [threading.Thread(target=read) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertEqual([(1, ("asd",))] * 4, results)
+            db.commit()
+            self.assertEqual(2, len(db))
+
+    def test_readers_abandoned_iterators(self):
+        path = "testtemp/filesdb-readers-abandoned.sqlite"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+        with Simple(path, "tests", readers=1) as db:
+            for i in range(5):
+                db._add_file((f"path{i}", i, "2013-01-01 12:00:00"), derived={"data": str(i)})
+            db.commit()
+            db._pool.timeout = 1.0
+
+            mandatory = [(f"path{i}", i, "2013-01-01 12:00:00") for i in range(5)]
+            iterators = [db.iter_batches(batchsize=2), db.iter(), db.get_latest_many(mandatory, 5, only=("data",))]
+            for it in iterators:
+                next(it)  # abandoned partially consumed iterators must not keep the only connection
+
+            self.assertEqual(5, len(db))
+            self.assertEqual([[("path4", 4)]], list(db.iter_batches(only=("path", "filesize"), batchsize=2))[2:])
+            self.assertEqual([(str(i),) for i in range(1, 5)], list(iterators[2]))
+
 
 class HistoryDBTest(MyTestCase):
     def test_a(self):
@@ -392,6 +532,59 @@ class HistoryDBTest(MyTestCase):
             (4, "path3", 100, "2013-01-01 12:00:00", "new"),
         ]
 
+    def test_profiling(self):
+        mandatory = ("path", 100, "2013-01-01 12:00:00")
+
+        db = History(":memory:", "tests")
+        profiler = db.enable_profiling()
+        db._add_file(mandatory, derived={"data": "asd"})
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", FullTableScanWarning)
+            for _ in range(3):
+                db.get_latest(*mandatory, only=("data",))
+            list(db.iter())
+
+        ((sql, profile),) = [(sql, p) for sql, p in profiler.queries.items() if sql.startswith("SELECT data")]
+        self.assertEqual(3, profile.count)
+        self.assertEqual(3, sum(profile.histogram.values()))
+        self.assertIn("USING INDEX", profile.plan[0])
+
+        db = HistoryNoIndex(":memory:", "tests")
+        db.enable_profiling()
+        db._add_file(mandatory, derived={"data": "asd"})
+        with self.assertWarns(FullTableScanWarning):
+            db.get_latest(*mandatory)
+
+
+class SnapshotDBTest(MyTestCase):
+    def test_update(self):
+        base = "testtemp/snapshot"
+        shutil.rmtree(base, ignore_errors=True)
+        os.makedirs(os.path.join(base, "a", "b"))
+        for path in ("x.txt", "a/y.txt", "a/b/z.txt"):
+            write_file("1", os.path.join(base, path), "wt")
+
+        def update(**kwargs):
+            return sorted((event, props.relpath.replace(os.sep, "/")) for event, props in db.update(base, **kwargs))
+
+        db = FileDbSnapshot(":memory:", "snapshot")
+
+        truth = [("added", "a"), ("added", "a/b"), ("added", "a/b/z.txt"), ("added", "a/y.txt"), ("added", "x.txt")]
+        self.assertEqual(truth, update())
+        self.assertEqual([], update())
+
+        os.remove(os.path.join(base, "x.txt"))
+        write_file("2", os.path.join(base, "a/b/new.txt"), "wt")
+        self.assertEqual([("added", "a/b/new.txt"), ("removed", "x.txt")], update())
+
+        write_file("22", os.path.join(base, "a/y.txt"), "wt")
+        self.assertEqual([("modified", "a/y.txt")], update(rescan=True))
+
+        shutil.rmtree(os.path.join(base, "a", "b"))
+        truth = [("removed", "a/b"), ("removed", "a/b/new.txt"), ("removed", "a/b/z.txt")]
+        self.assertEqual(truth, update())
+        self.assertEqual(3, len(db))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,9 +1,16 @@
+import os
 import os.path
+import shutil
+import threading
+import time
+from collections import defaultdict
 from pathlib import Path, PurePosixPath, PureWindowsPath
 from types import TracebackType
-from typing import Optional, Type
+from typing import Dict, Optional, Type
+from unittest.mock import patch
 
-from genutility.filesystem import append_to_filename, compliant_path, scandir_rec
+import genutility.filesystem
+from genutility.filesystem import append_to_filename, compliant_path, scandir_rec, scandir_rec_parallel
 from genutility.test import MyTestCase, parametrize
 
 
@@ -113,6 +120,20 @@ class FilesystemTest(MyTestCase):
         results = list(entry.name for entry in scandir_rec("testfiles", rec=False))
         self.assertUnorderedSeqEqual(base, results)
 
+    def test_scandir_rec_order(self):
+        truth = list(entry.path for entry in scandir_rec("testfiles", dirs=True))
+
+        results = list(entry.path for entry in scandir_rec("testfiles", dirs=True, max_open_dirs=1))
+        self.assertEqual(truth, results)
+
+        results = list(entry.path for entry in scandir_rec("testfiles", dirs=True, order="bfs"))
+        self.assertUnorderedSeqEqual(truth, results)
+        depths = [path.count(os.sep) for path in results]
+        self.assertEqual(sorted(depths), depths)
+
+        with self.assertRaises(ValueError):
+            list(scandir_rec("testfiles", order="asd"))
+
     def test_scandir_rec_links(self):
         base = Path("testtemp/scandir")
         base.mkdir(parents=False, exist_ok=True)
@@ -134,6 +155,62 @@ class FilesystemTest(MyTestCase):
         results = list(entry.name for entry in scandir_rec(base, rec=True, files=True, dirs=True, prevent_loops=False))
         self.assertUnorderedSeqEqual(truth, results)
 
+    @parametrize(
+        (True, True),
+        (True, False),
+        (False, True),
+        (False, False),
+    )
+    def test_scandir_rec_parallel(self, dirs, ordered):
+        truth = list(entry.path for entry in scandir_rec("testfiles", dirs=dirs))
+        results = list(entry.path for entry in scandir_rec_parallel("testfiles", dirs=dirs, workers=2, ordered=ordered))
+        if ordered:
+            self.assertEqual(truth, results)
+        else:
+            self.assertUnorderedSeqEqual(truth, results)
+
+    def test_scandir_rec_parallel_relative(self):
+        truth = list(entry.relpath for entry in scandir_rec("testfiles", relative=True))
+        results = list(
+            entry.relpath for entry in scandir_rec_parallel("testfiles", relative=True, ordered=True, max_pending=1)
+        )
+        self.assertEqual(truth, results)
+
+    def test_scandir_rec_parallel_deep(self):
+        base = "testtemp/scandir_rec_parallel_deep"
+        if os.path.exists(base):
+            shutil.rmtree(base)
+        for i in range(8):
+            for leaf in range(8):
+                os.makedirs(os.path.join(base, str(i), *f"{leaf:03b}"))
+
+        # the root listing fills all prefetches, the subtrees should still be listed concurrently
+        lock = threading.Lock()
+        running: Dict[str, int] = defaultdict(int)
+        overlap: Dict[str, int] = defaultdict(int)
+        scandir_listing = genutility.filesystem._scandir_listing
+
+        def slow_listing(direntry, *args):
+            subtree = os.path.relpath(direntry.path, base).split(os.sep)[0]
+            with lock:
+                running[subtree] += 1
+                overlap[subtree] = max(overlap[subtree], running[subtree])
+            try:
+                time.sleep(0.01)
+                return scandir_listing(direntry, *args)
+            finally:
+                with lock:
+                    running[subtree] -= 1
+
+        truth = list(entry.path for entry in scandir_rec(base, dirs=True))
+        with patch("genutility.filesystem._scandir_listing", slow_listing):
+            results = list(
+                entry.path for entry in scandir_rec_parallel(base, dirs=True, workers=4, ordered=True, max_pending=4)
+            )
+        self.assertEqual(truth, results)
+        for i in range(8):
+            self.assertGreater(overlap[str(i)], 1)
+
 
 if __name__ == "__main__":
     import unittest
@@ -5,10 +5,16 @@ from unittest import skipIf
 
 from genutility.file import write_file
 from genutility.hash import (
+    HashobjCRC,
+    HashobjED2K,
     crc32_hash_file,
     ed2k_chunksize,
     ed2k_hash_file_v1,
     ed2k_hash_file_v2,
+    hash_file_ends,
+    hash_file_multi,
+    hash_file_zerocopy,
+    hash_files,
     md5_hash_file,
     sha1_hash_file,
 )
@@ -45,6 +51,68 @@ class HashTest(MyTestCase):
         result = hashfunc(path).hexdigest()
         self.assertEqual(truth, result)
 
+    @parametrize(
+        ("testtemp/empty.bin", False, 1),
+        ("testtemp/empty.bin", True, 1),
+        ("testtemp/hash.bin", False, 1),
+        ("testtemp/hash.bin", False, 1024),
+        ("testtemp/hash.bin", True, 7),
+        ("testtemp/hash-ed2k-chunk.bin", False, 1024 * 1024),
+        ("testtemp/hash-ed2k-chunk.bin", True, 1024 * 1024),
+    )
+    def test_hash_file_zerocopy(self, path, use_mmap, chunk_size):
+        truth = md5_hash_file(path).hexdigest()
+        result = hash_file_zerocopy(path, "md5", chunk_size, use_mmap=use_mmap).hexdigest()
+        self.assertEqual(truth, result)
+
+    @parametrize(
+        (True,),
+        (False,),
+    )
+    def test_hash_files(self, ordered):
+        paths = ["testtemp/hash.bin", "testtemp/empty.bin", "testtemp/hash-ed2k-chunk.bin"] * 3
+        truth = [(path, md5_hash_file(path).hexdigest()) for path in paths]
+        result = [(path, m.hexdigest()) for path, m in hash_files(paths, "md5", 2, 1024, ordered=ordered)]
+        if ordered:
+            self.assertEqual(truth, result)
+        else:
+            self.assertUnorderedSeqEqual(truth, result)
+
+    @parametrize(
+        ("testtemp/empty.bin", False),
+        ("testtemp/hash.bin", False),
+        ("testtemp/hash.bin", True),
+        ("testtemp/hash-ed2k-chunk.bin", True),
+    )
+    def test_hash_file_multi(self, path, threaded):
+        hashclss = {"md5": "md5", "sha1": hashlib.sha1, "crc": HashobjCRC}
+        truth = {
+            "md5": md5_hash_file(path).hexdigest(),
+            "sha1": sha1_hash_file(path).hexdigest(),
+            "crc": crc32_hash_file(path).hexdigest(),
+        }
+        result = hash_file_multi(path, hashclss, chunk_size=1000, threaded=threaded)
+        self.assertEqual(truth, {name: m.hexdigest() for name, m in result.items()})
+
+    @skipIf(MD4_NOT_AVAILABLE, "hashlib built without md4")
+    @parametrize(
+        (Path("testtemp/hash.bin"),),
+        (Path("testtemp/hash-ed2k-chunk.bin"),),
+    )
+    def test_hashobj_ed2k(self, path):
+        result = hash_file_multi(path, {"v1": lambda: HashobjED2K(1), "v2": HashobjED2K}, chunk_size=1000000)
+        self.assertEqual(ed2k_hash_file_v1(path), result["v1"].hexdigest())
+        self.assertEqual(ed2k_hash_file_v2(path), result["v2"].hexdigest())
+
+    @parametrize(
+        ("testtemp/hash.bin", 13, b"abcdefghijklmnopqrstuvwxyz"),
+        ("testtemp/hash.bin", 5, b"abcdevwxyz"),
+    )
+    def test_hash_file_ends(self, path, size, data):
+        truth = hashlib.sha1(data).hexdigest()  # nosec: B324
+        result = hash_file_ends(path, "sha1", size).hexdigest()
+        self.assertEqual(truth, result)
+
     @skipIf(MD4_NOT_AVAILABLE, "hashlib built without md4")
     @parametrize(
         (Path("testtemp/hash.bin"), "d79e1c308aa5bbcdeea8ed63df412da9"),  # pragma: allowlist secret
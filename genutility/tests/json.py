@@ -1,15 +1,19 @@
 import datetime
 import json
 import logging
-from io import StringIO
+import math
+from io import BytesIO, StringIO
 
 from genutility._file import CloseableNamedTemporaryFile
 from genutility.json import (
     BuiltinRoundtripDecoder,
     BuiltinRoundtripEncoder,
     JsonLinesFormatter,
+    json_backend,
     json_lines,
+    line_aligned_ranges,
     read_json_lines,
+    read_json_lines_parallel,
 )
 from genutility.test import MyTestCase, parametrize
 
@@ -32,6 +36,115 @@ class JsonTest(MyTestCase):
 
         self.assertEqual(truth, result)
 
+    @parametrize(
+        ("orjson", '{"a":[1.5,null,true],"b":1}\n"ä"\n'),
+        ("msgspec", '{"a":[1.5,null,true],"b":1}\n"ä"\n'),
+        ("simplejson", '{"a":[1.5,null,true],"b":1}\n"ä"\n'),
+        ("json", '{"a": [1.5, null, true], "b": 1}\n"ä"\n'),
+    )
+    def test_json_lines_backend(self, backend, truth):
+        try:
+            json_backend(backend)
+        except ImportError:
+            self.skipTest(f"{backend} not installed")
+
+        objs = [{"b": 1, "a": [1.5, None, True]}, "ä", [], {}] * 3
+
+        for stream, expected in ((StringIO(), truth), (BytesIO(), truth.encode())):
+            with json_lines.from_stream(stream, backend=backend) as fw:
+                fw.write(objs[0], sort_keys=True)
+                fw.write(objs[1])
+                fw.writelines(objs[2:], batch_size=5)
+            self.assertEqual(expected, stream.getvalue()[: len(expected)])
+
+            stream.seek(0)
+            with json_lines.from_stream(stream, backend=backend) as fr:
+                result = list(fr)
+            self.assertEqual(objs, result)
+
+    @parametrize(
+        (StringIO,),
+        (BytesIO,),
+    )
+    def test_json_lines_default_roundtrip(self, streamcls):
+        # the default backend must not lose large integers or non-finite floats
+        objs = [{"a": 123456789012345678901234567890}, {"b": 2**70, "c": -(2**64)}, {"x": float("inf")}]
+
+        stream = streamcls()
+        with json_lines.from_stream(stream) as fw:
+            fw.writelines(objs)
+            fw.write({"n": float("nan")})
+
+        stream.seek(0)
+        with json_lines.from_stream(stream) as fr:
+            result = list(fr)
+        self.assertEqual(objs, result[:3])
+        self.assertTrue(math.isnan(result[3]["n"]))
+
+        # lines written by earlier versions
+        with json_lines.from_stream(StringIO('{"a": 123456789012345678901234567890, "n": NaN}\n')) as fr:
+            (result,) = fr
+        self.assertEqual(123456789012345678901234567890, result["a"])
+        self.assertTrue(math.isnan(result["n"]))
+
+    def test_json_lines_error(self):
+        stream = BytesIO(b'{"a": 1}\n{"a": \n')
+        with json_lines.from_stream(stream) as fr:
+            with self.assertRaises(ValueError) as cm:
+                list(fr)
+        self.assertEqual(2, cm.exception.lineno)
+
+    def test_json_lines_fallback(self):
+        stream = StringIO()
+        with json_lines.from_stream(stream) as fw:
+            fw.write({"a": "ä"}, ensure_ascii=True)
+        self.assertEqual('{"a": "\\u00e4"}\n', stream.getvalue())
+
+        stream.seek(0)
+        with json_lines.from_stream(stream, object_hook=lambda d: set(d)) as fr:
+            self.assertEqual([{"a"}], list(fr))
+
+    @parametrize(
+        (b"", 10, []),
+        (b"a\nbb\nccc\n", 1, [(0, 2), (2, 5), (5, 9)]),
+        (b"a\nbb\nccc\n", 3, [(0, 5), (5, 9)]),
+        (b"a\nbb\nccc", 4, [(0, 5), (5, 8)]),
+        (b"a\nbb\nccc\n", 100, [(0, 9)]),
+    )
+    def test_line_aligned_ranges(self, content, chunk_size, truth):
+        with CloseableNamedTemporaryFile(mode="wb") as (f, fname):
+            f.write(content)
+            f.close()
+            result = line_aligned_ranges(fname, chunk_size)
+
+        self.assertEqual(truth, result)
+
+    @parametrize(
+        (True,),
+        (False,),
+    )
+    def test_read_json_lines_parallel(self, ordered):
+        truth = [{"id": i, "name": "ä" * (i % 7)} for i in range(200)]
+        with CloseableNamedTemporaryFile(mode="wt", encoding="utf-8") as (f, fname):
+            for obj in truth:
+                f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+                if obj["id"] % 50 == 0:
+                    f.write("\n")
+            f.close()
+            result = list(read_json_lines_parallel(fname, ordered=ordered, workers=2, chunk_size=100))
+
+        if ordered:
+            self.assertEqual(truth, result)
+        else:
+            self.assertEqual(truth, sorted(result, key=lambda d: d["id"]))
+
+    def test_read_json_lines_parallel_error(self):
+        with CloseableNamedTemporaryFile(mode="wb") as (f, fname):
+            f.write(b'{"a": 1}\n{"a": \n')
+            f.close()
+            with self.assertRaisesRegex(ValueError, "at byte 9"):
+                list(read_json_lines_parallel(fname, workers=1))
+
     def test_JsonLinesFormatter(self):
         stream = StringIO()
 
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+
+import pyarrow as pa
+from pyarrow import parquet as pq
+
+from genutility.parquet import export_sql_to_parquet, sql_type_to_arrow, write_parquet_batches
+from genutility.test import MyTestCase, parametrize
+
+
+class ParquetTest(MyTestCase):
+    @parametrize(
+        ("INTEGER", pa.int64()),
+        ("BIGINT UNSIGNED", pa.uint64()),
+        ("uint64", pa.uint64()),
+        ("VARCHAR(256)", pa.string()),
+        ("DATETIME", pa.string()),
+        ("BLOB", pa.binary()),
+        ("DOUBLE PRECISION", pa.float64()),
+        ("BOOLEAN", pa.bool_()),
+        ("NUMERIC", None),
+    )
+    def test_sql_type_to_arrow(self, decltype, truth):
+        result = sql_type_to_arrow(decltype)
+        self.assertEqual(truth, result)
+
+    @parametrize(
+        (0, 0),
+        (10, 4),
+        (7, 1),
+    )
+    def test_export_sql_to_parquet(self, num, row_groups):
+        path = "testtemp/export.parquet"
+        os.makedirs("testtemp", exist_ok=True)
+
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (a INTEGER, b TEXT, c REAL, d BLOB)")
+        truth = [(i, None if i == 0 else str(i), i / 2, bytes([i])) for i in range(num)]
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?)", truth)
+
+        row_group_size = 3 if row_groups > 1 else 10
+        result = export_sql_to_parquet(conn, path, "SELECT a, b, c, d FROM t ORDER BY a", row_group_size=row_group_size)
+        self.assertEqual(num, result)
+
+        pf = pq.ParquetFile(path)
+        self.assertEqual(row_groups, pf.metadata.num_row_groups)
+        self.assertEqual(["a", "b", "c", "d"], pf.schema_arrow.names)
+        self.assertEqual(truth, list(zip(*pf.read().to_pydict().values())))
+
+    def test_export_sql_to_parquet_types(self):
+        path = "testtemp/export-types.parquet"
+        os.makedirs("testtemp", exist_ok=True)
+
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (a INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(None,), (1,)])
+
+        export_sql_to_parquet(conn, path, "SELECT a FROM t", types={"a": pa.int32()}, row_group_size=1)
+        table = pq.read_table(path)
+        self.assertEqual(pa.int32(), table.schema.field("a").type)
+        self.assertEqual([None, 1], table.column("a").to_pylist())
+
+    def test_export_sql_to_parquet_null_first(self):
+        path = "testtemp/export-null-first.parquet"
+        os.makedirs("testtemp", exist_ok=True)
+
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (a INTEGER, b INTEGER)")
+        truth = [(i, None if i < 5 else i) for i in range(10)]
+        conn.executemany("INSERT INTO t VALUES (?, ?)", truth)
+
+        export_sql_to_parquet(conn, path, "SELECT a, b FROM t ORDER BY a", row_group_size=3)
+        table = pq.read_table(path)
+        self.assertEqual(pa.int64(), table.schema.field("b").type)
+        self.assertEqual(truth, list(zip(*table.to_pydict().values())))
+
+    def test_export_sql_to_parquet_lossy(self):
+        path = "testtemp/export-lossy.parquet"
+        os.makedirs("testtemp", exist_ok=True)
+
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (a)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,), (1.5,)])
+
+        with self.assertRaises(pa.ArrowInvalid):
+            export_sql_to_parquet(conn, path, "SELECT a FROM t ORDER BY rowid", row_group_size=2)
+
+    def test_write_parquet_batches_uint64(self):
+        path = "testtemp/write-uint64.parquet"
+        os.makedirs("testtemp", exist_ok=True)
+
+        truth = [(1,), (2**63,), (2**64 - 1,)]
+        write_parquet_batches(path, [truth[:1], truth[1:]], ["a"], types={"a": sql_type_to_arrow("uint64")})
+        table = pq.read_table(path)
+        self.assertEqual(pa.uint64(), table.schema.field("a").type)
+        self.assertEqual([1, 2**63, 2**64 - 1], table.column("a").to_pylist())
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+
+from genutility import msgpack, pickle
+from genutility.file import copen
+from genutility.records import read_length_prefixed, serializer_functions, shard_ranges, write_length_prefixed
+from genutility.test import MyTestCase, parametrize
+
+
+class RecordsTest(MyTestCase):
+    @parametrize(
+        (0, 3, [(0, 0), (0, 0), (0, 0)]),
+        (7, 3, [(0, 3), (3, 5), (5, 7)]),
+        (6, 2, [(0, 3), (3, 6)]),
+    )
+    def test_shard_ranges(self, num, parts, truth):
+        result = shard_ranges(num, parts)
+        self.assertEqual(truth, result)
+
+    @parametrize(
+        ("pickle", "testtemp/records-framed.bin", 7),
+        ("msgpack", "testtemp/records-framed.gz", 1024),
+    )
+    def test_length_prefixed(self, serializer, path, buffer_size):
+        dumps, loads = serializer_functions(serializer)
+        truth = [(i, "\n" * i, b"\x00" * i) for i in range(50)]
+        os.makedirs("testtemp", exist_ok=True)
+
+        with copen(path, "wb") as fw:
+            write_length_prefixed(fw, truth[:20], dumps)
+            write_length_prefixed(fw, truth[20:], dumps)
+
+        result = list(read_length_prefixed(path, loads, buffer_size))
+        self.assertEqual(truth, result)
+
+    @parametrize(
+        (pickle, "testtemp/records.p"),
+        (msgpack, "testtemp/records.msgpack"),
+    )
+    def test_open_indexed(self, module, path):
+        shared = ("shared", 1)
+        truth = [(i, shared, str(i)) for i in range(100)]
+        result = list(module.write_iter(truth, path, index=True))
+        self.assertEqual(truth, result)
+        self.assertEqual(truth, list(module.read_iter(path)))
+
+        with module.open_indexed(path) as records:
+            self.assertEqual(100, len(records))
+            self.assertEqual(truth[0], records[0])
+            self.assertEqual(truth[57], records[57])
+            self.assertEqual(truth[-1], records[-1])
+            self.assertEqual(truth[90:], records[90:])
+            self.assertEqual(truth[10:20:3], records[10:20:3])
+            self.assertEqual(truth, list(records))
+            self.assertEqual(truth, [r for start, stop in records.shards(3) for r in records.iter(start, stop)])
+            with self.assertRaises(IndexError):
+                records[100]
+
+    def test_open_indexed_mismatch(self):
+        path = "testtemp/records-mismatch.p"
+        list(pickle.write_iter(range(10), path, index=True))
+        with open(path, "ab") as fw:
+            fw.write(b"\x00")
+
+        with self.assertRaises(ValueError):
+            pickle.open_indexed(path)
+
+    def test_write_iter_compressed(self):
+        with self.assertRaises(ValueError):
+            list(pickle.write_iter(range(10), "testtemp/records.p.gz", index=True))
+        self.assertFalse(os.path.exists("testtemp/records.p.gz.idx"))
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
@@ -1,4 +1,7 @@
+import os
+import shutil
 from itertools import product
+from operator import itemgetter
 from random import shuffle
 
 from genutility.rand import randomized
@@ -6,6 +9,8 @@ from genutility.sort import (
     OptionalValue,
     bubble_sort,
     external_sort,
+    external_sort_file,
+    external_sort_records,
     selection_sort_max,
     selection_sort_min,
     sorted_by_list,
@@ -76,6 +81,96 @@ class SortTest(MyTestCase):
             result = external_sort(input, "testtemp/external_sort_{}.gz", "t", int, max_lines)
             self.assertIterEqual(sorted(input), result, f"Failed for {input}, {max_lines}")
 
+    @parametrize(
+        (0, None, 2),
+        (0, None, 64),
+        (2, None, 3),
+        (0, 500, 2),
+        (2, 500, 2),
+    )
+    def test_external_sort_binary(self, workers, max_bytes_temp, max_fan_in):
+        base = "testtemp/external_sort_binary"
+        shutil.rmtree(base, ignore_errors=True)
+        os.makedirs(base)
+
+        # arbitrary payloads with equal keys to check stability
+        seq = [bytes([i % 7]) + b"\n\x00" + str(i).encode("ascii") for i in range(300)]
+        input = randomized(seq)
+        truth = sorted(input, key=itemgetter(0))
+
+        result = external_sort(
+            input,
+            base + "/run_{}.bin",
+            "b",
+            itemgetter(0),
+            max_lines_temp=None if max_bytes_temp else 10,
+            max_bytes_temp=max_bytes_temp,
+            workers=workers,
+            max_fan_in=max_fan_in,
+        )
+        self.assertEqual(truth, list(result))
+        self.assertEqual([], os.listdir(base))
+
+    def test_external_sort_file(self):
+        base = "testtemp/external_sort_file"
+        shutil.rmtree(base, ignore_errors=True)
+        os.makedirs(base)
+
+        lines = [f"line {i:03}" for i in range(100)]
+        with open(base + "/in.txt", "w", encoding="utf-8", newline="\n") as fw:
+            fw.write("\n".join(randomized(lines)))
+
+        external_sort_file(base + "/in.txt", base + "/out.txt", base + "/run_{}.gz", max_lines_temp=7)
+        with open(base + "/out.txt", encoding="utf-8") as fr:
+            result = fr.read().splitlines()
+
+        self.assertEqual(lines, result)
+        self.assertEqual(["in.txt", "out.txt"], sorted(os.listdir(base)))
+
+    @parametrize(
+        ("pickle", False, None, 0),
+        ("msgpack", False, None, 0),
+        ("pickle", True, None, 0),
+        ("pickle", False, 5, 0),
+        ("pickle", True, 5, 2),
+        ("msgpack", True, None, 2),
+    )
+    def test_external_sort_records(self, serializer, unique, max_lines_final, workers):
+        base = "testtemp/external_sort_records"
+        shutil.rmtree(base, ignore_errors=True)
+        os.makedirs(base)
+
+        records = randomized([(i % 13, f"value-{i}", {"i": i}) for i in range(200)])
+
+        truth = sorted(records, key=itemgetter(0))
+        if unique:
+            seen = set()
+            truth = [r for r in truth if not (r[0] in seen or seen.add(r[0]))]
+        truth = truth[:max_lines_final]
+
+        result = external_sort_records(
+            records,
+            base + "/run_{}",
+            key=itemgetter(0),
+            serializer=serializer,
+            unique=unique,
+            max_lines_temp=17,
+            max_lines_final=max_lines_final,
+            workers=workers,
+            max_fan_in=3,
+        )
+        self.assertEqual(truth, list(result))
+        self.assertEqual([], os.listdir(base))
+
+    def test_external_sort_records_nokey(self):
+        base = "testtemp/external_sort_records_nokey"
+        shutil.rmtree(base, ignore_errors=True)
+        os.makedirs(base)
+
+        records = randomized([(i % 5, i % 3) for i in range(100)])
+        result = external_sort_records(records, base + "/run_{}.gz", unique=True, max_lines_temp=10)
+        self.assertEqual(sorted(set(records)), list(result))
+
     @parametrize(
         ([3, 2, 1], [1, 2, 3]),
         ([(None, 2), (None, 1)], [(None, 1), (None, 2)]),
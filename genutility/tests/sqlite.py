@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import threading
+
+from genutility.sqlite import ConnectionPoolTimeout, ReadConnectionPool, batch_executer, safe_batch_executer
+from genutility.test import MyTestCase, parametrize
+
+
+def _connect(unique: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    if unique:
+        conn.execute("CREATE TABLE t (a INTEGER UNIQUE)")
+    else:
+        conn.execute("CREATE TABLE t (a INTEGER)")
+    return conn
+
+
+def _rows(conn: sqlite3.Connection) -> list:
+    return [a for (a,) in conn.execute("SELECT a FROM t ORDER BY a")]
+
+
+class SqliteTest(MyTestCase):
+    @parametrize(
+        (0, 1),
+        (0, 3),
+        (2, 1),
+        (2, 3),
+    )
+    def test_batch_executer(self, prefetch, commit_interval):
+        conn = _connect()
+        cursor = conn.cursor()
+        it = ((i,) for i in range(25))
+        result = batch_executer(
+            cursor,
+            "INSERT INTO t VALUES (?)",
+            it,
+            batch_size=4,
+            exclusive=False,
+            prefetch=prefetch,
+            pragmas={"synchronous": "OFF"},
+            commit_interval=commit_interval,
+        )
+        self.assertEqual(25, result)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(list(range(25)), _rows(conn))
+        self.assertEqual(0, cursor.execute("PRAGMA synchronous").fetchone()[0])
+
+    @parametrize(
+        (0,),
+        (2,),
+    )
+    def test_batch_executer_error(self, prefetch):
+        def gen():
+            yield from ((i,) for i in range(10))
+            raise RuntimeError("producer")
+
+        conn = _connect()
+        with self.assertRaises(RuntimeError):
+            batch_executer(conn.cursor(), "INSERT INTO t VALUES (?)", gen(), batch_size=4, prefetch=prefetch)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(list(range(8)), _rows(conn))
+
+    @parametrize(
+        (0, 1),
+        (2, 1),
+        (2, 3),
+    )
+    def test_safe_batch_executer(self, prefetch, commit_interval):
+        conn = _connect(unique=True)
+        conn.execute("INSERT INTO t VALUES (5)")
+        conn.commit()
+
+        it = ((i,) for i in range(12))
+        safe_batch_executer(
+            conn.cursor(),
+            "INSERT INTO t VALUES (?)",
+            it,
+            batch_size=4,
+            exclusive=False,
+            prefetch=prefetch,
+            commit_interval=commit_interval,
+        )
+        self.assertFalse(conn.in_transaction)
+        # the batch (4, 5, 6, 7) violates the constraint and is skipped
+        self.assertEqual([0, 1, 2, 3, 5, 8, 9, 10, 11], _rows(conn))
+
+    def test_safe_batch_executer_error(self):
+        def gen():
+            yield from ((i,) for i in range(10))
+            raise RuntimeError("producer")
+
+        num_threads = threading.active_count()
+        conn = _connect()
+        with self.assertRaises(RuntimeError):
+            safe_batch_executer(
+                conn.cursor(),
+                "INSERT INTO t VALUES (?)",
+                gen(),
+                batch_size=4,
+                exclusive=False,
+                prefetch=2,
+                commit_interval=3,
+            )
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual([], _rows(conn))  # the uncommitted batches are rolled back
+        self.assertEqual(num_threads, threading.active_count())
+
+    def test_safe_batch_executer_interrupt(self):
+        conn = _connect()
+        cursor = conn.cursor()
+
+        class InterruptingCursor:
+            """Raises a KeyboardInterrupt after the first batch was written."""
+
+            connection = conn
+            calls = 0
+
+            def execute(self, *args):
+                return cursor.execute(*args)
+
+            def executemany(self, query, data):
+                cursor.executemany(query, data)
+                self.calls += 1
+                if self.calls == 1:
+                    raise KeyboardInterrupt
+
+        it = iter([(i,) for i in range(100)])
+        safe_batch_executer(
+            InterruptingCursor(), "INSERT INTO t VALUES (?)", it, batch_size=10, exclusive=False, prefetch=2
+        )
+        self.assertFalse(conn.in_transaction)
+        # everything which was taken from the iterable was inserted
+        consumed = 100 - len(list(it))
+        self.assertLess(consumed, 100)
+        self.assertEqual(list(range(consumed)), _rows(conn))
+
+    def test_read_connection_pool_timeout(self):
+        path = "testtemp/sqlite-pool.sqlite"
+        if os.path.exists(path):
+            os.remove(path)
+        sqlite3.connect(path).close()
+
+        pool = ReadConnectionPool(path, 1, timeout=0.1)
+        try:
+            with pool.connection():
+                with self.assertRaises(ConnectionPoolTimeout):
+                    with pool.connection():
+                        pass
+            with pool.connection() as conn:
+                self.assertEqual((1,), conn.execute("SELECT 1").fetchone())
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
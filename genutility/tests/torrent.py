@@ -0,0 +1,166 @@
+import os
+import shutil
+from hashlib import sha1
+from pathlib import Path
+
+from genutility.file import blockfilesiter
+from genutility.test import MyTestCase, parametrize
+from genutility.torrent import create_torrent, create_torrent_info_dict, scan_torrent_files, verify_torrent
+
+
+def _pieces_truth(paths, piece_size):
+    return b"".join(sha1(piece).digest() for piece in blockfilesiter(paths, piece_size))  # nosec
+
+
+class TorrentTest(MyTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.base = Path("testtemp/torrent")
+        shutil.rmtree(cls.base, ignore_errors=True)
+        os.makedirs(cls.base / "dir" / "sub")
+
+        cls.sizes = {"dir/a.bin": 1000, "dir/sub/b.bin": 0, "dir/sub/c.bin": 3001, "dir/d.bin": 64}
+        for i, (relpath, size) in enumerate(cls.sizes.items()):
+            with open(cls.base / relpath, "wb") as fw:
+                fw.write(bytes((i + j) % 256 for j in range(size)))
+
+    def test_scan_torrent_files(self):
+        result = [(file.parts, file.size) for file in scan_torrent_files(self.base / "dir", "name")]
+        truth = [(("a.bin",), 1000), (("d.bin",), 64), (("sub", "b.bin"), 0), (("sub", "c.bin"), 3001)]
+        self.assertEqual(truth, result)
+
+    @parametrize(
+        (16, 0),
+        (1024, 0),
+        (1024, 2),
+        (8192, 3),
+    )
+    def test_create_torrent_info_dict_file(self, piece_size, threads):
+        path = self.base / "dir" / "sub" / "c.bin"
+        result = create_torrent_info_dict(path, piece_size, threads=threads, read_size=100)
+        self.assertEqual(3001, result["length"])
+        self.assertEqual(_pieces_truth([path], piece_size), result["pieces"])
+
+    @parametrize(
+        (16, 0),
+        (512, 2),
+        (8192, 2),
+    )
+    def test_create_torrent_info_dict_dir(self, piece_size, threads):
+        path = self.base / "dir"
+        result = create_torrent_info_dict(path, piece_size, threads=threads)
+        paths = [path.joinpath(*f["path"]) for f in result["files"]]
+        self.assertEqual(sum(self.sizes.values()), sum(f["length"] for f in result["files"]))
+        self.assertEqual(_pieces_truth(paths, piece_size), result["pieces"])
+
+    def test_piece_cache(self):
+        path = self.base / "dir"
+        cache = {}
+        truth = create_torrent_info_dict(path, 256, threads=0, piece_cache=cache)
+        self.assertEqual(len(truth["pieces"]) // 20, len(cache))
+
+        # cached pieces are not read again
+        cache = {key: b"\x00" * 20 for key in cache}
+        result = create_torrent_info_dict(path, 256, threads=0, piece_cache=cache)
+        self.assertEqual(b"\x00" * len(truth["pieces"]), result["pieces"])
+
+    def _make_torrent(self, name):
+        # copy of the data which can be modified by the test
+        data = self.base / name
+        shutil.rmtree(data, ignore_errors=True)
+        shutil.copytree(self.base / "dir", data / "dir")
+        torrent = self.base / f"{name}.torrent"
+        with open(torrent, "wb") as fw:
+            fw.write(create_torrent(data / "dir", 512, threads=0))
+        return torrent, data
+
+    @parametrize(
+        (0, None),
+        (2, None),
+        (2, 3),
+    )
+    def test_verify_torrent_ok(self, threads, sample):
+        torrent, data = self._make_torrent("verify_ok")
+        result = verify_torrent(torrent, data, threads=threads, sample=sample, seed=0)
+        self.assertEqual(8, result.pieces)
+        self.assertEqual(sample or 8, result.checked)
+        self.assertEqual([], result.bad_pieces)
+        self.assertEqual({}, result.bad_files)
+        self.assertEqual([], result.unverified_files)
+
+    def test_verify_torrent_bad(self):
+        torrent, data = self._make_torrent("verify_bad")
+
+        # piece 1 spans a.bin and d.bin
+        with open(data / "dir" / "a.bin", "r+b") as fw:
+            fw.seek(600)
+            fw.write(b"x")
+        os.remove(data / "dir" / "sub" / "c.bin")
+
+        result = verify_torrent(torrent, data, threads=2)
+        self.assertEqual({"a.bin", "d.bin", "sub/c.bin"}, set(result.bad_files))
+        self.assertEqual("missing", result.bad_files["sub/c.bin"])
+        self.assertEqual([1], result.bad_pieces)
+        # piece 0 is fine, piece 1 fails and the remaining pieces cover bad files
+        self.assertEqual(2, result.checked)
+        self.assertEqual([], result.unverified_files)
+
+    def test_verify_torrent_early_exit(self):
+        path = self.base / "early_exit"
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        with open(path / "big.bin", "wb") as fw:
+            fw.write(os.urandom(512 * 8))
+        torrent = self.base / "early_exit.torrent"
+        with open(torrent, "wb") as fw:
+            fw.write(create_torrent(path / "big.bin", 512, threads=0))
+        with open(path / "big.bin", "r+b") as fw:
+            fw.write(b"x")
+
+        # the following pieces are read ahead by the threads before the first one fails
+        result = verify_torrent(torrent, path, threads=4)
+        self.assertEqual(["big.bin"], list(result.bad_files))
+        self.assertEqual([0], result.bad_pieces)
+        self.assertEqual(1, result.checked)
+
+    def test_verify_torrent_unverified(self):
+        torrent, data = self._make_torrent("verify_unverified")
+        os.remove(data / "dir" / "sub" / "c.bin")
+
+        # piece 2 spans the end of d.bin and the missing c.bin
+        result = verify_torrent(torrent, data, threads=0)
+        self.assertEqual({"sub/c.bin": "missing"}, result.bad_files)
+        self.assertEqual(["d.bin"], result.unverified_files)
+        self.assertEqual([], result.bad_pieces)
+        self.assertEqual(2, result.checked)
+
+    def test_verify_torrent_inaccessible(self):
+        torrent, data = self._make_torrent("verify_inaccessible")
+        shutil.rmtree(data / "dir" / "sub")
+        with open(data / "dir" / "sub", "wb"):  # a path component replaced by a file
+            pass
+
+        result = verify_torrent(torrent, data, threads=0)
+        self.assertEqual({"sub/b.bin", "sub/c.bin"}, set(result.bad_files))
+        self.assertTrue(result.bad_files["sub/c.bin"].startswith("inaccessible"))
+        self.assertEqual(["d.bin"], result.unverified_files)
+
+    def test_verify_torrent_utf8_pieces(self):
+        path = self.base / "utf8"
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        # the sha1 hash of this content is valid utf-8
+        with open(path / "utf8.bin", "wb") as fw:
+            fw.write(b"99937")
+        torrent = self.base / "utf8.torrent"
+        with open(torrent, "wb") as fw:
+            fw.write(create_torrent(path / "utf8.bin", 16, threads=0))
+
+        result = verify_torrent(torrent, path, threads=0)
+        self.assertEqual((1, 1, [], {}), result[:4])
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
@@ -1,18 +1,22 @@
 import binascii
 import gzip
 import logging
+import os
 from hashlib import sha1
-from itertools import chain, compress, repeat, zip_longest
+from itertools import chain, compress, repeat, tee, zip_longest
+from operator import attrgetter
 from os import fspath
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+from random import Random
+from typing import IO, Any, Dict, Iterable, Iterator, List, MutableMapping, NamedTuple, Optional, Sequence, Tuple, Union
 
 import bencodepy
 import requests
 
+from .callbacks import Progress
+from .concurrency import executor_map
 from .exceptions import ParseError, assert_choice
-from .file import blockfileiter, blockfilesiter
-from .filesystem import FileProperties, long_path_support
+from .filesystem import FileProperties, long_path_support, scandir_rec
 
 logger = logging.getLogger(__name__)
 
@@ -147,8 +151,191 @@ def pieces_field(pieces: Iterable[bytes]) -> bytes:
     return b"".join(sha1(piece).digest() for piece in pieces)  # nosec
 
 
+DEFAULT_READ_SIZE = 8 * 1024 * 1024
+
+
+class TorrentFileEntry:
+    """A file of a torrent. `parts` is the path relative to the torrent root, `path` the filesystem path.
+    `path` is None for padding files (BEP 47), which are read as zeros.
+    """
+
+    __slots__ = ("path", "parts", "size", "mtime_ns")
+
+    def __init__(self, path: Optional[str], parts: Tuple[str, ...], size: int, mtime_ns: int) -> None:
+        self.path = path
+        self.parts = parts
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def __repr__(self) -> str:
+        return f"TorrentFileEntry({self.path!r}, {self.parts!r}, {self.size!r}, {self.mtime_ns!r})"
+
+
+def scan_torrent_files(path: Path, sort: str = "name") -> List[TorrentFileEntry]:
+    """Lists the files in directory `path` using a single `stat()` per file.
+    `sort`: sort by file path (name), file size (size) or use abitrary file system order (unordered)
+    """
+
+    assert_choice("sort", sort, {"name", "size", "unordered"})
+
+    files = []
+    for entry in scandir_rec(path, files=True, dirs=False, relative=True):
+        stats = entry.stat()
+        parts = Path(entry.relpath).parts
+        files.append(TorrentFileEntry(entry.path, parts, stats.st_size, stats.st_mtime_ns))
+
+    if sort == "name":
+        files.sort(key=attrgetter("parts"))
+    elif sort == "size":
+        files.sort(key=attrgetter("size"))
+
+    return files
+
+
+PieceKey = Tuple[Tuple[Tuple[str, ...], int, int, int, int], ...]
+
+
+def piece_layout(
+    files: Sequence[TorrentFileEntry], piece_size: int
+) -> Iterator[List[Tuple[TorrentFileEntry, int, int]]]:
+    """Yields the `(file, offset, length)` segments of each piece of the concatenated `files`."""
+
+    segments: List[Tuple[TorrentFileEntry, int, int]] = []
+    missing = piece_size
+    for file in files:
+        offset = 0
+        while offset < file.size:
+            length = min(missing, file.size - offset)
+            segments.append((file, offset, length))
+            offset += length
+            missing -= length
+            if missing == 0:
+                yield segments
+                segments = []
+                missing = piece_size
+
+    if segments:
+        yield segments
+
+
+def _piece_key(segments: List[Tuple[TorrentFileEntry, int, int]]) -> PieceKey:
+    return tuple((file.parts, file.size, file.mtime_ns, offset, length) for file, offset, length in segments)
+
+
+class _PieceReader:
+    """Reads the data of consecutive pieces, keeping the current file open.
+    The large buffer turns the piece reads into few large sequential reads.
+    """
+
+    def __init__(self, read_size: int) -> None:
+        self.read_size = read_size
+        self.path: Optional[str] = None
+        self.fr: Optional[IO[bytes]] = None
+
+    def read(self, segments: List[Tuple[TorrentFileEntry, int, int]]) -> bytes:
+        out = []
+        for file, offset, length in segments:
+            if file.path is None:
+                out.append(bytes(length))
+                continue
+            if file.path != self.path:
+                self.close()
+                self.fr = open(file.path, "rb", buffering=self.read_size)
+                self.path = file.path
+            assert self.fr is not None  # for mypy
+            if self.fr.tell() != offset:
+                self.fr.seek(offset)
+            data = self.fr.read(length)
+            if len(data) != length:
+                raise RuntimeError(f"File changed while reading: {file.path}")
+            out.append(data)
+        return b"".join(out)
+
+    def close(self) -> None:
+        if self.fr is not None:
+            self.fr.close()
+            self.fr = None
+            self.path = None
+
+
+def _sha1_digest(data: bytes) -> bytes:
+    return sha1(data).digest()  # nosec
+
+
+def _hash_threads(threads: int) -> int:
+    if threads == -1:
+        return os.cpu_count() or 1
+    elif threads < 0:
+        raise ValueError("threads must be non-negative or -1")
+    return threads
+
+
+def hash_pieces(
+    files: Sequence[TorrentFileEntry],
+    piece_size: int,
+    threads: int = -1,
+    read_size: int = DEFAULT_READ_SIZE,
+    piece_cache: Optional[MutableMapping[PieceKey, bytes]] = None,
+    progress: Optional[Progress] = None,
+) -> bytes:
+    """Calculates the `pieces` field of the concatenated `files`.
+    The pieces are read in the calling thread and hashed by `threads` threads, keeping their order.
+    hashlib releases the GIL while hashing, so this scales with the number of cores.
+
+    `threads`: Number of hashing threads. 0 hashes in the calling thread, -1 uses all logical cores.
+    `read_size`: Read buffer size per file.
+    `piece_cache`: Maps the file segments of pieces to their hashes. The segments include the file size
+            and modification time, so pieces of unchanged files are not read again.
+            New hashes are added to the mapping, which can be persisted between calls.
+    """
+
+    threads = _hash_threads(threads)
+    progress = progress or Progress()
+    reader = _PieceReader(max(read_size, piece_size))
+    total = sum(file.size for file in files)
+
+    def jobs() -> Iterator[Tuple[PieceKey, Optional[bytes], int]]:
+        for segments in piece_layout(files, piece_size):
+            key = _piece_key(segments) if piece_cache is not None else ()
+            length = sum(length for _, _, length in segments)
+            if piece_cache is not None and key in piece_cache:
+                yield key, None, length
+            else:
+                yield key, reader.read(segments), length
+
+    def hash_job(job: Tuple[PieceKey, Optional[bytes], int]) -> Optional[bytes]:
+        _, data, _ = job
+        return None if data is None else _sha1_digest(data)
+
+    it1, it2 = tee(jobs())
+    digests = []
+    try:
+        with progress.task(total=total, description="Hashing pieces") as task:
+            futures = executor_map(hash_job, it1, parallel=threads > 0, workers=threads or None, bufsize=threads)
+            for (key, _, length), future in zip(it2, futures):
+                digest = future.result()
+                if piece_cache is not None:
+                    if digest is None:
+                        digest = piece_cache[key]
+                    else:
+                        piece_cache[key] = digest
+                digests.append(digest)
+                task.advance(length)
+    finally:
+        reader.close()
+
+    return b"".join(digests)
+
+
 def create_torrent_info_dict(
-    path: Path, piece_size: int, private: Optional[int] = None, sort: str = "name"
+    path: Path,
+    piece_size: int,
+    private: Optional[int] = None,
+    sort: str = "name",
+    threads: int = -1,
+    read_size: int = DEFAULT_READ_SIZE,
+    piece_cache: Optional[MutableMapping[PieceKey, bytes]] = None,
+    progress: Optional[Progress] = None,
 ) -> Dict[str, Any]:
     """Create torrent info dict.
 
@@ -156,6 +343,7 @@ def create_torrent_info_dict(
     piece_size: piece size, usually a power of two
     private: set private flag
     sort: sort by file path (name), file size (size) or use abitrary file system order (unordered)
+    threads, read_size, piece_cache, progress: see `hash_pieces`
     """
 
     if private is not None:
@@ -167,34 +355,31 @@ def create_torrent_info_dict(
         raise ValueError("piece_size must be >= 1")
 
     if path.is_file():
+        stats = path.stat()
+        files = [TorrentFileEntry(fspath(path), (path.name,), stats.st_size, stats.st_mtime_ns)]
         ret = {
             "name": path.name,
-            "length": path.stat().st_size,
+            "length": stats.st_size,
             "piece length": piece_size,
-            "pieces": pieces_field(blockfileiter(path, chunk_size=piece_size)),
+            "pieces": hash_pieces(files, piece_size, threads, read_size, piece_cache, progress),
         }
 
     elif path.is_dir():
-        files = list(p for p in path.rglob("*") if p.is_file())
-
-        if sort == "name":
-            files = sorted(files, key=lambda path: path.parts)
-        elif sort == "size":
-            files = sorted(files, key=lambda path: path.stat().st_size)
+        files = scan_torrent_files(path, sort)
 
         assert files, "not implemented yet"
 
         ret = {
             "files": [
                 {
-                    "length": file.stat().st_size,
-                    "path": file.relative_to(path).parts,
+                    "length": file.size,
+                    "path": file.parts,
                 }
                 for file in files
             ],
             "name": path.name,
             "piece length": piece_size,
-            "pieces": pieces_field(blockfilesiter(files, chunk_size=piece_size)),
+            "pieces": hash_pieces(files, piece_size, threads, read_size, piece_cache, progress),
         }
 
     else:
@@ -206,6 +391,149 @@ def create_torrent_info_dict(
     return ret
 
 
+class TorrentVerifyResult(NamedTuple):
+    pieces: int  # number of pieces of the torrent
+    checked: int  # number of pieces which were read and hashed
+    bad_pieces: List[int]  # indices of the checked pieces which failed verification
+    bad_files: Dict[str, str]  # maps the relative paths of the failed files to the reason
+    unverified_files: List[str]  # relative paths of files which share pieces with unreadable files
+
+
+def torrent_files(info: dict, save_path: Path) -> List[TorrentFileEntry]:
+    """Maps the files of torrent info dict `info` (as returned by `read_torrent_info_dict` with
+    `normalize_string_fields=True`) to the file system, where the torrent was saved in directory `save_path`.
+    """
+
+    root = save_path / info["name"]
+    try:
+        fds = info["files"]
+    except KeyError:
+        return [TorrentFileEntry(fspath(root), (info["name"],), info["length"], 0)]
+
+    files = []
+    for fd in fds:
+        parts = tuple(fd["path"])
+        if "p" in fd.get("attr", ""):
+            files.append(TorrentFileEntry(None, parts, fd["length"], 0))
+        else:
+            files.append(TorrentFileEntry(fspath(root.joinpath(*parts)), parts, fd["length"], 0))
+    return files
+
+
+def verify_torrent(
+    path: Path,
+    save_path: Path,
+    threads: int = -1,
+    sample: Optional[int] = None,
+    seed: Optional[int] = None,
+    read_size: int = DEFAULT_READ_SIZE,
+    progress: Optional[Progress] = None,
+) -> TorrentVerifyResult:
+    """Verifies the data of torrent file `path` saved in directory `save_path` against the piece hashes.
+    Pieces spanning multiple files are read across the file boundaries. A failed piece marks all of its files
+    as bad, and once a file is bad, the remaining pieces which cover it are not checked anymore.
+    Missing, inaccessible and wrongly sized files are bad without being read. The pieces they share with
+    other files cannot be checked, so these files are listed as unverified unless they failed otherwise.
+    The pieces are read sequentially in the calling thread and hashed by `threads` threads.
+
+    `threads`: Number of hashing threads. 0 hashes in the calling thread, -1 uses all logical cores.
+    `sample`: Only check a random sample of this many pieces. The sample is read in file order.
+    `seed`: Random seed for `sample`.
+    `read_size`: Read buffer size per file.
+    """
+
+    threads = _hash_threads(threads)
+    progress = progress or Progress()
+
+    info = read_torrent_info_dict(path, normalize_string_fields=True)
+    piece_size = info["piece length"]
+    hashes = read_torrent_info_dict(path)[b"pieces"]  # binary pieces might be valid utf-8 by chance
+    files = torrent_files(info, save_path)
+    num_pieces = len(hashes) // 20
+
+    if len(hashes) % 20 != 0 or num_pieces != -(-sum(file.size for file in files) // piece_size):
+        raise ParseError(f"Invalid pieces field in {path}")
+
+    bad_files: Dict[str, str] = {}
+    for file in files:
+        if file.path is None:
+            continue
+        try:
+            size = os.stat(file.path).st_size
+        except FileNotFoundError:
+            bad_files["/".join(file.parts)] = "missing"
+        except OSError as e:
+            bad_files["/".join(file.parts)] = f"inaccessible: {e.strerror}"
+        else:
+            if size != file.size:
+                bad_files["/".join(file.parts)] = f"size mismatch: expected {file.size}, found {size}"
+
+    unreadable = set(bad_files)
+    unverified = set()
+
+    pieces: Iterable[Tuple[int, List[Tuple[TorrentFileEntry, int, int]]]] = enumerate(piece_layout(files, piece_size))
+    if sample is not None:
+        indices = set(Random(seed).sample(range(num_pieces), min(sample, num_pieces)))  # nosec
+        pieces = ((i, segments) for i, segments in pieces if i in indices)
+        total = len(indices)
+    else:
+        total = num_pieces
+
+    reader = _PieceReader(max(read_size, piece_size))
+    bad_pieces: List[int] = []
+
+    def all_bad(segments: List[Tuple[TorrentFileEntry, int, int]]) -> bool:
+        # pieces which also cover good files are still checked, so all their other bytes are verified.
+        names = ["/".join(file.parts) for file, _, _ in segments if file.path is not None]
+        return bool(names) and all(name in bad_files for name in names)
+
+    def jobs() -> Iterator[Tuple[int, List[Tuple[TorrentFileEntry, int, int]], Optional[bytes]]]:
+        # runs lazily in the calling thread, so files marked as bad in the result loop below are skipped.
+        for i, segments in pieces:
+            if all_bad(segments):
+                continue
+            names = ["/".join(file.parts) for file, _, _ in segments if file.path is not None]
+            if any(name in unreadable for name in names):
+                unverified.update(names)
+                continue
+            try:
+                yield i, segments, reader.read(segments)
+            except (OSError, RuntimeError) as e:
+                logger.warning("Reading piece %d failed: %s", i, e)
+                yield i, segments, None
+
+    def hash_job(job: Tuple[int, List[Tuple[TorrentFileEntry, int, int]], Optional[bytes]]) -> Optional[bool]:
+        # the files might have been marked as bad after the piece was read ahead
+        i, segments, data = job
+        if all_bad(segments):
+            return None
+        return data is not None and _sha1_digest(data) == hashes[i * 20 : (i + 1) * 20]
+
+    it1, it2 = tee(jobs())
+    checked = 0
+    try:
+        with progress.task(total=total, description="Verifying pieces") as task:
+            # only read ahead as many pieces as there are threads, so bad files are skipped early
+            futures = executor_map(hash_job, it1, parallel=threads > 0, workers=threads or None, bufsize=0)
+            for (i, segments, _), future in zip(it2, futures):
+                # results are discarded like in sequential order, if an earlier piece marked all files as bad
+                result = future.result()
+                if result is None or all_bad(segments):
+                    continue
+                checked += 1
+                if not result:
+                    bad_pieces.append(i)
+                    for file, _, _ in segments:
+                        if file.path is not None:
+                            bad_files.setdefault("/".join(file.parts), f"piece {i} failed")
+                task.advance(1)
+    finally:
+        reader.close()
+
+    unverified_files = sorted(name for name in unverified if name not in bad_files)
+    return TorrentVerifyResult(num_pieces, checked, bad_pieces, bad_files, unverified_files)
+
+
 def torrent_info_hash(d: dict) -> str:
     return sha1(BENCODE_BINARY.encode(d)).hexdigest()  # nosec
 
@@ -215,9 +543,15 @@ def get_torrent_hash(path: Path) -> str:
 
 
 def create_torrent(
-    path: Path, piece_size: int, announce: str = "", private: Optional[bool] = None, sort: str = "name"
+    path: Path,
+    piece_size: int,
+    announce: str = "",
+    private: Optional[bool] = None,
+    sort: str = "name",
+    threads: int = -1,
+    progress: Optional[Progress] = None,
 ) -> bytes:
-    info = create_torrent_info_dict(path, piece_size, private, sort)
+    info = create_torrent_info_dict(path, piece_size, private, sort, threads, progress=progress)
     torrent = {"announce": announce, "info": info}
 
     return BENCODE_BINARY.encode(torrent)